@@ -4,8 +4,19 @@ import requests
 import time
 import yaml
 import shutil
+import urllib3
+from requests.adapters import HTTPAdapter
 
 SERVER_URL = "http://10.190.226.6:8000/repository"
+# One keep-alive session for every query to the intent server (connect, read timeouts in seconds).
+# Connection errors, timeouts and 429/502/503/504 are retried twice with jittered exponential
+# backoff, as in mainframe_final/http_client.py; the last response is returned, not raised
+HTTP_SESSION = requests.Session()
+HTTP_TIMEOUT = (3.05, 30)
+HTTP_RETRY = urllib3.Retry(total=2, connect=2, backoff_factor=0.25, backoff_jitter=0.25,
+                           status_forcelist=(429, 502, 503, 504), allowed_methods=None, raise_on_status=False)
+HTTP_SESSION.mount("http://", HTTPAdapter(max_retries=HTTP_RETRY))
+HTTP_SESSION.mount("https://", HTTPAdapter(max_retries=HTTP_RETRY))
 
 import platform
 import os
@@ -698,7 +709,11 @@ def main():
     while True:
         try:
             user_query = input("Enter your query :")
-            response = requests.post(SERVER_URL, json={"query": user_query})
+        except EOFError:
+            break
+        try:
+            # Keep-alive session with timeouts and bounded retries; the next prompt follows straight away
+            response = HTTP_SESSION.post(SERVER_URL, json={"query": user_query}, timeout=HTTP_TIMEOUT)
             if response.status_code == 200:
                 action = response.json().get("action")
                 handle_server_command(action, config_path)
@@ -706,7 +721,6 @@ def main():
                 print(f"Server returned an error: {response.status_code}")
         except Exception as e:
             print(f"Error connecting to the server: {e}")
-        time.sleep(5)
 
 if __name__ == "__main__":
     main()
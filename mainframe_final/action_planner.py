@@ -0,0 +1,238 @@
+"""
+Dependency graph of the steps of an agent action.
+
+A Plan holds named steps and the steps each one requires. run() starts every
+step whose requirements have succeeded: ordinary steps on a thread pool, so
+independent ones overlap (installing extensions while the repository is
+cloned, connecting to the mainframe while the local git steps run), and
+interactive steps, which call input() or getpass(), one at a time on the
+calling thread, in the order they were added.
+
+A step receives the values returned by the steps it requires, in the order
+they are listed. A step fails when it raises; StepFailed carries a message
+for an expected failure ("No internet connection") without a traceback.
+Every step that requires a failed step, directly or not, is skipped, and the
+independent steps carry on.
+
+While the plan runs, what a background step prints (sys.stdout and
+sys.stderr) is buffered per step and printed, prefixed with the step name,
+by the calling thread between prompts, so it never lands in the middle of an
+interactive step's input(). Subprocesses write to the file descriptors
+directly, so a background step should capture their output and print it, and
+not let them read the terminal (stdin=subprocess.DEVNULL,
+GIT_TERMINAL_PROMPT=0 for git).
+
+    plan = Plan()
+    plan.add("internet", check_internet)
+    plan.add("inputs", ask_for_repository, interactive=True)
+    plan.add("clone", clone, requires=("internet", "inputs"))
+    results = plan.run()                  # name -> StepResult
+    print(format_results(results))
+
+Each step runs inside an agent_trace span (category "plan"), so with
+AGENT_TRACE=1 the trace shows which steps overlapped.
+
+Settings (environment):
+    AGENT_PLAN_WORKERS    threads for non-interactive steps, default 4
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agent_trace import span
+
+
+MAX_WORKERS = 4
+
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class StepFailed(Exception):
+    """Raised by a step that cannot complete; its dependents are skipped."""
+
+
+class Step:
+    __slots__ = ("name", "function", "requires", "interactive", "order")
+
+    def __init__(self, name, function, requires, interactive, order):
+        self.name = name
+        self.function = function
+        self.requires = tuple(requires)
+        self.interactive = interactive
+        self.order = order
+
+
+class StepResult:
+    __slots__ = ("name", "status", "value", "error", "elapsed", "output")
+
+    def __init__(self, name, status, value=None, error=None, elapsed=0.0, output=""):
+        self.name = name
+        self.status = status
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+        self.output = output  # what a background step printed
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+    def __repr__(self):
+        return f"StepResult({self.name!r}, {self.status!r}, error={self.error!r})"
+
+
+class Plan:
+    def __init__(self, max_workers=None):
+        self.max_workers = int(max_workers or os.environ.get("AGENT_PLAN_WORKERS", MAX_WORKERS))
+        self.steps = {}
+        self._dependents = {}
+
+    def add(self, name, function, requires=(), interactive=False):
+        """Add a step; the steps it requires must have been added before it."""
+        if name in self.steps:
+            raise ValueError(f"Step {name!r} is already in the plan")
+        for required in requires:
+            if required not in self.steps:
+                raise ValueError(f"Step {name!r} requires {required!r}, which is not in the plan")
+        self.steps[name] = Step(name, function, requires, interactive, len(self.steps))
+        self._dependents[name] = []
+        for required in requires:
+            self._dependents[required].append(name)
+        return name
+
+    def run(self):
+        """Run every step and return {name: StepResult} in the order the steps were added."""
+        run = _PlanRun(self)
+        return run.execute()
+
+
+class _StepStream:
+    """Stands in for sys.stdout/sys.stderr: writes from a registered thread go to that step's buffer."""
+
+    def __init__(self, stream, buffers):
+        self.stream = stream
+        self.buffers = buffers  # thread id -> list of text, shared by stdout and stderr
+
+    def write(self, text):
+        buffer = self.buffers.get(threading.get_ident())
+        if buffer is None:
+            return self.stream.write(text)
+        buffer.append(text)
+        return len(text)
+
+    def flush(self):
+        if threading.get_ident() not in self.buffers:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class _PlanRun:
+    def __init__(self, plan):
+        self.plan = plan
+        self.results = {}
+        self.waiting = {name: len(step.requires) for name, step in plan.steps.items()}
+        self.interactive_ready = []
+        self.pending_output = []  # finished background steps whose output is not printed yet
+        self.buffers = {}
+        self.condition = threading.Condition()
+        self.executor = None
+
+    def execute(self):
+        streams = sys.stdout, sys.stderr
+        sys.stdout = _StepStream(streams[0], self.buffers)
+        sys.stderr = _StepStream(streams[1], self.buffers)
+        self.executor = ThreadPoolExecutor(max_workers=self.plan.max_workers, thread_name_prefix="plan")
+        try:
+            with self.condition:
+                for name, count in self.waiting.items():
+                    if count == 0:
+                        self._ready(self.plan.steps[name])
+            while True:
+                with self.condition:
+                    while (not self.interactive_ready and not self.pending_output
+                           and len(self.results) < len(self.plan.steps)):
+                        self.condition.wait()
+                    finished, self.pending_output = self.pending_output, []
+                    step = None
+                    if self.interactive_ready:
+                        step = min(self.interactive_ready, key=lambda s: s.order)
+                        self.interactive_ready.remove(step)
+                    done = step is None and not finished and len(self.results) == len(self.plan.steps)
+                # Printed here, on this thread, so it never lands inside a prompt
+                self._print_output(finished)
+                if done:
+                    return {name: self.results[name] for name in self.plan.steps}
+                if step is not None:
+                    self._run_step(step)
+        finally:
+            # Interrupted at a prompt: do not start anything else
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            sys.stdout, sys.stderr = streams
+            self._print_output(self.pending_output)
+
+    @staticmethod
+    def _print_output(finished):
+        for result in finished:
+            for line in result.output.splitlines():
+                print(f"[{result.name}] {line}".rstrip())
+
+    def _ready(self, step):
+        # Called with the condition held
+        if step.interactive:
+            self.interactive_ready.append(step)
+            self.condition.notify_all()
+        else:
+            self.executor.submit(self._run_step, step)
+
+    def _run_step(self, step):
+        arguments = [self.results[name].value for name in step.requires]
+        if not step.interactive:
+            self.buffers[threading.get_ident()] = []
+        started = time.perf_counter()
+        with span(step.name, "plan", interactive=step.interactive):
+            try:
+                value = step.function(*arguments)
+                result = StepResult(step.name, OK, value)
+            except StepFailed as e:
+                result = StepResult(step.name, FAILED, error=str(e))
+            except Exception as e:
+                result = StepResult(step.name, FAILED, error=f"{e.__class__.__name__}: {e}")
+        result.elapsed = time.perf_counter() - started
+        if not result.ok:
+            print(f"Step '{step.name}' failed: {result.error}")
+        if not step.interactive:
+            result.output = "".join(self.buffers.pop(threading.get_ident()))
+        self._finish(result)
+
+    def _finish(self, result):
+        with self.condition:
+            self.results[result.name] = result
+            if result.output:
+                self.pending_output.append(result)
+            for name in self.plan._dependents[result.name]:
+                if name in self.results:
+                    continue
+                if not result.ok:
+                    reason = result.error if result.status == SKIPPED else f"'{result.name}' failed"
+                    self._finish(StepResult(name, SKIPPED, error=reason))
+                    continue
+                self.waiting[name] -= 1
+                if self.waiting[name] == 0:
+                    self._ready(self.plan.steps[name])
+            self.condition.notify_all()
+
+
+# Function to format the step results as a table
+def format_results(results):
+    lines = ["Steps:"]
+    for result in results.values():
+        detail = f"  ({result.error})" if result.error else ""
+        lines.append(f"  {result.name:<20} {result.status:<8} {result.elapsed:7.2f}s{detail}")
+    return "\n".join(lines)
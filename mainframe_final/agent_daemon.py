@@ -0,0 +1,329 @@
+"""
+Resident agent process for the VS Code frontend.
+
+Instead of starting a new interpreter for every action (clone_log.py,
+open_clone.py, checkout_branch_log.py, lpar_mainframe_new.py, ...), the
+frontend can keep this process running and send it newline-delimited
+JSON-RPC 2.0 requests over a local TCP socket or over stdio. The action
+modules and paramiko/yaml/requests are imported once and stay warm between
+calls. The YAML configs are parsed at start-up into the process-wide config
+cache (config_cache.py), which the actions that read them (extension_log,
+open_clone, lpar_mainframe_new) go through.
+
+    python3 agent_daemon.py --port 8765
+    python3 agent_daemon.py --stdio
+
+Request:
+    {"jsonrpc": "2.0", "id": 1, "method": "clone_log",
+     "params": ["MortgageApplication", "https://github.com/gmsadmin-git", "/path/to/workspace"]}
+
+Response:
+    {"jsonrpc": "2.0", "id": 1, "result": {"value": ..., "output": "..."}}
+
+"params" are the positional arguments of the action's main() (a list), or
+its keyword arguments (a dict). For the scripts that take a variable number of
+extensions first (extension_log, open_clone) the list may also be written the
+way the command line takes it, flat:
+
+    ["ext.one", "ext.two", "/path/to/workspace"]  ->  main(["ext.one", "ext.two"], "/path/to/workspace")
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import socket
+import argparse
+import importlib
+import threading
+import socketserver
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Action name -> module whose main() implements it (same name as the script)
+ACTIONS = {
+    "internet_log": "internet_log",
+    "extension_log": "extension_log",
+    "clone_log": "clone_log",
+    "open_clone": "open_clone",
+    "list_branch_log": "list_branch_log",
+    "checkout_branch_log": "checkout_branch_log",
+    "new_branch_log": "new_branch_log",
+    "open_file_log": "open_file_log",
+    "create_file_log": "create_file_log",
+    "commit_after_change_log": "commit_after_change_log",
+    "lpar_mainframe_new": "lpar_mainframe_new",
+}
+
+# Actions whose first CLI argument is nargs="+" -> number of single arguments after it
+LIST_FIRST_ACTIONS = {
+    "extension_log": 1,
+    "open_clone": 4,
+}
+
+# Configuration files kept parsed in memory (config_cache.py re-reads a file only when it changes)
+CONFIG_FILES = [
+    "application_details.yaml",
+    "pull_clone.yaml",
+    "repo_name.yaml",
+    "timeout_dynamic.yaml",
+    "vscode_extension.yaml",
+]
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class RPCError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class AgentDaemon:
+    """Keeps the action modules loaded and the configs cached, and dispatches RPC calls to them."""
+
+    def __init__(self):
+        self.modules = {}
+        self.import_errors = {}
+        self.config_errors = {}
+        self.started_at = time.time()
+        self.calls = 0
+        # The actions print to stdout and may chdir, so they run one at a time
+        self._lock = threading.Lock()
+        if SCRIPT_DIR not in sys.path:
+            sys.path.insert(0, SCRIPT_DIR)
+
+    def warm_up(self):
+        """Import every action module and parse the YAML configs into the config cache up front."""
+        for action in ACTIONS:
+            try:
+                self._load_module(action)
+            except RPCError:
+                pass
+        for name in CONFIG_FILES:
+            self._load_config(name)
+        # Watch timeout_dynamic.yaml so LPAR edits apply without a restart
+        from lpar_registry import get_lpar_registry
+        get_lpar_registry()
+
+    def _load_config(self, name):
+        """Return the parsed config from the config cache, re-read only if the file changed."""
+        import yaml
+        from config_cache import load_yaml
+        try:
+            config = load_yaml(os.path.join(SCRIPT_DIR, name))
+        except (OSError, yaml.YAMLError) as e:
+            self.config_errors[name] = str(e)
+            print(f"Could not load {name}: {e}", file=sys.stderr)
+            return None
+        self.config_errors.pop(name, None)
+        return config
+
+    def _load_module(self, action):
+        if action in self.modules:
+            return self.modules[action]
+        module_name = ACTIONS.get(action)
+        if module_name is None:
+            raise RPCError(METHOD_NOT_FOUND, f"Unknown action: {action}")
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            self.import_errors[action] = f"{type(e).__name__}: {e}"
+            raise RPCError(INTERNAL_ERROR, f"Action '{action}' is unavailable: {self.import_errors[action]}")
+        self.import_errors.pop(action, None)
+        self.modules[action] = module
+        return module
+
+    def status(self):
+        info = {
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started_at, 3),
+            "calls": self.calls,
+            "loaded_actions": sorted(self.modules),
+            "unavailable_actions": self.import_errors,
+            "config_errors": self.config_errors,
+        }
+        # Only report the SSH pool once an action has pulled it in
+        if "config_cache" in sys.modules:
+            info["config_cache"] = sys.modules["config_cache"].get_config_cache().stats()
+        if "lpar_registry" in sys.modules:
+            info["lpar_registry"] = sys.modules["lpar_registry"].get_lpar_registry().stats()
+        if "ssh_pool" in sys.modules:
+            info["ssh_pool"] = sys.modules["ssh_pool"].get_ssh_pool().stats()
+        return info
+
+    def _positional(self, action, params):
+        """Group the leading extensions of a flat, command-line style list into the list main() expects."""
+        trailing = LIST_FIRST_ACTIONS.get(action)
+        if trailing is None or (params and isinstance(params[0], list)):
+            return params
+        if len(params) <= trailing:
+            raise RPCError(INVALID_PARAMS, f"{action}: expected at least one extension and {trailing} more argument(s)")
+        return [params[:-trailing]] + params[-trailing:]
+
+    def run_action(self, action, params):
+        module = self._load_module(action)
+        if isinstance(params, dict):
+            args, kwargs = [], params
+        elif isinstance(params, list):
+            args, kwargs = self._positional(action, params), {}
+        else:
+            raise RPCError(INVALID_PARAMS, "params must be a list or an object")
+
+        output = io.StringIO()
+        with self._lock:
+            cwd = os.getcwd()
+            stdin = sys.stdin
+            # Scripts that prompt with input() get EOF instead of blocking the agent
+            sys.stdin = io.StringIO("")
+            try:
+                with redirect_stdout(output), redirect_stderr(output):
+                    value = module.main(*args, **kwargs)
+            except TypeError as e:
+                raise RPCError(INVALID_PARAMS, f"{action}: {e}")
+            except SystemExit as e:
+                value = e.code
+            except Exception as e:
+                raise RPCError(INTERNAL_ERROR, f"{action} failed: {e}\n{traceback.format_exc()}")
+            finally:
+                sys.stdin = stdin
+                os.chdir(cwd)
+                self.calls += 1
+                # The action's log records are written in the background; make
+                # sure they are on disk before the frontend reads the log
+                if "agent_log" in sys.modules:
+                    sys.modules["agent_log"].flush_logs(timeout=10)
+        return {"value": value, "output": output.getvalue()}
+
+    def dispatch(self, method, params):
+        if method == "ping":
+            return "pong"
+        if method == "status":
+            return self.status()
+        if method == "lpars":
+            from lpar_registry import get_lpar_registry
+            return get_lpar_registry().lpars
+        if method == "config":
+            name = params.get("name") if isinstance(params, dict) else (params[0] if params else None)
+            if name is None:
+                return {config: self._load_config(config) for config in CONFIG_FILES}
+            if name not in CONFIG_FILES:
+                raise RPCError(INVALID_PARAMS, f"Unknown config: {name}")
+            return self._load_config(name)
+        return self.run_action(method, params if params is not None else [])
+
+    def handle_line(self, line):
+        """Handle one JSON-RPC request line and return the response line (or None for notifications)."""
+        request_id = None
+        notification = False
+        try:
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise RPCError(PARSE_ERROR, f"Parse error: {e}")
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RPCError(INVALID_REQUEST, "Invalid request")
+            request_id = request.get("id")
+            notification = "id" not in request
+            result = self.dispatch(request["method"], request.get("params"))
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except RPCError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": e.message}}
+        if notification:
+            return None
+        return json.dumps(response, default=str)
+
+
+class _RPCRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            response = self.server.agent.handle_line(line)
+            if response is not None:
+                self.wfile.write((response + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+
+class _RPCServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+# Function to serve requests on a local TCP socket
+def serve_socket(agent, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    with _RPCServer((host, port), _RPCRequestHandler) as server:
+        server.agent = agent
+        print(f"Agent listening on {host}:{port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+# Function to serve requests on stdin/stdout
+def serve_stdio(agent):
+    stdout = sys.stdout
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        response = agent.handle_line(line)
+        if response is not None:
+            stdout.write(response + "\n")
+            stdout.flush()
+
+
+class AgentClient:
+    """Minimal client that keeps one connection to the agent open."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile("rb")
+        self._next_id = 0
+
+    def call(self, method, params=None):
+        self._next_id += 1
+        request = {"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params or []}
+        self.sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        response = json.loads(self.reader.readline())
+        if "error" in response:
+            raise RPCError(response["error"]["code"], response["error"]["message"])
+        return response["result"]
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident agent serving the frontend actions over JSON-RPC.")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Address to listen on (local only by default)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--stdio", action="store_true", help="Serve JSON-RPC on stdin/stdout instead of a socket")
+    args = parser.parse_args()
+
+    agent = AgentDaemon()
+    agent.warm_up()
+    if args.stdio:
+        serve_stdio(agent)
+    else:
+        serve_socket(agent, args.host, args.port)
+
+
+#   python3 agent_daemon.py --port 8765
+#   echo '{"jsonrpc": "2.0", "id": 1, "method": "status"}' | python3 agent_daemon.py --stdio
@@ -0,0 +1,568 @@
+"""
+Shared backend for the modules' log_to_file.
+
+Each log_to_file used to open internet_connection_log.txt, write the message
+and the separator line and close the file again, for every message. The
+modules now call append_log(), which formats the record with the same
+timestamp and separator and puts it on a queue. One background thread writes
+the queued records in batches, keeping the log files open, flushes after every
+batch and fsyncs according to the policy:
+
+    AGENT_LOG_FSYNC=interval   fsync at most every AGENT_LOG_FSYNC_INTERVAL seconds (default 1)
+    AGENT_LOG_FSYNC=always     fsync after every batch
+    AGENT_LOG_FSYNC=never      leave it to the OS
+
+Everything still queued is written, flushed and fsynced at interpreter exit,
+and flush_logs() waits for the queue to drain (the resident agent calls it
+after each action so the frontend sees the complete log).
+
+Log files are rotated before a record would take them past the size limit or
+once their first record is older than the age limit. The rotated segment is
+renamed to <log>.<YYYYmmdd-HHMMSS-micro>, gzipped in the background and only the
+newest segments are kept:
+
+    AGENT_LOG_MAX_BYTES=5242880   rotate at this size (0 disables)
+    AGENT_LOG_MAX_AGE=168         rotate segments older than this many hours (0 disables)
+    AGENT_LOG_BACKUPS=10          compressed segments to keep
+
+The writer tracks each file's size and start time itself, so appending stays
+O(1). tail_log() reads the last records from the end of the file.
+
+Next to the text log every record is also written as a JSON event to
+<log>.events.jsonl, with the fields the caller passes (action, repo, branch,
+lpar, step, duration, outcome):
+
+    log_to_file("Build finished", LOG_FILE, action="build", lpar="gmsmf",
+                repo="MortgageApplication", duration=41.2, outcome="success")
+
+Every 256 events the writer appends a block entry to <log>.events.jsonl.idx
+with the block's byte range, time range and the actions, repos and LPARs in
+it. query_events() reads the index and seeks straight to the blocks that can
+match. Set AGENT_LOG_EVENTS=0 to write only the text log.
+"""
+
+import os
+import sys
+import json
+import glob
+import gzip
+import time
+import queue
+import atexit
+import shutil
+import threading
+from datetime import datetime
+
+
+SEPARATOR = "-" * 40 + "\n"
+MAX_BATCH = 512
+QUEUE_SIZE = 10000
+# How long the writer waits for more records before writing a partial batch
+BATCH_WAIT = 0.05
+
+FSYNC_POLICIES = ("interval", "always", "never")
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_AGE_HOURS = 7 * 24
+DEFAULT_BACKUPS = 10
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+EVENTS_SUFFIX = ".events.jsonl"
+INDEX_SUFFIX = ".idx"
+# Events per index block
+BLOCK_RECORDS = 256
+# Event fields the index keeps per block
+INDEXED_FIELDS = ("action", "repo", "lpar")
+# Event fields log_to_file callers may pass
+EVENT_FIELDS = ("action", "repo", "branch", "lpar", "step", "duration", "outcome")
+
+
+def format_record(message, timestamp=None):
+    """Return the timestamped line the way log_to_file always wrote it."""
+    if timestamp is None:
+        timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    return f"{timestamp} - {message}\n"
+
+
+def _segment_start(path, st):
+    """Time of the first record in a log file (its leading timestamp, or the first event's ts), else its mtime."""
+    if st.st_size == 0:
+        return time.time()
+    try:
+        with open(path, "r") as file:
+            if path.endswith(EVENTS_SUFFIX):
+                return float(json.loads(file.readline())["ts"])
+            head = file.read(19)
+        return time.mktime(time.strptime(head, TIMESTAMP_FORMAT))
+    except (OSError, ValueError, TypeError, KeyError):
+        return st.st_mtime
+
+
+class RotationPolicy:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE_HOURS * 3600, backups=DEFAULT_BACKUPS):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+
+    def should_rotate(self, size, started, incoming):
+        if size == 0:
+            return False
+        if self.max_bytes and size + incoming > self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - started >= self.max_age
+
+
+_compress_lock = threading.Lock()
+
+
+# Function to gzip a rotated segment and drop the oldest ones beyond the retention limit
+def compress_segments(path, backups=DEFAULT_BACKUPS):
+    with _compress_lock:
+        _compress_segments(path, backups)
+
+
+def _compress_segments(path, backups):
+    # Also picks up segments left uncompressed by an earlier process that exited mid-way
+    for segment in sorted(glob.glob(glob.escape(path) + ".[0-9]*")):
+        if segment.endswith((".gz", ".tmp", INDEX_SUFFIX)):
+            continue
+        try:
+            with open(segment, "rb") as source, gzip.open(segment + ".gz.tmp", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.replace(segment + ".gz.tmp", segment + ".gz")
+            os.remove(segment)
+        except OSError as e:
+            print(f"Could not compress log segment {segment}: {e}", file=sys.stderr)
+    segments = sorted(glob.glob(glob.escape(path) + ".[0-9]*.gz"))
+    for segment in segments[:max(0, len(segments) - backups)]:
+        for name in (segment, segment[:-len(".gz")] + INDEX_SUFFIX):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+
+# Function to read the last `count` records of a log without loading the whole file
+def tail_log(log_file, count=50, block_size=65536):
+    separator = SEPARATOR.encode("utf-8")
+    try:
+        with open(log_file, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            position = file.tell()
+            data = b""
+            while position > 0 and data.count(separator) <= count:
+                step = min(block_size, position)
+                position -= step
+                file.seek(position)
+                data = file.read(step) + data
+    except OSError:
+        return []
+    records = [r.strip("\n") for r in data.decode("utf-8", errors="replace").split(SEPARATOR)]
+    records = [r for r in records if r]
+    # The first piece may be a record cut in half by the block boundary
+    if position > 0 and records:
+        records = records[1:]
+    return records[-count:]
+
+
+class LogWriter:
+    def __init__(self, fsync_policy="interval", fsync_interval=1.0, max_batch=MAX_BATCH, queue_size=QUEUE_SIZE,
+                 rotation=None):
+        if fsync_policy not in FSYNC_POLICIES:
+            fsync_policy = "interval"
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self.rotation = rotation or RotationPolicy()
+        self.records = queue.Queue(maxsize=queue_size)
+        self.files = {}
+        # path -> [size in bytes, start time of the segment]
+        self.segments = {}
+        # events path -> index block being filled (see _add_to_block)
+        self.blocks = {}
+        self.rotations = 0
+        self._compressors = []
+        self.failed_paths = set()
+        self.written = 0
+        self.batches = 0
+        self._last_fsync = time.monotonic()
+        self._dirty = set()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="agent-log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path, text, meta=None):
+        """Queue text for path; meta ({"ts", "action", "repo", "lpar"}) marks an event to index."""
+        if self._closed:
+            # Late records after shutdown go straight to the file
+            self._write_batch([(path, text, meta)])
+            self._finish_blocks()
+            self._flush_files(fsync=True)
+            return
+        # Blocks when the writer falls far behind rather than dropping records
+        self.records.put((path, text, meta))
+
+    def flush(self, timeout=None):
+        """Wait until every record queued so far is written and flushed."""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self.records.put((None, done, None))
+        return done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush(timeout=10)
+        self._closed = True
+        self.records.put((None, None, None))
+        self._thread.join(timeout=10)
+        self._finish_blocks()
+        self._flush_files(fsync=True)
+        for file in self.files.values():
+            try:
+                file.close()
+            except OSError:
+                pass
+        self.files.clear()
+        for compressor in self._compressors:
+            compressor.join(timeout=30)
+
+    def _open(self, path):
+        file = self.files.get(path)
+        if file is None:
+            file = open(path, "a", encoding="utf-8", newline="")
+            st = os.fstat(file.fileno())
+            self.files[path] = file
+            self.segments[path] = [st.st_size, _segment_start(path, st)]
+        return file
+
+    def _close_file(self, path, keep_block=True):
+        if keep_block:
+            self._finish_block(path)
+        else:
+            self.blocks.pop(path, None)
+        file = self.files.pop(path, None)
+        self.segments.pop(path, None)
+        self._dirty.discard(path)
+        if file is not None:
+            try:
+                file.flush()
+                os.fsync(file.fileno())
+                file.close()
+            except OSError:
+                pass
+
+    def _check_rotated_elsewhere(self, path):
+        """Another process (a script next to the resident agent) may have rotated the file."""
+        file = self.files.get(path)
+        if file is None:
+            return
+        try:
+            if os.stat(path).st_ino == os.fstat(file.fileno()).st_ino:
+                return
+        except OSError:
+            pass
+        # The open block points into the file the other process renamed; drop it
+        self._close_file(path, keep_block=False)
+
+    def _add_to_block(self, path, file, meta):
+        block = self.blocks.get(path)
+        if block is None:
+            # Offsets come from the file itself, so records other processes
+            # appended in between are covered by the block's range too
+            file.flush()
+            block = {"offset": os.fstat(file.fileno()).st_size, "count": 0,
+                     "t_min": meta["ts"], "t_max": meta["ts"]}
+            for field in INDEXED_FIELDS:
+                block[field] = set()
+            self.blocks[path] = block
+        block["count"] += 1
+        block["t_min"] = min(block["t_min"], meta["ts"])
+        block["t_max"] = max(block["t_max"], meta["ts"])
+        for field in INDEXED_FIELDS:
+            if meta.get(field) is not None:
+                block[field].add(str(meta[field]))
+
+    def _finish_block(self, path):
+        block = self.blocks.pop(path, None)
+        file = self.files.get(path)
+        if block is None or file is None:
+            return
+        try:
+            file.flush()
+            block["length"] = os.fstat(file.fileno()).st_size - block["offset"]
+            for field in INDEXED_FIELDS:
+                block[field] = sorted(block[field])
+            with open(path + INDEX_SUFFIX, "a", encoding="utf-8") as index:
+                index.write(json.dumps(block, separators=(",", ":")) + "\n")
+        except OSError as e:
+            # Unindexed records are still found: queries scan past the last block
+            print(f"Could not write log index for {path}: {e}", file=sys.stderr)
+
+    def _finish_blocks(self):
+        for path in list(self.blocks):
+            self._finish_block(path)
+
+    def _rotate(self, path):
+        self._close_file(path)
+        # Microseconds keep the names unique and in rotation order when sorted
+        rotated = f"{path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            rotated = f"{path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        try:
+            os.replace(path, rotated)
+        except OSError as e:
+            print(f"Could not rotate log file {path}: {e}", file=sys.stderr)
+            return
+        if os.path.exists(path + INDEX_SUFFIX):
+            # The block index travels with its segment
+            try:
+                os.replace(path + INDEX_SUFFIX, rotated + INDEX_SUFFIX)
+            except OSError:
+                pass
+        self.rotations += 1
+        # Compression runs off the writer thread so logging never waits for gzip
+        self._compressors = [c for c in self._compressors if c.is_alive()]
+        compressor = threading.Thread(target=compress_segments, args=(path, self.rotation.backups),
+                                      name="agent-log-compress", daemon=True)
+        compressor.start()
+        self._compressors.append(compressor)
+
+    def _write_batch(self, batch):
+        for path in {record[0] for record in batch}:
+            self._check_rotated_elsewhere(path)
+        for path, text, meta in batch:
+            try:
+                file = self._open(path)
+                segment = self.segments[path]
+                size = len(text.encode("utf-8"))
+                if self.rotation.should_rotate(segment[0], segment[1], size):
+                    self._rotate(path)
+                    file = self._open(path)
+                    segment = self.segments[path]
+                if meta is not None:
+                    self._add_to_block(path, file, meta)
+                file.write(text)
+                segment[0] += size
+                if meta is not None and self.blocks[path]["count"] >= BLOCK_RECORDS:
+                    self._finish_block(path)
+                self._dirty.add(path)
+                self.written += 1
+            except OSError as e:
+                # Report a bad log path once instead of on every record
+                if path not in self.failed_paths:
+                    self.failed_paths.add(path)
+                    print(f"Could not write log file {path}: {e}", file=sys.stderr)
+        self.batches += 1
+
+    def _flush_files(self, fsync=False):
+        for path in list(self._dirty):
+            file = self.files.get(path)
+            if file is None:
+                continue
+            try:
+                file.flush()
+                if fsync:
+                    os.fsync(file.fileno())
+            except OSError:
+                pass
+        if fsync:
+            self._dirty.clear()
+            self._last_fsync = time.monotonic()
+
+    def _should_fsync(self):
+        if self.fsync_policy == "always":
+            return True
+        if self.fsync_policy == "interval":
+            return time.monotonic() - self._last_fsync >= self.fsync_interval
+        return False
+
+    def _run(self):
+        while True:
+            # With unsynced data pending, wake up in time to honour the fsync interval
+            timeout = self.fsync_interval if (self._dirty and self.fsync_policy == "interval") else None
+            try:
+                path, item, meta = self.records.get(timeout=timeout)
+            except queue.Empty:
+                self._flush_files(fsync=True)
+                continue
+            batch, waiters, stop = [], [], False
+            while True:
+                if path is None:
+                    if item is None:
+                        stop = True
+                    else:
+                        waiters.append(item)
+                else:
+                    batch.append((path, item, meta))
+                if stop or len(batch) >= self.max_batch:
+                    break
+                try:
+                    # Someone is waiting on a flush: write what is there without lingering
+                    path, item, meta = self.records.get(block=not waiters, timeout=BATCH_WAIT)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+            self._flush_files(fsync=self._should_fsync() or (stop and self.fsync_policy != "never"))
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                self._finish_blocks()
+                return
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _env_number(name, default):
+    try:
+        return max(0, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+# Function to get the process-wide log writer, starting it on first use
+def get_log_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            try:
+                interval = float(os.environ.get("AGENT_LOG_FSYNC_INTERVAL", "1"))
+            except ValueError:
+                interval = 1.0
+            rotation = RotationPolicy(
+                _env_number("AGENT_LOG_MAX_BYTES", DEFAULT_MAX_BYTES),
+                _env_number("AGENT_LOG_MAX_AGE", DEFAULT_MAX_AGE_HOURS) * 3600,
+                _env_number("AGENT_LOG_BACKUPS", DEFAULT_BACKUPS),
+            )
+            _writer = LogWriter(os.environ.get("AGENT_LOG_FSYNC", "interval"), interval, rotation=rotation)
+            atexit.register(_writer.close)
+        return _writer
+
+
+def events_path(log_file):
+    """internet_connection_log.txt -> internet_connection_log.events.jsonl"""
+    return os.path.splitext(os.path.abspath(log_file))[0] + EVENTS_SUFFIX
+
+
+# Function to queue one log record; returns the timestamped line for callers that also print it
+def append_log(message, log_file, **fields):
+    now = time.time()
+    log_message = format_record(message, datetime.fromtimestamp(now).strftime(TIMESTAMP_FORMAT))
+    # Resolve now: the caller may chdir before the writer gets to the record
+    writer = get_log_writer()
+    writer.write(os.path.abspath(log_file), log_message + SEPARATOR)
+    if os.environ.get("AGENT_LOG_EVENTS", "1") != "0":
+        event = {"ts": round(now, 3), "message": str(message)}
+        event.update((key, value) for key, value in fields.items() if value is not None)
+        meta = {"ts": event["ts"]}
+        meta.update((field, event.get(field)) for field in INDEXED_FIELDS)
+        writer.write(events_path(log_file), json.dumps(event, default=str) + "\n", meta)
+    return log_message
+
+
+def _to_epoch(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return value.timestamp()
+
+
+def _matches(event, since, until, filters):
+    if since is not None and event.get("ts", 0) < since:
+        return False
+    if until is not None and event.get("ts", 0) > until:
+        return False
+    return all(str(event.get(field)) == str(value) for field, value in filters.items())
+
+
+def _block_matches(block, since, until, filters):
+    if since is not None and block["t_max"] < since:
+        return False
+    if until is not None and block["t_min"] > until:
+        return False
+    for field, value in filters.items():
+        if field in INDEXED_FIELDS and str(value) not in block.get(field, ()):
+            return False
+    return True
+
+
+def _read_index(index_path):
+    blocks = []
+    try:
+        with open(index_path, "r", encoding="utf-8") as index:
+            for line in index:
+                try:
+                    blocks.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return blocks
+
+
+def _query_segment(segment, since, until, filters):
+    """Matching events of one events file (plain or gzipped), reading only the blocks that can match."""
+    index_path = (segment[:-len(".gz")] if segment.endswith(".gz") else segment) + INDEX_SUFFIX
+    blocks = _read_index(index_path)
+    # Records after the last indexed block (still being filled, or from a process that died) are always read
+    indexed_end = max((b["offset"] + b["length"] for b in blocks), default=0)
+    ranges = [(b["offset"], b["offset"] + b["length"]) for b in blocks if _block_matches(b, since, until, filters)]
+    ranges.append((indexed_end, None))
+
+    events, seen = [], set()
+    opener = gzip.open if segment.endswith(".gz") else open
+    try:
+        with opener(segment, "rb") as file:
+            for start, end in sorted(ranges, key=lambda r: r[0]):
+                file.seek(start)
+                position = start
+                for line in file:
+                    if end is not None and position >= end:
+                        break
+                    offset, position = position, position + len(line)
+                    if offset in seen:
+                        continue
+                    seen.add(offset)
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if _matches(event, since, until, filters):
+                        events.append(event)
+    except OSError:
+        pass
+    return events
+
+
+# Function to find logged events by time range and fields (action, repo, branch, lpar, step, outcome)
+def query_events(log_file, since=None, until=None, include_rotated=True, **filters):
+    """
+    Return the matching events, oldest first. since/until are epoch seconds
+    or datetimes; e.g. query_events(LOG_FILE, since=week_ago, action="build", lpar="gmsmf").
+    """
+    since, until = _to_epoch(since), _to_epoch(until)
+    filters = {field: value for field, value in filters.items() if value is not None}
+    path = events_path(log_file)
+    segments = sorted(glob.glob(glob.escape(path) + ".[0-9]*.gz")) if include_rotated else []
+    events = []
+    for segment in segments + [path]:
+        if not os.path.exists(segment):
+            continue
+        if segment != path:
+            # Skip whole rotated segments whose index says they are out of range
+            blocks = _read_index(segment[:-len(".gz")] + INDEX_SUFFIX)
+            if blocks and not any(_block_matches(b, since, until, filters) for b in blocks):
+                continue
+        events.extend(_query_segment(segment, since, until, filters))
+    events.sort(key=lambda event: event.get("ts", 0))
+    return events
+
+
+# Function to wait until everything logged so far is on disk
+def flush_logs(timeout=None):
+    if _writer is not None:
+        return _writer.flush(timeout)
+    return True
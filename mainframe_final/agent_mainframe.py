@@ -6,6 +6,8 @@ import yaml
 import shutil
 
 SERVER_URL = "http://10.190.226.6:8000/repository"
+# Server answers handle_server_command acts on
+SERVER_ACTIONS = ("git_automation",)
 
 import platform
 import os
@@ -14,6 +16,15 @@ import shutil
 import paramiko
 from getpass import getpass
 import subprocess
+from repo_index import find_file
+from sftp_sync import sync_directory
+from sftp_transfer import DEFAULT_CONCURRENCY, get_transfer_concurrency
+from tar_upload import tar_upload_directory
+from agent_trace import traced
+from config_cache import load_yaml
+from http_client import get_http_client
+from action_planner import Plan, StepFailed, format_results
+from intent_cache import get_intent_cache, model_version_of
 
 
 # Function to read the YAML configuration file
@@ -21,18 +32,36 @@ def load_config(yaml_file='vscode_extension.yaml'):  # Default file name
     script_dir = os.path.dirname(os.path.realpath(__file__))  # Get the directory of the running script
     yaml_path = os.path.join(script_dir, yaml_file)  # Construct the full path to the YAML file
     if os.path.exists(yaml_path):
-        with open(yaml_path, 'r') as file:
-            config = yaml.safe_load(file)
-        return config
+        # Parsed once per process; parsed again only when the file's mtime or size changes
+        return load_yaml(yaml_path)
     else:
         raise FileNotFoundError(f"Configuration file '{yaml_file}' not found at path: {yaml_path}")
 
 
+# Function to run a command away from the terminal: it cannot read stdin, and its output is
+# printed through sys.stdout so a background plan step's buffer collects it
+def run_captured(command, check=False, env=None):
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, env=env)
+    if result.stdout:
+        print(result.stdout.rstrip("\n"))
+    if check and result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, command, result.stdout)
+    return result
+
+
+# Function to get the environment for git in a background step: missing credentials fail instead of prompting
+def git_background_env():
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    env.setdefault("GIT_SSH_COMMAND", "ssh -o BatchMode=yes")
+    return env
+
+
 # Function to check if VSCode is installed on Windows
 def open_vscode_windows():
     config = load_config()  # Read YAML config
     try:
-        subprocess.run(["powershell", "-Command", "code"])
+        subprocess.run(["powershell", "-Command", "code"], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         return "VSCode has been launched on Windows."
     except FileNotFoundError:
         print("VSCode not found. Opening the download page and displaying installation instructions.")
@@ -47,7 +76,7 @@ def open_vscode_windows():
 def open_vscode_mac():
     config = load_config()  # Read YAML config
     try:
-        subprocess.run(["open", "-a", "Visual Studio Code"])
+        subprocess.run(["open", "-a", "Visual Studio Code"], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         return "VSCode has been launched on Mac."
     except FileNotFoundError:
         print("VSCode not found. Opening the download page and displaying installation instructions.")
@@ -61,7 +90,7 @@ def open_vscode_mac():
 def open_vscode_linux():
     config = load_config()  # Read YAML config
     try:
-        subprocess.run(["code"])  # Linux command to open VSCode
+        subprocess.run(["code"], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)  # Linux command to open VSCode
         return "VSCode has been launched on Linux."
     except FileNotFoundError:
         print("VSCode not found. Opening the download page and displaying installation instructions.")
@@ -115,9 +144,8 @@ def check_internet_connection():
 def load_extensions_from_yaml(file_path):
     """Loads the list of required extensions from the YAML file."""
     try:
-        with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
-            return data.get('required_extensions', [])
+        data = load_yaml(file_path)
+        return data.get('required_extensions', [])
     except FileNotFoundError:
         print(f"YAML file not found at {file_path}")
         return []
@@ -130,11 +158,12 @@ def load_extensions_from_yaml(file_path):
 def get_installed_extensions():
     """Returns a list of installed VSCode extensions."""
     try:
-        result = subprocess.run(['code', '--list-extensions'], stdout=subprocess.PIPE, text=True, check=True)
+        result = subprocess.run(['code', '--list-extensions'], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True, check=True)
         installed_extensions = result.stdout.splitlines()
         return installed_extensions
     except subprocess.CalledProcessError as e:
-        print(f"Error listing extensions: {e}")
+        print(f"Error listing extensions: {e} {e.stderr.strip()}")
         return []
 
 
@@ -143,7 +172,7 @@ def install_extension(extension):
     """Installs the given VSCode extension."""
     try:
         print(f"Installing extension: {extension}")
-        subprocess.run(['code', '--install-extension', extension, '--force'], check=True)
+        run_captured(['code', '--install-extension', extension, '--force'], check=True)
         print(f"Extension {extension} installed successfully.")
     except subprocess.CalledProcessError as e:
         print(f"Error installing extension {extension}: {e}")
@@ -179,18 +208,20 @@ def open_in_vscode(file_path):
         print(f"Error opening file in VSCode: {e}")
 
 # Clone the repository
+@traced("git")
 def clone_repo(repo_url, clone_path):
     try:
-        subprocess.run(['git', 'clone', repo_url, clone_path], check=True)
+        run_captured(['git', 'clone', repo_url, clone_path], check=True, env=git_background_env())
         print(f"Repository cloned successfully to {clone_path}.")
     except subprocess.CalledProcessError as e:
         print(f"Error cloning repository: {e}")
 
 
 # Pull the latest changes from the repository
+@traced("git")
 def pull_latest_changes(repo_path):
     try:
-        subprocess.run(['git', '-C', repo_path, 'pull'], check=True)
+        run_captured(['git', '-C', repo_path, 'pull'], check=True, env=git_background_env())
         print("Latest changes pulled successfully.")
     except subprocess.CalledProcessError as e:
         print(f"Error pulling latest changes: {e}")
@@ -216,10 +247,7 @@ def checkout_branch(repo_path, branch_name):
 
 # Function to find a file recursively in a repository
 def find_file_in_repo(repo_path, file_name):
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return None
+    return find_file(repo_path, file_name)
 
 
 # Push the new branch to GitHub
@@ -233,6 +261,7 @@ def push_branch(repo_path, branch_name):
 
 
 # Establish SSH connection and get mainframe's current working directory
+@traced("ssh")
 def create_ssh_connection(hostname, port, username, password):
     ssh = paramiko.SSHClient()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -272,19 +301,14 @@ def check_and_create_directories(ssh, mainframe_pwd, application, workspace_name
         return None, None
 
 
-# Function to find a file recursively in a repository
-def find_file_in_repo(repo_path, file_name):
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return None
-
 # Check if Git Repository is Present; if not, Clone
 # Adjust `check_or_clone_repository` to enforce GitHub cloning
+@traced("git")
 def check_or_clone_repository(ssh, repo_url, application_path):
     """
     Check if a Git repository exists on the mainframe.
     If not, clone the repository. If it exists, pull the latest changes.
+    Returns True when the clone or pull succeeded, False otherwise.
     """
     try:
         # Check if the repository already exists
@@ -305,8 +329,9 @@ def check_or_clone_repository(ssh, repo_url, application_path):
             stdin, stdout, stderr = ssh.exec_command(clone_command)
             clone_output = stdout.read().decode().strip()
             clone_error = stderr.read().decode().strip()
-            if clone_error:
-                raise Exception(f"Clone error: {clone_error}")
+            # git reports progress on stderr, so the exit status decides
+            if stdout.channel.recv_exit_status() != 0:
+                raise Exception(f"Clone error: {clone_error or clone_output}")
             print("Repository cloned successfully.")
         else:
             print(f"Repository already exists at {application_path}. Pulling latest changes...")
@@ -321,11 +346,13 @@ def check_or_clone_repository(ssh, repo_url, application_path):
             stdin, stdout, stderr = ssh.exec_command(pull_command)
             pull_output = stdout.read().decode().strip()
             pull_error = stderr.read().decode().strip()
-            if pull_error:
-                raise Exception(f"Pull error: {pull_error}")
+            if stdout.channel.recv_exit_status() != 0:
+                raise Exception(f"Pull error: {pull_error or pull_output}")
             print("Latest changes pulled successfully.")
+        return True
     except Exception as e:
         print(f"Error during repository setup: {e}")
+        return False
 
 
 
@@ -345,6 +372,7 @@ def git_pull_and_checkout(ssh, application_path, branch_name):
         print(f"Git pull or checkout failed: {e}")
 
 # Search for the Absolute Path of the Source File Dynamically
+@traced("ssh")
 def find_source_file(ssh, application_path, filename):
     try:
         print(f"Searching for '{filename}' in '{application_path}'...")
@@ -383,6 +411,7 @@ def find_source_file(ssh, application_path, filename):
 
 # Updated run_mainframe_commands to dynamically handle folder_name
 # Run mainframe commands and log messages to a file
+@traced("groovyz")
 def run_mainframe_commands(ssh, hlq, application, filename, file_path, config, workspace, outdir):
     try:
         folder_name = os.path.dirname(file_path) if file_path else ""
@@ -437,28 +466,20 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, config, w
 
 
 # Upload directory recursively to the mainframe
-def upload_directory_to_mainframe(sftp, local_path, remote_path):
+def upload_directory_to_mainframe(sftp, local_path, remote_path, concurrency=None, mode="delta", lpar_details=None):
+    # Unless given, the channel count comes from the LPAR's sftp_concurrency in timeout_dynamic.yaml
+    if concurrency is None:
+        concurrency = get_transfer_concurrency(lpar_details, DEFAULT_CONCURRENCY)
     try:
-        for root, dirs, files in os.walk(local_path):
-            # Skip `.git` directories
-            if '.git' in root:
-                continue
-
-            # Translate local path to remote path
-            relative_path = os.path.relpath(root, local_path)
-            remote_dir = os.path.join(remote_path, relative_path).replace("\\", "/")
-            
-            try:
-                sftp.mkdir(remote_dir)
-                print(f"Created remote directory: {remote_dir}")
-            except IOError:  # Directory already exists
-                print(f"Remote directory already exists: {remote_dir}")
-            
-            for file in files:
-                local_file = os.path.join(root, file)
-                remote_file = os.path.join(remote_dir, file).replace("\\", "/")
-                sftp.put(local_file, remote_file)
-                print(f"Uploaded file: {local_file} to {remote_file}")
+        if mode == "tar":
+            # First-time seeding: the whole tree as one gzip tar stream; see tar_upload.py
+            stats = tar_upload_directory(sftp, local_path, remote_path)
+        else:
+            # Only new or changed files are sent, over `concurrency` SFTP channels; see sftp_sync.py
+            stats = sync_directory(sftp, local_path, remote_path, concurrency=concurrency)
+        print(f"Upload complete: {stats['uploaded']} uploaded, {stats['deleted']} removed, "
+              f"{stats['unchanged']} unchanged ({stats['bytes']} bytes).")
+        return stats
     except Exception as e:
         print(f"Error uploading directory: {e}")
 
@@ -483,191 +504,250 @@ def handle_server_command(action, config_path):
     os_name = platform.system()
     print(f"Detected OS: {os_name}")
 
-    # Step 1: Open VSCode based on OS
-    if os_name == "Windows":
-        message = open_vscode_windows()
-    elif os_name == "Darwin":  # macOS
-        message = open_vscode_mac()
-    elif os_name == "Linux":  # Linux
-        message = open_vscode_linux()
-    else:
-        print(f"Your operating system ({os_name}) is not supported. Currently, only Windows, macOS, and Linux are supported.")
-        return
+    # The flow is a dependency graph (see action_planner.py): steps that do not depend on each
+    # other run concurrently, and steps that prompt the user run one at a time on this thread
+    plan = Plan()
+    connections = []
 
-    print(message)
-
-
-    #Step 2: Check internet connection
-    if not check_internet_connection():
-        print("No internet. Please check your connection and try again.")
-        return
-
-    # Step 3: Load extensions from YAML and check/install them
-    yaml_file = 'vscode_extension.yaml'  # Ensure this is the correct path to your YAML file
-    required_extensions = load_extensions_from_yaml(yaml_file)
-    if not required_extensions:
-        print("No extensions found in the YAML file.")
-        return
-
-    # Get installed extensions
-    installed_extensions = get_installed_extensions()
-
-    # Install missing extensions
-    for extension in required_extensions:
-        if extension not in installed_extensions:
-            print(f"Extension {extension} is not installed. Installing...")
-            install_extension(extension)
-        else:
-            print(f"Extension {extension} is already installed.")
-
-    # Verify installations
-    print("\nVerifying installed extensions...")
-    installed_extensions = get_installed_extensions()
-    for extension in required_extensions:
-        if extension in installed_extensions:
-            print(f"Extension {extension} is installed and verified.")
+    # Step 1: Open VSCode based on OS
+    def open_vscode():
+        if os_name == "Windows":
+            message = open_vscode_windows()
+        elif os_name == "Darwin":  # macOS
+            message = open_vscode_mac()
+        elif os_name == "Linux":  # Linux
+            message = open_vscode_linux()
         else:
-            print(f"Extension {extension} is still not installed.")
-
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    config_path = os.path.join(current_dir, 'pull_clone.yaml')
-    print(f"Looking for YAML configuration at: {config_path}")
-    # Step 4: Pull/clone the repository locally
-
-    ssh_config = load_config("timeout_dynamic.yaml")
-    config_path = "application_details.yaml"
-    config = load_config(config_path)
-    if config is None:
-        print("Error loading configuration.")
-        return
+            raise StepFailed(f"Your operating system ({os_name}) is not supported. Currently, only Windows, macOS, and Linux are supported.")
+        print(message)
+        return message
+
+    # Step 2: Check internet connection
+    def internet():
+        if not check_internet_connection():
+            raise StepFailed("No internet. Please check your connection and try again.")
+        return True
 
-    git_url = config['repositories']['git_url']
-    workspace_path = input("Enter the VS Code workspace path (press enter to use the current directory): ") or current_dir
-    repo_name = input("Enter the repository name: ")
-    repo_url = f"{git_url}/{repo_name}.git"
-    clone_path = os.path.join(workspace_path, repo_name)
+    # Step 3: Load extensions from YAML and check/install them
+    def extensions(*_):
+        yaml_file = 'vscode_extension.yaml'  # Ensure this is the correct path to your YAML file
+        required_extensions = load_extensions_from_yaml(yaml_file)
+        if not required_extensions:
+            raise StepFailed("No extensions found in the YAML file.")
+
+        # Get installed extensions
+        installed_extensions = get_installed_extensions()
+
+        # Install missing extensions
+        for extension in required_extensions:
+            if extension not in installed_extensions:
+                print(f"Extension {extension} is not installed. Installing...")
+                install_extension(extension)
+            else:
+                print(f"Extension {extension} is already installed.")
+
+        # Verify installations
+        print("\nVerifying installed extensions...")
+        installed_extensions = get_installed_extensions()
+        for extension in required_extensions:
+            if extension in installed_extensions:
+                print(f"Extension {extension} is installed and verified.")
+            else:
+                print(f"Extension {extension} is still not installed.")
+        return installed_extensions
 
-    if not os.path.isdir(clone_path):
-        print(f"Cloning repository from {repo_url} to {clone_path}...")
-        clone_repo(repo_url, clone_path)
-    else:
+    # Step 4: Ask for the repository to pull/clone locally
+    def repository():
+        print(f"Looking for YAML configuration at: {os.path.join(current_dir, 'pull_clone.yaml')}")
+        config = load_config("application_details.yaml")
+        if config is None:
+            raise StepFailed("Error loading configuration.")
+
+        git_url = config['repositories']['git_url']
+        workspace_path = input("Enter the VS Code workspace path (press enter to use the current directory): ") or current_dir
+        repo_name = input("Enter the repository name: ")
+        return {
+            "config": config,
+            "repo_url": f"{git_url}/{repo_name}.git",
+            "clone_path": os.path.join(workspace_path, repo_name),
+        }
+
+    # A folder in the way is only deleted with the user's permission
+    def clone_target(repo):
+        clone_path = repo["clone_path"]
+        if not os.path.isdir(clone_path):
+            return "clone"
         if is_git_repo(clone_path):
+            return "pull"
+        print(f"The path '{clone_path}' exists but is not a Git repository.")
+        if delete_folder(clone_path):
+            return "reclone"
+        raise StepFailed("Folder not deleted. Cannot proceed with cloning.")
+
+    # Pull/clone the repository locally
+    def clone(_, repo, mode):
+        repo_url, clone_path = repo["repo_url"], repo["clone_path"]
+        if mode == "pull":
             print(f"Repository already cloned at {clone_path}. Pulling latest changes...")
             pull_latest_changes(clone_path)
         else:
-            print(f"The path '{clone_path}' exists but is not a Git repository.")
-            if delete_folder(clone_path):
-                print(f"Re-cloning repository from {repo_url} to {clone_path}...")
-                clone_repo(repo_url, clone_path)
-            else:
-                print("Folder not deleted. Cannot proceed with cloning.")
-                return
+            print(f"{'Re-cloning' if mode == 'reclone' else 'Cloning'} repository from {repo_url} to {clone_path}...")
+            clone_repo(repo_url, clone_path)
+        if not is_git_repo(clone_path):
+            raise StepFailed(f"No repository at {clone_path}.")
+        return clone_path
 
     # Step 5: Manage branches
-    branches = list_branches(clone_path)
-    if branches:
+    def branches(clone_path):
+        branches = list_branches(clone_path)
+        if not branches:
+            print("No branches found.")
+            return None
         print("Available branches:")
         for i, branch in enumerate(branches, start=1):
             print(f"{i}. {branch}")
-        action = input("Do you want to checkout an existing branch or create a new one? (enter 'existing' or 'new'): ").lower()
+        choice = input("Do you want to checkout an existing branch or create a new one? (enter 'existing' or 'new'): ").lower()
 
-        if action == 'existing':
+        if choice == 'existing':
             branch_num = int(input(f"Enter the branch number you want to checkout (1-{len(branches)}): "))
             if 1 <= branch_num <= len(branches):
                 branch_name = branches[branch_num - 1].strip()
                 checkout_branch(clone_path, branch_name)
-            else:
-                print("Invalid branch number.")
-        elif action == 'new':
+                return branch_name
+            print("Invalid branch number.")
+        elif choice == 'new':
             new_branch_name = input("Enter the name of the new branch: ")
             subprocess.run(['git', '-C', clone_path, 'checkout', '-b', new_branch_name], check=True)
             print(f"Created and switched to new branch '{new_branch_name}'.")
 
             # Push the new branch to GitHub
             push_branch(clone_path, new_branch_name)
-    else:
-        print("No branches found.")
+            return new_branch_name
+        return None
 
     # Step 6: Handle file operations
-    file_name = input("Enter the name of the file you want to open (including extension): ")
-    file_path = find_file_in_repo(clone_path, file_name)
-
-    if file_path:
-        print(f"Opening file {file_path} in VSCode...")
-        open_in_vscode(file_path)
+    def file_changes(clone_path, _):
+        file_name = input("Enter the name of the file you want to open (including extension): ")
+        file_path = find_file_in_repo(clone_path, file_name)
 
-        # Make changes to the file
-        input("Edit the file in VSCode, save changes, and press Enter to continue...")
-
-        # Commit and push changes to GitHub
-        commit_message = input("Enter commit message for your changes: ")
-        try:
-            subprocess.run(['git', '-C', clone_path, 'add', file_path], check=True)
-            subprocess.run(['git', '-C', clone_path, 'commit', '-m', commit_message], check=True)
-            subprocess.run(['git', '-C', clone_path, 'push'], check=True)
-            print("Changes pushed to the remote repository successfully.")
-        except subprocess.CalledProcessError as e:
-            print(f"Error pushing changes: {e}")
-            return
-    else:
-        create_file = input(f"File {file_name} not found in the repository at {clone_path}. Do you want to create the file? (yes/no): ").lower()
-        if create_file == 'yes':
-            file_path = os.path.join(clone_path, file_name)
-            open(file_path, 'w').close()
-            print(f"File {file_name} created.")
+        if file_path:
+            print(f"Opening file {file_path} in VSCode...")
             open_in_vscode(file_path)
-        else:
-            print("Operation canceled. Exiting.")
-
-    # Step 7: Clone updated repository to the mainframe
-    lpar_list = list(ssh_config.keys())
-    print("Available Mainframe LPARs:")
-    for idx, lpar in enumerate(lpar_list):
-        print(f"{idx + 1}. {lpar}")
-
-    selected_idx = int(input("Select your target LPAR by number: ")) - 1
-    selected_lpar = lpar_list[selected_idx]
-    lpar_details = ssh_config[selected_lpar]
 
-    app_list = [config['repositories']['git_Application']]
-    print("Available applications:")
-    for idx, app in enumerate(app_list):
-        print(f"{idx + 1}. {app}")
+            # Make changes to the file
+            input("Edit the file in VSCode, save changes, and press Enter to continue...")
 
-    app_idx = int(input("Select your application by number: ")) - 1
-    application_name = app_list[app_idx]
-    main_build_branch = config['repositories']['main_build_branch']
-
-    hostname = lpar_details.get('mfip')
-    port = int(lpar_details.get('sshport', 22))
-    username = input("Enter your username: ")
-    password = getpass("Enter your password: ")
-    hlq = input("Enter your HLQ: ")
-
-    ssh_client, mainframe_pwd = create_ssh_connection(hostname, port, username, password)
+            # Commit and push changes to GitHub
+            commit_message = input("Enter commit message for your changes: ")
+            try:
+                subprocess.run(['git', '-C', clone_path, 'add', file_path], check=True)
+                subprocess.run(['git', '-C', clone_path, 'commit', '-m', commit_message], check=True)
+                subprocess.run(['git', '-C', clone_path, 'push'], check=True)
+                print("Changes pushed to the remote repository successfully.")
+            except subprocess.CalledProcessError as e:
+                raise StepFailed(f"Error pushing changes: {e}")
+        else:
+            create_file = input(f"File {file_name} not found in the repository at {clone_path}. Do you want to create the file? (yes/no): ").lower()
+            if create_file == 'yes':
+                file_path = os.path.join(clone_path, file_name)
+                open(file_path, 'w').close()
+                print(f"File {file_name} created.")
+                open_in_vscode(file_path)
+            else:
+                print("Operation canceled. Exiting.")
+        return file_path
+
+    # Step 7: Choose the target LPAR and application; asked up front so the SSH login overlaps the local git steps
+    def mainframe(repo):
+        ssh_config = load_config("timeout_dynamic.yaml")
+        lpar_list = list(ssh_config.keys())
+        print("Available Mainframe LPARs:")
+        for idx, lpar in enumerate(lpar_list):
+            print(f"{idx + 1}. {lpar}")
+
+        selected_idx = int(input("Select your target LPAR by number: ")) - 1
+        selected_lpar = lpar_list[selected_idx]
+        lpar_details = ssh_config[selected_lpar]
+
+        app_list = [repo["config"]['repositories']['git_Application']]
+        print("Available applications:")
+        for idx, app in enumerate(app_list):
+            print(f"{idx + 1}. {app}")
+
+        app_idx = int(input("Select your application by number: ")) - 1
+        return {
+            "lpar_details": lpar_details,
+            "application_name": app_list[app_idx],
+            "hostname": lpar_details.get('mfip'),
+            "port": int(lpar_details.get('sshport', 22)),
+            "username": input("Enter your username: "),
+            "password": getpass("Enter your password: "),
+            "hlq": input("Enter your HLQ: "),
+        }
+
+    def connect(target):
+        ssh_client, mainframe_pwd = create_ssh_connection(target["hostname"], target["port"], target["username"], target["password"])
+        if ssh_client is not None:
+            connections.append(ssh_client)
+        if not ssh_client or not mainframe_pwd:
+            raise StepFailed(f"Could not connect to {target['hostname']}:{target['port']}.")
+        return ssh_client, mainframe_pwd
+
+    def mainframe_workspace(connection, target):
+        ssh_client, mainframe_pwd = connection
+        workspace_name = "sandbox1"
+        workspace_path, application_path = check_and_create_directories(
+            ssh_client, mainframe_pwd, target["application_name"], workspace_name
+        )
+        if not workspace_path or not application_path:
+            raise StepFailed("Could not create the mainframe workspace.")
+        return {"workspace_path": workspace_path, "application_path": application_path, "outdir": f"{mainframe_pwd}/outdir"}
+
+    # Clone updated repository to the mainframe, once the local changes are pushed
+    def mainframe_repository(connection, workspace, repo, _):
+        if not check_or_clone_repository(connection[0], repo["repo_url"], workspace["application_path"]):
+            raise StepFailed(f"Could not clone or pull {repo['repo_url']} into {workspace['application_path']}.")
+        return workspace["application_path"]
+
+    def build(connection, target, workspace, application_path):
+        ssh_client = connection[0]
+        filename = input("Enter the filename: ")
+        file_path = find_source_file(ssh_client, application_path, filename)
+        if not file_path:
+            raise StepFailed(f"{filename} not found in {application_path}.")
+        output, error_output = run_mainframe_commands(
+            ssh_client, target["hlq"], target["application_name"], filename, file_path,
+            target["lpar_details"], workspace["workspace_path"], workspace["outdir"]
+        )
+        analyze_build_logs(output, error_output)
+        return output, error_output
+
+    plan.add("open_vscode", open_vscode)
+    plan.add("internet", internet)
+    plan.add("extensions", extensions, requires=("open_vscode", "internet"))
+    plan.add("repository", repository, interactive=True)
+    plan.add("clone_target", clone_target, requires=("repository",), interactive=True)
+    plan.add("clone", clone, requires=("internet", "repository", "clone_target"))
+    plan.add("mainframe", mainframe, requires=("repository",), interactive=True)
+    plan.add("connect", connect, requires=("mainframe",))
+    plan.add("mainframe_workspace", mainframe_workspace, requires=("connect", "mainframe"))
+    plan.add("branches", branches, requires=("clone",), interactive=True)
+    plan.add("file_changes", file_changes, requires=("clone", "branches"), interactive=True)
+    plan.add("mainframe_repository", mainframe_repository,
+             requires=("connect", "mainframe_workspace", "repository", "file_changes"))
+    plan.add("build", build, requires=("connect", "mainframe", "mainframe_workspace", "mainframe_repository"),
+             interactive=True)
 
-    if ssh_client and mainframe_pwd:
-        sftp = ssh_client.open_sftp()
-        try:
-            workspace_name = "sandbox1"
-            outdir = f"{mainframe_pwd}/outdir"
-            workspace_path, application_path = check_and_create_directories(
-                ssh_client, mainframe_pwd, application_name, workspace_name
-            )
-
-            if workspace_path and application_path:
-                check_or_clone_repository(ssh_client, repo_url, application_path)
-                filename = input("Enter the filename: ")
-                file_path = find_source_file(ssh_client, application_path, filename)
-
-                if file_path:
-                    output, error_output = run_mainframe_commands(
-                        ssh_client, hlq, application_name, filename, file_path, lpar_details, workspace_path, outdir
-                    )
-                    analyze_build_logs(output, error_output)
-        finally:
-            sftp.close()
+    try:
+        results = plan.run()
+    finally:
+        for ssh_client in connections:
             ssh_client.close()
+    print(format_results(results))
+
+    if not results["repository"].ok:
+        return
+    clone_path = results["repository"].value["clone_path"]
 
     if action == "git_automation":
         if not os.path.isdir(clone_path):
@@ -694,19 +774,31 @@ def handle_server_command(action, config_path):
 
 def main():
     config_path = os.path.join(os.getcwd(), 'pull_clone.yaml')
+    # Only answers handle_server_command can act on are cached
+    intent_cache = get_intent_cache(actions=SERVER_ACTIONS)
 
     while True:
         try:
             user_query = input("Enter your query :")
-            response = requests.post(SERVER_URL, json={"query": user_query})
-            if response.status_code == 200:
+        except EOFError:
+            break
+        try:
+            # Phrases seen before are answered from the local cache without a round trip
+            action = intent_cache.get(user_query)
+            if action is None:
+                # Pooled keep-alive session with timeouts and retries; the next prompt follows straight away
+                response = get_http_client().post_json(SERVER_URL, {"query": user_query})
+                if response.status_code != 200:
+                    print(f"Server returned an error: {response.status_code}")
+                    continue
                 action = response.json().get("action")
-                handle_server_command(action, config_path)
-            else:
-                print(f"Server returned an error: {response.status_code}")
+                intent_cache.set_model_version(model_version_of(response))
+                intent_cache.put(user_query, action)
+            handle_server_command(action, config_path)
         except Exception as e:
             print(f"Error connecting to the server: {e}")
-        time.sleep(5)
+
+    print(intent_cache.summary())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,224 @@
+"""
+Span timing for the clone-to-build pipeline.
+
+Wrap a step in span() or decorate it with @traced to record how long it took,
+nested under whatever span is open on the same thread:
+
+    @traced("git")
+    def clone_repo(repo_url, clone_path, LOG_FILE): ...
+
+    with span("groovyz", "build", file=filename):
+        shell.run(uss_command)
+
+The category ("ssh", "git", "build", "fs", ...) is what the summary groups by,
+so a slow build shows whether the time went to SSH, git or groovyz.
+
+Tracing is off unless AGENT_TRACE=1; spans then cost one flag check. When on,
+the spans are written at exit to AGENT_TRACE_FILE (default
+agent_trace_<pid>.json in the working directory) in the Chrome trace-event
+format (open it in chrome://tracing or Perfetto), and the summary table is
+printed to stderr.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import threading
+
+
+class Span:
+    __slots__ = ("name", "category", "attrs", "start", "end", "thread_id", "parent", "child_time")
+
+    def __init__(self, name, category, attrs, parent):
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.parent = parent
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter_ns()
+        self.end = None
+        self.child_time = 0
+
+    @property
+    def duration(self):
+        return ((self.end or time.perf_counter_ns()) - self.start) / 1e9
+
+    def set(self, **attrs):
+        """Attach attributes once they are known (exit status, bytes sent, ...)."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.spans = []
+        self.origin = time.perf_counter_ns()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def begin(self, name, category, attrs):
+        stack = self._stack()
+        span = Span(name, category, attrs, stack[-1] if stack else None)
+        stack.append(span)
+        return span
+
+    def finish(self, span, error=None):
+        span.end = time.perf_counter_ns()
+        if error is not None:
+            span.attrs["error"] = f"{type(error).__name__}: {error}"
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        if span.parent is not None:
+            span.parent.child_time += span.end - span.start
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def chrome_trace(self):
+        """The recorded spans as a Chrome trace-event document."""
+        pid = os.getpid()
+        events = []
+        for span in list(self.spans):
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start - self.origin) / 1000.0,
+                "dur": (span.end - span.start) / 1000.0,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {key: _jsonable(value) for key, value in span.attrs.items()},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w") as file:
+            json.dump(self.chrome_trace(), file)
+        return path
+
+    def summary(self):
+        """Per (category, name): count, total, self time (minus child spans), mean and max, in seconds."""
+        rows = {}
+        for span in list(self.spans):
+            total = (span.end - span.start) / 1e9
+            row = rows.setdefault((span.category, span.name),
+                                  {"category": span.category, "name": span.name, "count": 0,
+                                   "total": 0.0, "self": 0.0, "max": 0.0})
+            row["count"] += 1
+            row["total"] += total
+            row["self"] += total - span.child_time / 1e9
+            row["max"] = max(row["max"], total)
+        for row in rows.values():
+            row["mean"] = row["total"] / row["count"]
+        return sorted(rows.values(), key=lambda row: row["total"], reverse=True)
+
+    def summary_table(self):
+        rows = self.summary()
+        lines = [f"{'category':<10} {'span':<34} {'count':>6} {'total s':>9} {'self s':>9} {'mean s':>9} {'max s':>9}"]
+        for row in rows:
+            lines.append(f"{row['category']:<10} {row['name'][:34]:<34} {row['count']:>6} {row['total']:>9.3f} "
+                         f"{row['self']:>9.3f} {row['mean']:>9.3f} {row['max']:>9.3f}")
+        # Self time per category is what adds up to wall time for a single thread
+        by_category = {}
+        for row in rows:
+            by_category[row["category"]] = by_category.get(row["category"], 0.0) + row["self"]
+        if by_category:
+            lines.append("")
+            lines.append("self time by category: " + ", ".join(
+                f"{category} {seconds:.3f}s" for category, seconds in
+                sorted(by_category.items(), key=lambda item: item[1], reverse=True)))
+        return "\n".join(lines)
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+class _NoSpan:
+    """Stands in for a span while tracing is off."""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _SpanContext:
+    __slots__ = ("name", "category", "attrs", "span")
+
+    def __init__(self, name, category, attrs):
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.span = None
+
+    def __enter__(self):
+        self.span = tracer.begin(self.name, self.category, self.attrs)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        tracer.finish(self.span, exc)
+        return False
+
+
+tracer = Tracer(enabled=os.environ.get("AGENT_TRACE", "0") not in ("", "0", "false", "no"))
+
+
+# Function to time a block of code as a span
+def span(name, category="agent", **attrs):
+    if not tracer.enabled:
+        return _NO_SPAN
+    return _SpanContext(name, category, attrs)
+
+
+# Decorator to time every call of a function as a span named after it
+def traced(category="agent", name=None, **attrs):
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with _SpanContext(span_name, category, dict(attrs)):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _export_at_exit():
+    if not tracer.spans:
+        return
+    path = os.environ.get("AGENT_TRACE_FILE") or os.path.join(os.getcwd(), f"agent_trace_{os.getpid()}.json")
+    try:
+        tracer.export_chrome_trace(path)
+        print(f"\nTrace written to {path}", file=sys.stderr)
+    except OSError as e:
+        print(f"\nCould not write trace file {path}: {e}", file=sys.stderr)
+    print(tracer.summary_table(), file=sys.stderr)
+
+
+if tracer.enabled:
+    atexit.register(_export_at_exit)
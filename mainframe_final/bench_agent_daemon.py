@@ -0,0 +1,102 @@
+"""
+Per-action latency: resident agent (agent_daemon.py) vs one process per script.
+
+Creates a throwaway local git repository and times checkout_branch_log and
+list_branch_log both ways: as `python3 <script>.py ...` (what the frontend
+does today) and as a JSON-RPC call to an already running agent.
+
+    python3 bench_agent_daemon.py --runs 20
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+from agent_daemon import AgentClient, DEFAULT_HOST, SCRIPT_DIR
+
+
+def make_repo(active_path, repo_name):
+    repo_path = os.path.join(active_path, repo_name)
+    os.makedirs(repo_path)
+    git = ['git', '-C', repo_path, '-c', 'user.name=bench', '-c', 'user.email=bench@localhost']
+    subprocess.run(git + ['init', '-q'], check=True)
+    with open(os.path.join(repo_path, "hello.cbl"), "w") as file:
+        file.write("       IDENTIFICATION DIVISION.\n")
+    subprocess.run(git + ['add', '.'], check=True)
+    subprocess.run(git + ['commit', '-q', '-m', 'init'], check=True)
+    subprocess.run(git + ['branch', 'MortApp'], check=True)
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<42} mean {statistics.mean(timings) * 1000:8.1f} ms   "
+          f"median {statistics.median(timings) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms")
+
+
+def time_subprocess(script, args, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, script)] + args,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_daemon(client, action, args, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        client.call(action, args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(runs, port):
+    active_path = tempfile.mkdtemp(prefix="agent_bench_")
+    daemon = None
+    try:
+        make_repo(active_path, "MortgageApplication")
+        cases = [
+            ("checkout_branch_log", ["MortgageApplication", "https://github.com/gmsadmin-git", "MortApp", active_path]),
+            ("list_branch_log", ["MortgageApplication", active_path, active_path]),
+        ]
+
+        daemon = subprocess.Popen([sys.executable, os.path.join(SCRIPT_DIR, "agent_daemon.py"), "--port", str(port)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        client = None
+        for _ in range(100):
+            try:
+                client = AgentClient(DEFAULT_HOST, port)
+                break
+            except OSError:
+                time.sleep(0.1)
+        if client is None:
+            print("Agent did not start.")
+            return
+        client.call("ping")
+
+        print(f"{runs} runs per case\n")
+        for action, args in cases:
+            summarize(f"{action}: one process per call", time_subprocess(f"{action}.py", args, runs))
+            summarize(f"{action}: resident agent", time_daemon(client, action, args, runs))
+        client.close()
+    finally:
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait()
+        shutil.rmtree(active_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the resident agent against one process per script.")
+    parser.add_argument("--runs", type=int, default=20, help="Number of calls per case")
+    parser.add_argument("--port", type=int, default=8799, help="Port for the benchmark agent")
+    args = parser.parse_args()
+    main(args.runs, args.port)
@@ -0,0 +1,118 @@
+"""
+Memory and load time of conversation history with 100k turns.
+
+Compares the old dict-backed turn objects (string timestamps, a JSON list
+re-read and rebuilt through from_dict on every load) with the slotted
+DialogTurn records (integer timestamps) loaded from the SQLite store as a
+TurnPage, which only decodes the turns that are accessed.
+
+    python3 bench_history.py --turns 100000
+"""
+
+import os
+import gc
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+from history_adalflow import LocalDB, DialogTurn, UserQuery, AssistantResponse
+
+
+class OldUserQuery:
+    def __init__(self, query_str):
+        self.query_str = query_str
+
+
+class OldAssistantResponse:
+    def __init__(self, response_str):
+        self.response_str = response_str
+
+
+class OldDialogTurn:
+    """The turn layout before __slots__: instance dicts and formatted timestamps."""
+
+    def __init__(self, user_query, assistant_response, user_query_timestamp, assistant_response_timestamp):
+        self.user_query = user_query
+        self.assistant_response = assistant_response
+        self.user_query_timestamp = user_query_timestamp
+        self.assistant_response_timestamp = assistant_response_timestamp
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(OldUserQuery(data["user_query"]["query_str"]),
+                   OldAssistantResponse(data["assistant_response"]["response_str"]),
+                   data["user_query_timestamp"], data["assistant_response_timestamp"])
+
+
+def make_turns(count):
+    start = int(time.time()) - count
+    for i in range(count):
+        yield {"user_query": {"query_str": "System"},
+               "assistant_response": {"response_str": f"Latest changes pulled successfully ({i})."},
+               "user_query_timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start + i)),
+               "assistant_response_timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start + i))}
+
+
+def measure(label, build):
+    """Time one run of build(), then measure the memory a second run holds (tracemalloc slows it down)."""
+    gc.collect()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<44} {elapsed * 1000:9.1f} ms   held {current / 2**20:7.1f} MB   peak {peak / 2**20:7.1f} MB")
+    return result
+
+
+def main(count):
+    workdir = tempfile.mkdtemp(prefix="history_bench_")
+    try:
+        json_path = os.path.join(workdir, "conversation_db.json")
+        with open(json_path, "w") as file:
+            json.dump(list(make_turns(count)), file, indent=4)
+        db = LocalDB(os.path.join(workdir, "conversation_db.sqlite3"), legacy_files=(json_path,))
+
+        # Built the way store_turn builds them, before and after
+        start = int(time.time()) - count
+        rows = [(f"Latest changes pulled successfully ({i}).", start + i) for i in range(count)]
+
+        def stamp(ts):
+            return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+        print(f"\n{count} turns in memory")
+        old = measure("dict-backed objects, string timestamps",
+                      lambda: [OldDialogTurn(OldUserQuery("System"), OldAssistantResponse(response), stamp(ts), stamp(ts))
+                               for response, ts in rows])
+        del old
+        new = measure("slotted DialogTurn, integer timestamps",
+                      lambda: [DialogTurn(UserQuery("System"), AssistantResponse(response), ts, ts)
+                               for response, ts in rows])
+        del new
+
+        print(f"\nLoading {count} turns")
+
+        def old_load():
+            with open(json_path, "r") as file:
+                return [OldDialogTurn.from_dict(item) for item in json.load(file)]
+        old = measure("JSON list + from_dict (old load_data)", old_load)
+        del old
+        page = measure("SQLite page, nothing decoded", lambda: db.query(limit=count))
+        measure("  then read the newest 20 turns", lambda: [t.assistant_response.response_str for t in page[-20:]])
+        measure("  then decode every turn once", lambda: sum(1 for _ in page))
+        measure("SQLite page of the newest 50 turns", lambda: db.query(limit=50))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark conversation history memory use and load time.")
+    parser.add_argument("--turns", type=int, default=100000, help="Number of turns to generate")
+    args = parser.parse_args()
+    main(args.turns)
@@ -0,0 +1,123 @@
+"""
+Accuracy and latency of the local intent classifier against the intent server.
+
+The labelled queries are the logged server answers in intent_log.jsonl plus
+the seed phrasings (see intent_classifier.py), or a file of
+"query<TAB>action" lines given with --queries. A share of them is held out,
+the classifier is trained on the rest, and each held-out query is
+classified locally. With --server every held-out query is also sent to the
+intent server, so its latency and its agreement with the local answers can be
+compared.
+
+    python3 bench_intent.py
+    python3 bench_intent.py --server http://10.190.226.6:8000/repository
+    python3 bench_intent.py --queries labelled.tsv --holdout 1.0
+"""
+
+import time
+import random
+import argparse
+import statistics
+
+from http_client import HTTPClient
+from intent_classifier import ACTIONS, CONFIDENCE, IntentClassifier, load_examples
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<42} mean {statistics.mean(timings) * 1000:8.3f} ms   "
+          f"median {statistics.median(timings) * 1000:8.3f} ms   p95 {p95 * 1000:8.3f} ms")
+
+
+def read_queries(path):
+    examples = []
+    with open(path, "r") as file:
+        for line in file:
+            query, _, action = line.rstrip("\n").partition("\t")
+            if query and action:
+                examples.append((query, action))
+    return examples
+
+
+def split(examples, holdout, seed):
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+    count = max(1, int(len(examples) * holdout))
+    return examples[count:], examples[:count]
+
+
+def main(queries_path, holdout, seed, server):
+    if queries_path:
+        # Labelled file: evaluate on its held-out share, train on the rest plus the usual examples
+        train, test = split(read_queries(queries_path), holdout, seed)
+        train += load_examples()
+    else:
+        train, test = split(load_examples(), holdout, seed)
+
+    started = time.perf_counter()
+    classifier = IntentClassifier.train(train)
+    print(f"Trained on {len(train)} examples in {(time.perf_counter() - started) * 1000:.0f} ms, "
+          f"{len(classifier.idf)} features; evaluating {len(test)} held-out queries\n")
+
+    predictions = []
+    timings = []
+    for query, action in test:
+        started = time.perf_counter()
+        predicted, probability, coverage = classifier.predict(query)
+        timings.append(time.perf_counter() - started)
+        predictions.append((query, action, predicted, probability, coverage))
+    summarize("local classifier", timings)
+
+    correct = sum(1 for _, action, predicted, _, _ in predictions if predicted == action)
+    print(f"\nTop-1 accuracy on all queries: {correct / len(test):.1%}\n")
+    print(f"{'threshold':>10} {'answered locally':>17} {'accuracy when answered':>23}")
+    for threshold in sorted({0.5, 0.6, 0.7, CONFIDENCE, 0.9, 0.95}):
+        answered = [p for p in predictions if p[3] >= threshold and p[4] >= classifier.min_coverage]
+        right = sum(1 for _, action, predicted, _, _ in answered if predicted == action)
+        accuracy = f"{right / len(answered):.1%}" if answered else "-"
+        marker = "  <- default" if threshold == CONFIDENCE else ""
+        print(f"{threshold:>10.2f} {len(answered) / len(test):>17.1%} {accuracy:>23}{marker}")
+
+    print("\nPer action (top-1):")
+    for action in sorted({action for _, action in test}, key=lambda a: (a not in ACTIONS, a)):
+        rows = [p for p in predictions if p[1] == action]
+        right = sum(1 for p in rows if p[2] == action)
+        print(f"  {action:<20} {right}/{len(rows)}")
+
+    mistakes = [p for p in predictions if p[2] != p[1]]
+    if mistakes:
+        print("\nMisclassified:")
+        for query, action, predicted, probability, _ in mistakes[:20]:
+            print(f"  {query!r}: expected {action}, got {predicted} (p={probability:.2f})")
+
+    if server:
+        client = HTTPClient()
+        remote_timings = []
+        agree = labelled = answered = 0
+        for query, action, predicted, probability, coverage in predictions:
+            started = time.perf_counter()
+            response = client.post_json(server, {"query": query})
+            remote_timings.append(time.perf_counter() - started)
+            remote = response.json().get("action") if response.status_code == 200 else None
+            labelled += remote == action
+            if probability >= classifier.confidence and coverage >= classifier.min_coverage:
+                answered += 1
+                agree += remote == predicted
+        print()
+        summarize("intent server", remote_timings)
+        print(f"Server agrees with the labels on {labelled / len(test):.1%} of the queries")
+        if answered:
+            print(f"Server agrees with the local answer on {agree / answered:.1%} "
+                  f"of the {answered} queries answered locally")
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the local intent classifier against the intent server.")
+    parser.add_argument("--queries", type=str, default=None, help="File of query<TAB>action lines to evaluate")
+    parser.add_argument("--holdout", type=float, default=0.25, help="Share of the labelled queries held out")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the train/test split")
+    parser.add_argument("--server", type=str, default=None, help="Intent server URL to compare against")
+    args = parser.parse_args()
+    main(args.queries, args.holdout, args.seed, args.server)
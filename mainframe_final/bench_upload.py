@@ -0,0 +1,119 @@
+"""
+Workspace upload time: per-file SFTP vs parallel SFTP vs one tar stream.
+
+Builds throwaway trees of 100, 1,000 and 10,000 small COBOL-sized files (with
+a .git directory that must not be sent) and uploads each into an empty
+directory on the LPAR three ways:
+
+    sftp x1    sync_directory with one channel (one file at a time)
+    sftp xN    sync_directory with N channels (sftp_transfer.py)
+    tar        tar_upload_directory (one gzip tar stream, tar_upload.py)
+
+The remote directories are removed afterwards.
+
+    python3 bench_upload.py --lpar gmsmf --remote-dir /u/gmszfs/upload_bench
+"""
+
+import io
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import shlex
+from getpass import getpass
+
+from ssh_pool import get_ssh_pool
+from sftp_sync import sync_directory
+from sftp_transfer import DEFAULT_CONCURRENCY, get_transfer_concurrency, format_bytes
+from tar_upload import tar_upload_directory
+from config_snapshot import normalize_lpar_details
+
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+COBOL_LINE = "       MOVE WS-AMOUNT TO WS-TOTAL-AMOUNT.                              \n"
+
+
+def make_tree(root, file_count):
+    """Create file_count files of 1-4 KB spread over nested folders, plus a .git folder."""
+    total = 0
+    for i in range(file_count):
+        folder = os.path.join(root, f"app{i % 7}", ["cobol", "copybook", "bms", "link"][i % 4], f"part{i % 25}")
+        os.makedirs(folder, exist_ok=True)
+        content = COBOL_LINE * (16 + (i * 7) % 48)
+        with open(os.path.join(folder, f"PGM{i:05d}.cbl"), "w") as file:
+            file.write(content)
+        total += len(content)
+    os.makedirs(os.path.join(root, ".git", "objects"), exist_ok=True)
+    with open(os.path.join(root, ".git", "objects", "pack"), "w") as file:
+        file.write("not uploaded\n")
+    return total
+
+
+def remove_remote(ssh, remote_path):
+    stdin, stdout, stderr = ssh.exec_command(f"rm -rf {shlex.quote(remote_path)}")
+    stdout.channel.recv_exit_status()
+
+
+def time_upload(label, upload):
+    # The transfer helpers print a line per file; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        stats = upload()
+        elapsed = time.perf_counter() - start
+    errors = f"   {len(stats['errors'])} errors" if stats["errors"] else ""
+    print(f"  {label:<10} {elapsed:8.2f} s   {stats['uploaded']:6d} files   "
+          f"{format_bytes(stats['bytes'] / elapsed if elapsed else 0)}/s{errors}")
+    return elapsed
+
+
+def main(ssh, remote_dir, sizes, concurrency):
+    sftp = ssh.open_sftp()
+    local_root = tempfile.mkdtemp(prefix="upload_bench_")
+    try:
+        try:
+            sftp.mkdir(remote_dir)
+        except IOError:
+            pass
+        for count in sizes:
+            local_path = os.path.join(local_root, f"tree_{count}")
+            size = make_tree(local_path, count)
+            print(f"\n{count} files, {format_bytes(size)}")
+            modes = [
+                ("sftp x1", lambda path: sync_directory(sftp, local_path, path, concurrency=1)),
+                (f"sftp x{concurrency}", lambda path: sync_directory(sftp, local_path, path, concurrency=concurrency)),
+                ("tar", lambda path: tar_upload_directory(sftp, local_path, path)),
+            ]
+            for index, (label, upload) in enumerate(modes):
+                remote_path = f"{remote_dir}/tree_{count}_{index}"
+                remove_remote(ssh, remote_path)
+                try:
+                    time_upload(label, lambda: upload(remote_path))
+                finally:
+                    remove_remote(ssh, remote_path)
+    finally:
+        sftp.close()
+        shutil.rmtree(local_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-file, parallel and tar uploads to USS.")
+    parser.add_argument("--lpar", type=str, default="gmsmf", help="LPAR name in timeout_dynamic.yaml")
+    parser.add_argument("--remote-dir", type=str, required=True, help="Scratch directory on USS (removed per run)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Tree sizes in files")
+    parser.add_argument("--concurrency", type=int, default=None, help="Channels for the parallel SFTP run")
+    args = parser.parse_args()
+
+    lpar_name, lpar_details = normalize_lpar_details(args.lpar)
+    concurrency = args.concurrency or get_transfer_concurrency(lpar_details, DEFAULT_CONCURRENCY)
+
+    username = input("Enter your username: ")
+    password = getpass("Enter your password: ")
+    pool = get_ssh_pool()
+    ssh_client = pool.acquire(lpar_details["mfip"], lpar_details["sshport"], username, password)
+    try:
+        main(ssh_client, args.remote_dir.rstrip("/"), args.sizes, concurrency)
+    finally:
+        pool.release(ssh_client)
@@ -0,0 +1,96 @@
+"""
+Read stdout and stderr of an SSH channel together, line by line.
+
+Reading stdout.readline() to EOF and only then draining stderr lets a chatty
+stderr fill the channel window and stall the remote command, and the user sees
+no stderr until the end. iter_channel_lines() waits on the channel with
+select() and hands out ("stdout" | "stderr", line) events in arrival order.
+OutputBuffer keeps only the last max_lines lines of a stream.
+
+    stdout_buffer, stderr_buffer = OutputBuffer(), OutputBuffer()
+    for stream, line in iter_channel_lines(channel):
+        print(line)
+        (stdout_buffer if stream == "stdout" else stderr_buffer).append(line)
+"""
+
+import select
+from collections import deque
+
+
+RECV_SIZE = 32768
+MAX_OUTPUT_LINES = 5000
+
+
+class ChannelTimeout(Exception):
+    pass
+
+
+def iter_channel_lines(channel, timeout=None, encoding="utf-8"):
+    """
+    Yield (stream, line) for every complete line on the channel's stdout and
+    stderr as it arrives. Ends when the remote side closes the channel; a
+    trailing partial line is yielded at that point. Raises ChannelTimeout if
+    nothing arrives for `timeout` seconds.
+    """
+    pending = {"stdout": "", "stderr": ""}
+    while True:
+        if channel.recv_ready():
+            name, data = "stdout", channel.recv(RECV_SIZE)
+        elif channel.recv_stderr_ready():
+            name, data = "stderr", channel.recv_stderr(RECV_SIZE)
+        elif channel.eof_received or channel.closed:
+            break
+        else:
+            ready, _, _ = select.select([channel], [], [], timeout)
+            if not ready and timeout is not None:
+                raise ChannelTimeout(f"No output from remote command for {timeout} seconds.")
+            continue
+        if not data:
+            break
+
+        pending[name] += data.decode(encoding, errors="replace")
+        *complete, pending[name] = pending[name].split("\n")
+        for line in complete:
+            yield name, line.rstrip("\r")
+
+    for name in ("stdout", "stderr"):
+        if pending[name]:
+            yield name, pending[name].rstrip("\r")
+
+
+class OutputBuffer:
+    """Keeps the last max_lines lines of a stream and counts the ones dropped."""
+
+    def __init__(self, max_lines=MAX_OUTPUT_LINES):
+        self.lines = deque(maxlen=max_lines)
+        self.total = 0
+
+    def append(self, line):
+        self.lines.append(line)
+        self.total += 1
+
+    @property
+    def dropped(self):
+        return self.total - len(self.lines)
+
+    def text(self):
+        if self.dropped:
+            return "\n".join([f"... {self.dropped} earlier lines omitted ..."] + list(self.lines))
+        return "\n".join(self.lines)
+
+
+# Function to run a command on its own exec channel and stream its output
+def stream_exec_command(ssh, command, on_line=None, timeout=None, max_lines=MAX_OUTPUT_LINES):
+    """Return (exit_status, stdout_text, stderr_text), calling on_line(stream, line) as lines arrive."""
+    channel = ssh.get_transport().open_session()
+    try:
+        channel.exec_command(command)
+        buffers = {"stdout": OutputBuffer(max_lines), "stderr": OutputBuffer(max_lines)}
+        for stream, line in iter_channel_lines(channel, timeout):
+            buffers[stream].append(line)
+            if on_line is not None:
+                on_line(stream, line)
+        exit_status = channel.recv_exit_status()
+        return exit_status, buffers["stdout"].text(), buffers["stderr"].text()
+    finally:
+        channel.close()
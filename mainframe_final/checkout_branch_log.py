@@ -3,14 +3,13 @@
 import subprocess
 import os
 import argparse
-from datetime import datetime
+from repo_index import refresh_file_index
+from agent_log import append_log
 
-def log_to_file(message, LOG_FILE):
+def log_to_file(message, LOG_FILE, **fields):
     """Logs a message to the log file with a timestamp."""
-    with open(LOG_FILE, "a") as log_file:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_file.write(f"{timestamp} - {message}\n")
-        log_file.write("-" * 40 + "\n")  # Separator for readability
+    fields.setdefault("action", "checkout_branch")
+    append_log(message, LOG_FILE, **fields)
 
 def is_git_repo(folder_path, LOG_FILE):
     """Check if a folder is a valid Git repository."""
@@ -34,20 +33,24 @@ def checkout_branch(repo_path, branch_name, LOG_FILE):
     """Try to checkout a branch, handle errors, and fallback if needed."""
     try:
         subprocess.run(['git', '-C', repo_path, 'checkout', branch_name], check=True)
+        refresh_file_index(repo_path)
         message = f"Checked out branch '{branch_name}'."
-        log_to_file(message, LOG_FILE)
+        log_to_file(message, LOG_FILE, repo=os.path.basename(repo_path), branch=branch_name, outcome="success")
         return message
     except subprocess.CalledProcessError as e:
-        log_to_file(f"Error checking out branch '{branch_name}': {e}", LOG_FILE)
+        log_to_file(f"Error checking out branch '{branch_name}': {e}", LOG_FILE,
+                    repo=os.path.basename(repo_path), branch=branch_name, outcome="failure")
         print(f"Error checking out branch '{branch_name}': {e}")
         fallback_branch = "main"  # Default fallback branch
         try:
             subprocess.run(['git', '-C', repo_path, 'checkout', fallback_branch], check=True)
+            refresh_file_index(repo_path)
             message = f"Checked out fallback branch '{fallback_branch}' successfully."
-            log_to_file(message, LOG_FILE)
+            log_to_file(message, LOG_FILE, repo=os.path.basename(repo_path), branch=fallback_branch, outcome="fallback")
             return message
         except subprocess.CalledProcessError as fallback_error:
-            log_to_file(f"Failed to checkout fallback branch '{fallback_branch}': {fallback_error}", LOG_FILE)
+            log_to_file(f"Failed to checkout fallback branch '{fallback_branch}': {fallback_error}", LOG_FILE,
+                        repo=os.path.basename(repo_path), branch=fallback_branch, outcome="failure")
             return f"Failed to checkout both '{branch_name}' and fallback branch '{fallback_branch}'."
 
 def push_branch(repo_path, branch_name, LOG_FILE):
@@ -3,45 +3,47 @@ import subprocess
 import shutil
 import argparse
 import time
-from datetime import datetime
+from repo_index import refresh_file_index
+from agent_log import append_log
+from agent_trace import traced
 
 # Log file path (same as the one used previously)
 LOG_FILE = "internet_connection_log.txt"
 
 # Function to log messages to a file and print to the terminal
-def log_to_file(message, LOG_FILE):
+def log_to_file(message, LOG_FILE, **fields):
     """Logs a message to the log file with a timestamp and prints it to the terminal."""
-    with open(LOG_FILE, "a") as log_file:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"{timestamp} - {message}\n"
-        log_file.write(log_message)
-        log_file.write("-" * 40 + "\n")  # Separator for readability
-        print(log_message)  # Print the message to the terminal
+    fields.setdefault("action", "clone")
+    log_message = append_log(message, LOG_FILE, **fields)
+    print(log_message)  # Print the message to the terminal
 
 
+@traced("git")
 def clone_repo(repo_url, clone_path, LOG_FILE):
     try:
         subprocess.run(['git', 'clone', repo_url, clone_path], check=True)
         message = f"Repository cloned successfully to {clone_path}."
-        log_to_file(message, LOG_FILE)
+        log_to_file(message, LOG_FILE, repo=os.path.basename(clone_path), step="clone", outcome="success")
         return message
     except subprocess.CalledProcessError as e:
         message = f"Error cloning repository: {e}"
-        log_to_file(message, LOG_FILE)
+        log_to_file(message, LOG_FILE, repo=os.path.basename(clone_path), step="clone", outcome="failure")
         return message
 
 def is_git_repo(folder_path):
     return os.path.isdir(os.path.join(folder_path, ".git"))
 
+@traced("git")
 def pull_latest_changes(repo_path, LOG_FILE):
     try:
         subprocess.run(['git', '-C', repo_path, 'pull'], check=True)
+        refresh_file_index(repo_path)
         message = f"Latest changes pulled successfully."
-        log_to_file(message, LOG_FILE)
+        log_to_file(message, LOG_FILE, repo=os.path.basename(repo_path), step="pull", outcome="success")
         return message
     except subprocess.CalledProcessError as e:
         message = f"Error pulling latest changes: {e}"
-        log_to_file(message, LOG_FILE)
+        log_to_file(message, LOG_FILE, repo=os.path.basename(repo_path), step="pull", outcome="failure")
         return message
 
 def delete_folder(folder_path, LOG_FILE):
@@ -54,6 +56,7 @@ def delete_folder(folder_path, LOG_FILE):
         log_to_file(f"Operation canceled for folder '{folder_path}'.", LOG_FILE)
         return False
 
+@traced("agent", name="clone_log")
 def main(repo_name, base_url, active_path):
     LOG_FILE = f"{active_path}/internet_connection_log.txt"
     #workspace_path = os.getcwd()
@@ -0,0 +1,111 @@
+"""
+Process-wide cache of parsed YAML configuration files.
+
+load_yaml(path) parses a file the first time it is asked for and afterwards
+returns the same parsed document until the file's mtime or size changes, so
+the resident agent (agent_daemon.py) and the interactive loop in final_agent.py
+stop re-reading vscode_extension.yaml, pull_clone.yaml, timeout_dynamic.yaml
+and application_details.yaml on every action.
+
+    config = load_yaml("/path/to/timeout_dynamic.yaml")
+    hostname = config["gmsmf"]["mfip"]
+
+The cache is keyed by the resolved path (symlinks followed). Cached documents
+are shared between callers, so they are frozen: mappings are FrozenDict (a
+read-only dict that still serialises with json) and lists become tuples. Use
+thaw() for a mutable copy.
+"""
+
+import os
+import copy
+import threading
+
+import yaml
+
+
+class FrozenDict(dict):
+    """A dict that refuses changes; copies of it are ordinary mutable dicts."""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Configuration loaded from the cache is read-only; use config_cache.thaw() for a copy")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    update = pop = popitem = clear = setdefault = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+# Function to make a parsed document read-only
+def freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+# Function to get a mutable copy of a frozen document
+def thaw(value):
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return copy.copy(value)
+
+
+class ConfigCache:
+    def __init__(self):
+        self._entries = {}  # resolved path -> (mtime_ns, size, document)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def load(self, path):
+        """Return the frozen document in path, parsing it again only when the file changed."""
+        resolved = os.path.realpath(path)
+        stat = os.stat(resolved)  # FileNotFoundError for a missing file, as open() would raise
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(resolved)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+        with open(resolved, "r") as file:
+            document = freeze(yaml.safe_load(file))
+        with self._lock:
+            self._entries[resolved] = (signature, document)
+            self.loads += 1
+        return document
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.realpath(path), None)
+
+    def stats(self):
+        with self._lock:
+            return {"files": len(self._entries), "hits": self.hits, "loads": self.loads}
+
+
+_cache = ConfigCache()
+
+
+# Function to get the process-wide config cache
+def get_config_cache():
+    return _cache
+
+
+# Function to load a YAML file through the process-wide cache
+def load_yaml(path):
+    return _cache.load(path)
@@ -0,0 +1,278 @@
+"""
+One validated snapshot of the agent's YAML settings.
+
+The settings live in five files whose shapes the scripts used to assume
+differently (lpar_details arrived either as {"gmsmf": {...}} or as the inner
+dict, with sshport as a string). compile_snapshot() checks each file against
+SCHEMA, converts typed fields (ports and counts become ints) and merges them
+into one document:
+
+    {"application": {"repositories": {...}},      application_details.yaml
+     "pull_clone":  {"repository": {...}},        pull_clone.yaml
+     "repo_name":   {"repository": {...}},        repo_name.yaml
+     "lpars":       {"gmsmf": {"name": "gmsmf", "mfip": ..., "sshport": 2022, ...}},
+     "vscode":      {"required_extensions": [...], ...}}    vscode_extension.yaml
+
+The result is written as compact JSON to .config_snapshot.json next to the
+sources, together with each source's mtime and size. load_snapshot() returns
+it after a stat of the sources, and compiles it again only when one of them
+changed, so starting a script costs a small JSON read instead of five YAML
+parses.
+
+    snapshot = load_snapshot()
+    lpar = snapshot["lpars"]["gmsmf"]
+
+    python3 config_snapshot.py            # compile and print the snapshot
+    python3 config_snapshot.py --check    # validate only
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+
+import yaml
+
+from config_cache import freeze, load_yaml
+
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+SNAPSHOT_FILE = ".config_snapshot.json"
+SNAPSHOT_VERSION = 1
+
+# Snapshot key -> source file
+SOURCES = {
+    "application": "application_details.yaml",
+    "pull_clone": "pull_clone.yaml",
+    "repo_name": "repo_name.yaml",
+    "lpars": "timeout_dynamic.yaml",
+    "vscode": "vscode_extension.yaml",
+}
+
+
+class ConfigError(Exception):
+    """Raised with every problem found when the settings do not match SCHEMA."""
+
+    def __init__(self, problems):
+        super().__init__("Invalid configuration:\n  " + "\n  ".join(problems))
+        self.problems = problems
+
+
+class Field:
+    def __init__(self, kind=str, required=True, default=None):
+        self.kind = kind  # str, int, "port" or [str]
+        self.required = required
+        self.default = default
+
+    def convert(self, value, path, problems):
+        if self.kind == "port" or self.kind is int:
+            try:
+                number = int(str(value).strip())
+            except ValueError:
+                problems.append(f"{path}: expected a number, got {value!r}")
+                return None
+            if self.kind == "port" and not 0 < number < 65536:
+                problems.append(f"{path}: port {number} is out of range")
+                return None
+            if number < 0:
+                problems.append(f"{path}: expected a positive number, got {number}")
+                return None
+            return number
+        if isinstance(self.kind, list):
+            if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) for item in value):
+                problems.append(f"{path}: expected a list of strings")
+                return None
+            return list(value)
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            problems.append(f"{path}: expected a string, got {type(value).__name__}")
+            return None
+        return str(value)
+
+
+LPAR_SCHEMA = {
+    "mfip": Field(),
+    "sshport": Field("port", required=False, default=22),
+    "groovyzpath": Field(),
+    "zappbuildpath": Field(),
+    "sftp_concurrency": Field(int, required=False),
+}
+
+REPOSITORY_SCHEMA = {"repository": {"base_url": Field()}}
+
+# A nested dict is a mapping with those keys; "*" matches any key (one entry per LPAR)
+SCHEMA = {
+    "application": {
+        "repositories": {
+            "git_Application": Field(),
+            "git_url": Field(),
+            "main_build_branch": Field(),
+        },
+    },
+    "pull_clone": REPOSITORY_SCHEMA,
+    "repo_name": REPOSITORY_SCHEMA,
+    "lpars": {"*": LPAR_SCHEMA},
+    "vscode": {
+        "required_extensions": Field([str]),
+        "windows_instruction_path": Field(required=False),
+        "mac_instruction_path": Field(required=False),
+        "windows_vscode_download_link": Field(required=False),
+        "mac_vscode_download_link": Field(required=False),
+    },
+}
+
+
+# Function to check a parsed document against a schema and convert its typed fields
+def validate(document, schema, path, problems):
+    if not isinstance(document, dict):
+        problems.append(f"{path}: expected a mapping, got {type(document).__name__}")
+        return {}
+    result = {}
+    if "*" in schema:
+        for key, value in document.items():
+            result[key] = validate(value, schema["*"], f"{path}.{key}", problems)
+        return result
+    for key, rule in schema.items():
+        value = document.get(key)
+        if isinstance(rule, dict):
+            if value is None:
+                problems.append(f"{path}.{key}: missing")
+                continue
+            result[key] = validate(value, rule, f"{path}.{key}", problems)
+        elif value is None or value == "":
+            if rule.required:
+                problems.append(f"{path}.{key}: missing")
+            elif rule.default is not None:
+                result[key] = rule.default
+        else:
+            converted = rule.convert(value, f"{path}.{key}", problems)
+            if converted is not None:
+                result[key] = converted
+    # Keys the schema does not know are kept as they are
+    for key, value in document.items():
+        if key not in schema:
+            result[key] = value
+    return result
+
+
+def _source_signatures(config_dir):
+    signatures = {}
+    for name in SOURCES.values():
+        try:
+            stat = os.stat(os.path.join(config_dir, name))
+            signatures[name] = [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            signatures[name] = None
+    return signatures
+
+
+# Function to validate and merge the YAML sources and write the snapshot file
+def compile_snapshot(config_dir=SCRIPT_DIR, write=True):
+    signatures = _source_signatures(config_dir)
+    problems = []
+    config = {}
+    for key, name in SOURCES.items():
+        try:
+            document = load_yaml(os.path.join(config_dir, name))
+        except FileNotFoundError:
+            problems.append(f"{name}: file not found")
+            continue
+        except yaml.YAMLError as e:
+            problems.append(f"{name}: {e}")
+            continue
+        config[key] = validate(document, SCHEMA[key], name, problems)
+    if problems:
+        raise ConfigError(problems)
+    for name, lpar in config["lpars"].items():
+        lpar["name"] = name
+
+    if write:
+        snapshot = {"version": SNAPSHOT_VERSION, "sources": signatures, "config": config}
+        path = os.path.join(config_dir, SNAPSHOT_FILE)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(snapshot, file, separators=(",", ":"))
+            os.replace(temp_path, path)
+        except OSError as e:
+            # A read-only install still works; it just compiles on every start
+            print(f"Could not write config snapshot {path}: {e}", file=sys.stderr)
+    return config
+
+
+class _SnapshotState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = {}  # config_dir -> (signatures, frozen config)
+
+
+_state = _SnapshotState()
+
+
+# Function to get the validated settings, compiling them again only when a source changed
+def load_snapshot(config_dir=SCRIPT_DIR):
+    signatures = _source_signatures(config_dir)
+    with _state.lock:
+        cached = _state.loaded.get(config_dir)
+    if cached is not None and cached[0] == signatures:
+        return cached[1]
+
+    config = None
+    try:
+        with open(os.path.join(config_dir, SNAPSHOT_FILE), "r") as file:
+            snapshot = json.load(file)
+        if snapshot.get("version") == SNAPSHOT_VERSION and snapshot.get("sources") == signatures:
+            config = snapshot["config"]
+    except (OSError, ValueError, AttributeError):
+        pass
+    if config is None:
+        config = compile_snapshot(config_dir)
+
+    config = freeze(config)
+    with _state.lock:
+        _state.loaded[config_dir] = (signatures, config)
+    return config
+
+
+# Function to turn any of the lpar_details shapes into (lpar name, typed settings)
+def normalize_lpar_details(lpar_details, config_dir=SCRIPT_DIR):
+    """
+    Accepts a JSON string or a dict, either {"gmsmf": {...}} or the inner
+    {"mfip": ..., ...} mapping, or just an LPAR name from timeout_dynamic.yaml.
+    """
+    if isinstance(lpar_details, str):
+        stripped = lpar_details.strip()
+        if not stripped.startswith("{"):
+            lpars = load_snapshot(config_dir)["lpars"]
+            if stripped not in lpars:
+                raise ConfigError([f"Unknown LPAR: {stripped}"])
+            return stripped, lpars[stripped]
+        lpar_details = json.loads(stripped)
+    if not isinstance(lpar_details, dict):
+        raise ConfigError([f"lpar_details: expected a mapping, got {type(lpar_details).__name__}"])
+
+    if "mfip" in lpar_details:
+        name, details = lpar_details.get("name"), lpar_details
+    elif len(lpar_details) == 1:
+        name, details = next(iter(lpar_details.items()))
+    else:
+        raise ConfigError(["lpar_details: expected one LPAR"])
+    problems = []
+    lpar = validate(details, LPAR_SCHEMA, f"lpar {name or ''}".strip(), problems)
+    if problems:
+        raise ConfigError(problems)
+    lpar["name"] = name
+    return name, freeze(lpar)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate the YAML settings and write the config snapshot.")
+    parser.add_argument("--config-dir", type=str, default=SCRIPT_DIR, help="Directory holding the YAML files")
+    parser.add_argument("--check", action="store_true", help="Validate only; do not write the snapshot")
+    args = parser.parse_args()
+    try:
+        config = compile_snapshot(args.config_dir, write=not args.check)
+    except ConfigError as e:
+        print(e)
+        sys.exit(1)
+    print("Configuration is valid." if args.check else json.dumps(config, indent=2))
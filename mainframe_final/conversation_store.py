@@ -0,0 +1,241 @@
+"""
+SQLite store for conversation turns shared by every developer on the agent host.
+
+One database file in WAL mode, so readers never block the writer and each
+turn is one small INSERT:
+
+    sessions(id, started, user, host, pid, repo)
+    turns(id, session_id, user_ts, assistant_ts, repo, action, query, response)
+    turns_fts            FTS5 index over query and response
+    rollups(session_id, action, count, first_ts, last_ts, last_outcome, outcomes, last_params)
+
+Timestamps are integer Unix seconds. History reads are paginated queries that
+use the indexes and stay fast at millions of turns:
+
+    store = ConversationStore("conversation_db.sqlite3")
+    session_id = store.start_session(repo="MortgageApplication")
+    store.add_turn(session_id, "System", "Latest changes pulled successfully.")
+    store.recent_turns(limit=20)                      # newest 20, any session
+    store.recent_turns(limit=20, repo="MortgageApplication")
+    store.search("pull", limit=20)                    # full-text match
+    store.recent_turns(limit=20, before=page[0]["id"])  # next page back
+
+Rows come back as dicts (tuples in TURN_COLUMNS order with raw=True), oldest
+first within a page. When the SQLite build has
+no FTS5, search falls back to LIKE.
+"""
+
+import os
+import json
+import time
+import socket
+import getpass
+import sqlite3
+import threading
+
+
+DEFAULT_PAGE_SIZE = 50
+BUSY_TIMEOUT_MS = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started INTEGER NOT NULL,
+    user TEXT,
+    host TEXT,
+    pid INTEGER,
+    repo TEXT
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER REFERENCES sessions(id),
+    user_ts INTEGER NOT NULL,
+    assistant_ts INTEGER NOT NULL,
+    repo TEXT,
+    action TEXT,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_session ON turns(session_id, id);
+CREATE INDEX IF NOT EXISTS turns_repo ON turns(repo, id);
+CREATE INDEX IF NOT EXISTS turns_ts ON turns(user_ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    action TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    first_ts INTEGER,
+    last_ts INTEGER,
+    last_outcome TEXT,
+    outcomes TEXT,
+    last_params TEXT,
+    PRIMARY KEY (session_id, action)
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(
+    query, response, content='turns', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS turns_fts_insert AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts(rowid, query, response) VALUES (new.id, new.query, new.response);
+END;
+CREATE TRIGGER IF NOT EXISTS turns_fts_delete AFTER DELETE ON turns BEGIN
+    INSERT INTO turns_fts(turns_fts, rowid, query, response) VALUES ('delete', old.id, old.query, old.response);
+END;
+"""
+
+TURN_COLUMNS = "id, session_id, user_ts, assistant_ts, repo, action, query, response"
+
+
+class ConversationStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # One connection shared by the agent's threads; sqlite serialises access
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            # In WAL mode NORMAL only risks the last transactions on power loss, never corruption
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+            self.conn.executescript(SCHEMA)
+            self.has_fts = self._create_fts()
+
+    def _create_fts(self):
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            return True
+        except sqlite3.OperationalError:
+            # This SQLite was built without FTS5
+            return False
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def start_session(self, repo=None):
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO sessions (started, user, host, pid, repo) VALUES (?, ?, ?, ?, ?)",
+                (int(time.time()), _current_user(), socket.gethostname(), os.getpid(), repo))
+            return cursor.lastrowid
+
+    def add_turn(self, session_id, query, response, user_ts=None, assistant_ts=None, repo=None, action=None):
+        """Insert one turn and return its id."""
+        now = int(time.time())
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO turns (session_id, user_ts, assistant_ts, repo, action, query, response) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, user_ts or now, assistant_ts or user_ts or now, repo, action, query, response))
+            return cursor.lastrowid
+
+    def add_turns(self, session_id, turns):
+        """Insert many turns (dicts with the add_turn arguments) in one transaction."""
+        now = int(time.time())
+        rows = [(session_id, t.get("user_ts") or now, t.get("assistant_ts") or t.get("user_ts") or now,
+                 t.get("repo"), t.get("action"), t["query"], t["response"]) for t in turns]
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO turns (session_id, user_ts, assistant_ts, repo, action, query, response) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def _select(self, sql, params, raw=False):
+        with self._lock:
+            cursor = self.conn.cursor()
+            if raw:
+                cursor.row_factory = None
+            rows = cursor.execute(sql, params).fetchall()
+        # Queries walk backwards from the newest turn; pages read oldest first
+        rows.reverse()
+        return rows if raw else [dict(row) for row in rows]
+
+    def recent_turns(self, limit=DEFAULT_PAGE_SIZE, before=None, repo=None, session_id=None, since=None, raw=False):
+        """The newest limit turns matching the filters, older than turn id before when given."""
+        clauses, params = [], []
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+        if repo is not None:
+            clauses.append("repo = ?")
+            params.append(repo)
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if since is not None:
+            clauses.append("user_ts >= ?")
+            params.append(int(since))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit)
+        return self._select(f"SELECT {TURN_COLUMNS} FROM turns {where} ORDER BY id DESC LIMIT ?", params, raw)
+
+    def search(self, text, limit=DEFAULT_PAGE_SIZE, before=None, repo=None, raw=False):
+        """The newest limit turns whose query or response contains every word of text."""
+        words = text.split()
+        if not words:
+            return []
+        clauses, params = [], []
+        if self.has_fts:
+            # Each word is quoted so user text can never be read as FTS syntax
+            clauses.append("id IN (SELECT rowid FROM turns_fts WHERE turns_fts MATCH ?)")
+            params.append(" ".join('"' + word.replace('"', '""') + '"' for word in words))
+        else:
+            for word in words:
+                pattern = "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                clauses.append("(query LIKE ? ESCAPE '\\' OR response LIKE ? ESCAPE '\\')")
+                params.extend([pattern, pattern])
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+        if repo is not None:
+            clauses.append("repo = ?")
+            params.append(repo)
+        params.append(limit)
+        return self._select(f"SELECT {TURN_COLUMNS} FROM turns WHERE {' AND '.join(clauses)} "
+                            f"ORDER BY id DESC LIMIT ?", params, raw)
+
+    def save_rollup(self, session_id, rollup):
+        """Write the summary of one action's turns in a session (see Memory in history_adalflow.py)."""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO rollups (session_id, action, count, first_ts, last_ts, last_outcome, "
+                "outcomes, last_params) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, rollup["action"], rollup["count"], rollup["first_ts"], rollup["last_ts"],
+                 rollup["last_outcome"], json.dumps(rollup["outcomes"]), json.dumps(rollup["last_params"])))
+
+    def get_rollups(self, session_id):
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM rollups WHERE session_id = ? ORDER BY action",
+                                     (session_id,)).fetchall()
+        rollups = {}
+        for row in rows:
+            rollup = dict(row)
+            rollup.pop("session_id")
+            rollup["outcomes"] = json.loads(rollup["outcomes"] or "{}")
+            rollup["last_params"] = json.loads(rollup["last_params"] or "null")
+            rollups[rollup["action"]] = rollup
+        return rollups
+
+    def count_turns(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+
+    def is_empty(self):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM turns LIMIT 1").fetchone() is None
+
+
+def _current_user():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return None
@@ -1,12 +1,10 @@
 import os
 import subprocess                
 import argparse
+from repo_index import find_file
 
 def find_file_in_repo(repo_path, file_name):
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return None
+    return find_file(repo_path, file_name)
 
 def open_in_vscode(file_path):
     try:
@@ -1,23 +1,21 @@
 import os
 import subprocess
 import argparse
-from datetime import datetime
+from repo_index import find_file
+from agent_log import append_log
 
-def log_to_file(message, LOG_FILE):
+def log_to_file(message, LOG_FILE, **fields):
     """Logs a message to the log file with a timestamp."""
-    with open(LOG_FILE, "a") as log_file:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_file.write(f"{timestamp} - {message}\n")
-        log_file.write("-" * 40 + "\n")  # Separator for readability
+    fields.setdefault("action", "create_file")
+    append_log(message, LOG_FILE, **fields)
 
 def find_file_in_repo(repo_path, file_name, LOG_FILE):
     """Search for the file in the repository folder and subfolders."""
     log_to_file(f"Searching for file '{file_name}' in repository '{repo_path}'", LOG_FILE)
-    for root, _, files in os.walk(repo_path):
-        if file_name in files:
-            file_path = os.path.join(root, file_name)
-            log_to_file(f"File found: {file_path}", LOG_FILE)
-            return file_path
+    file_path = find_file(repo_path, file_name)
+    if file_path:
+        log_to_file(f"File found: {file_path}", LOG_FILE)
+        return file_path
     log_to_file(f"File '{file_name}' not found in repository '{repo_path}'", LOG_FILE)
     return f"File '{file_name}' not found in repository '{repo_path}'", LOG_FILE
 
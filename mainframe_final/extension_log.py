@@ -1,23 +1,21 @@
 import yaml
 import subprocess
 import argparse
-from datetime import datetime
+from agent_log import append_log
+from config_cache import load_yaml
 
 #LOG_FILE = f"{active_path}/internet_connection_log.txt"
 
-def log_to_file(message,LOG_FILE):
+def log_to_file(message, LOG_FILE, **fields):
     """Logs a message to the log file with a timestamp."""
-    with open(LOG_FILE, "a") as log_file:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_file.write(f"{timestamp} - {message}\n")
-        log_file.write("-" * 40 + "\n")  # Separator for readability
+    fields.setdefault("action", "extensions")
+    append_log(message, LOG_FILE, **fields)
 
 def load_extensions_from_yaml(file_path,LOG_FILE):
     """Loads the list of required extensions from the YAML file."""
     try:
-        with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
-            return data.get('required_extensions', [])
+        data = load_yaml(file_path)
+        return data.get('required_extensions', [])
     except FileNotFoundError:
         message = f"YAML file not found at {file_path}"
         print(message)
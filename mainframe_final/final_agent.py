@@ -22,9 +22,24 @@ import platform
 import os
 import webbrowser
 import shutil
-import paramiko
 from getpass import getpass
+from ssh_pool import get_ssh_pool
+from remote_shell import get_remote_shell
+from remote_workspace import prepare_workspace
+from remote_tree import find_remote_file
+from channel_stream import OutputBuffer
 import subprocess
+from repo_index import find_file, refresh_file_index
+from sftp_sync import sync_directory
+from sftp_transfer import DEFAULT_CONCURRENCY, get_transfer_concurrency
+from tar_upload import tar_upload_directory
+from agent_trace import traced
+from config_cache import load_yaml
+from config_snapshot import load_snapshot
+from lpar_registry import get_lpar_registry
+from http_client import get_http_client
+from intent_cache import get_intent_cache, model_version_of
+from intent_classifier import ACTIONS, get_intent_classifier, record_intent
 
 
 # Function to read the YAML configuration file
@@ -32,9 +47,8 @@ def load_config(yaml_file='vscode_extension.yaml'):  # Default file name
     script_dir = os.path.dirname(os.path.realpath(__file__))  # Get the directory of the running script
     yaml_path = os.path.join(script_dir, yaml_file)  # Construct the full path to the YAML file
     if os.path.exists(yaml_path):
-        with open(yaml_path, 'r') as file:
-            config = yaml.safe_load(file)
-        return config
+        # Parsed once per process; parsed again only when the file's mtime or size changes
+        return load_yaml(yaml_path)
     else:
         raise FileNotFoundError(f"Configuration file '{yaml_file}' not found at path: {yaml_path}")
 
@@ -126,9 +140,8 @@ def check_internet_connection():
 def load_extensions_from_yaml(file_path):
     """Loads the list of required extensions from the YAML file."""
     try:
-        with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
-            return data.get('required_extensions', [])
+        data = load_yaml(file_path)
+        return data.get('required_extensions', [])
     except FileNotFoundError:
         print(f"YAML file not found at {file_path}")
         return []
@@ -206,6 +219,7 @@ def open_in_vscode(file_path):
         print(f"Error opening file in VSCode: {e}")
 
 # Clone the repository
+@traced("git")
 def clone_repo(repo_url, clone_path):
     try:
         subprocess.run(['git', 'clone', repo_url, clone_path], check=True)
@@ -215,9 +229,11 @@ def clone_repo(repo_url, clone_path):
 
 
 # Pull the latest changes from the repository
+@traced("git")
 def pull_latest_changes(repo_path):
     try:
         subprocess.run(['git', '-C', repo_path, 'pull'], check=True)
+        refresh_file_index(repo_path)
         print("Latest changes pulled successfully.")
     except subprocess.CalledProcessError as e:
         print(f"Error pulling latest changes: {e}")
@@ -240,6 +256,7 @@ def checkout_branch(repo_path, branch_name):
     """Try to checkout a branch, handle errors, and fallback if needed."""
     try:
         subprocess.run(['git', '-C', repo_path, 'checkout', branch_name], check=True)
+        refresh_file_index(repo_path)
         print(f"Checked out branch '{branch_name}'.")
     except subprocess.CalledProcessError as e:
         print(f"Error checking out branch '{branch_name}': {e}")
@@ -247,16 +264,14 @@ def checkout_branch(repo_path, branch_name):
         print(f"Attempting to checkout fallback branch '{fallback_branch}'.")
         try:
             subprocess.run(['git', '-C', repo_path, 'checkout', fallback_branch], check=True)
+            refresh_file_index(repo_path)
             print(f"Checked out fallback branch '{fallback_branch}' successfully.")
         except subprocess.CalledProcessError as fallback_error:
             print(f"Failed to checkout fallback branch '{fallback_branch}': {fallback_error}")
 
 # Function to find a file recursively in a repository
 def find_file_in_repo(repo_path, file_name):
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return None
+    return find_file(repo_path, file_name)
 
 
 # Push the new branch to GitHub
@@ -271,17 +286,23 @@ def push_branch(repo_path, branch_name):
 
 
 # Establish SSH connection and get mainframe's current working directory
-def create_ssh_connection(hostname, port, username, password):
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+@traced("ssh")
+def create_ssh_connection(hostname, port, username, password, fetch_pwd=True):
+    ssh = None
     try:
-        ssh.connect(hostname=hostname, port=port, username=username, password=password)
+        # Reuse an authenticated transport from the pool when one is available
+        ssh = get_ssh_pool().acquire(hostname, port, username, password)
         print("Connection successful!")
-        stdin, stdout, stderr = ssh.exec_command("pwd")
-        mainframe_pwd = stdout.read().decode().strip()
+        if not fetch_pwd:
+            # The caller learns the working directory from prepare_workspace instead
+            return ssh, None
+        exit_status, mainframe_pwd, error_output = get_remote_shell(ssh).run("pwd")
+        mainframe_pwd = mainframe_pwd.strip()
         print(f"Mainframe working directory: {mainframe_pwd}")
         return ssh, mainframe_pwd
     except Exception as e:
+        if ssh is not None:
+            get_ssh_pool().discard(ssh)
         print(f"SSH connection failed: {e}")
     return None, None
 
@@ -292,16 +313,18 @@ def check_and_create_directories(ssh, mainframe_pwd, application, workspace_name
         workspace_path = f"{mainframe_pwd}/{workspace_name}"
         application_path = f"{workspace_path}/{application}"
 
+        shell = get_remote_shell(ssh)
+
         # Ensure workspace directory exists
         print(f"Ensuring workspace directory: {workspace_path}")
-        stdin, stdout, stderr = ssh.exec_command(f"mkdir -p {workspace_path}")
-        if stderr.read().strip():
+        exit_status, output, error_output = shell.run(f"mkdir -p {workspace_path}")
+        if exit_status != 0:
             raise Exception(f"Failed to create workspace directory: {workspace_path}")
 
         # Ensure application directory exists
         print(f"Ensuring application directory: {application_path}")
-        stdin, stdout, stderr = ssh.exec_command(f"mkdir -p {application_path}")
-        if stderr.read().strip():
+        exit_status, output, error_output = shell.run(f"mkdir -p {application_path}")
+        if exit_status != 0:
             raise Exception(f"Failed to create application directory: {application_path}")
 
         return workspace_path, application_path
@@ -310,56 +333,36 @@ def check_and_create_directories(ssh, mainframe_pwd, application, workspace_name
         return None, None
 
 
-# Function to find a file recursively in a repository
-def find_file_in_repo(repo_path, file_name):
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return None
-
 # Check if Git Repository is Present; if not, Clone
 # Adjust `check_or_clone_repository` to enforce GitHub cloning
+@traced("git")
 def check_or_clone_repository(ssh, repo_url, application_path):
     """
     Check if a Git repository exists on the mainframe.
     If not, clone the repository. If it exists, pull the latest changes.
     """
     try:
+        # The session shell already has the Rocket git environment exported
+        shell = get_remote_shell(ssh)
+
         # Check if the repository already exists
         check_git_repo_cmd = f"if [ -d {application_path}/.git ]; then echo 'found'; else echo 'not_found'; fi"
-        stdin, stdout, stderr = ssh.exec_command(check_git_repo_cmd)
-        repo_status = stdout.read().decode().strip()
+        exit_status, repo_status, error_output = shell.run(check_git_repo_cmd)
+        repo_status = repo_status.strip()
 
         if repo_status == 'not_found':
             print(f"No Git repository found at {application_path}. Cloning the repository...")
-            clone_command = f"""
-                export GIT_SHELL=/usr/lpp/Rocket/rsusr/ported/bin/bash && \
-                export GIT_EXEC_PATH=/usr/lpp/Rocket/rsusr/ported/libexec/git-core && \
-                export GIT_TEMPLATE_DIR=/usr/lpp/Rocket/rsusr/ported/share/git-core/templates && \
-                export GIT_MAN_PATH=/usr/lpp/Rocket/rsusr/ported/share/man && \
-                export PATH=$PATH:/usr/lpp/Rocket/rsusr/ported/bin && \
-                git clone {repo_url} {application_path}
-            """
-            stdin, stdout, stderr = ssh.exec_command(clone_command)
-            clone_output = stdout.read().decode().strip()
-            clone_error = stderr.read().decode().strip()
-            if clone_error:
+            clone_command = f"git clone {repo_url} {application_path}"
+            exit_status, clone_output, clone_error = shell.run(clone_command)
+            # git reports progress on stderr, so only the exit status means failure
+            if exit_status != 0:
                 raise Exception(f"Clone error: {clone_error}")
             print("Repository cloned successfully.")
         else:
             print(f"Repository already exists at {application_path}. Pulling latest changes...")
-            pull_command = f"""
-                export GIT_SHELL=/usr/lpp/Rocket/rsusr/ported/bin/bash && \
-                export GIT_EXEC_PATH=/usr/lpp/Rocket/rsusr/ported/libexec/git-core && \
-                export GIT_TEMPLATE_DIR=/usr/lpp/Rocket/rsusr/ported/share/git-core/templates && \
-                export GIT_MAN_PATH=/usr/lpp/Rocket/rsusr/ported/share/man && \
-                export PATH=$PATH:/usr/lpp/Rocket/rsusr/ported/bin && \
-                cd {application_path} && git pull
-            """
-            stdin, stdout, stderr = ssh.exec_command(pull_command)
-            pull_output = stdout.read().decode().strip()
-            pull_error = stderr.read().decode().strip()
-            if pull_error:
+            pull_command = f"cd {application_path} && git pull"
+            exit_status, pull_output, pull_error = shell.run(pull_command)
+            if exit_status != 0:
                 raise Exception(f"Pull error: {pull_error}")
             print("Latest changes pulled successfully.")
     except Exception as e:
@@ -383,36 +386,20 @@ def git_pull_and_checkout(ssh, application_path, branch_name):
         print(f"Git pull or checkout failed: {e}")
 
 # Search for the Absolute Path of the Source File Dynamically
+@traced("ssh")
 def find_source_file(ssh, application_path, filename):
     try:
         print(f"Searching for '{filename}' in '{application_path}'...")
 
-        # Case-sensitive search using `-name`
-        find_command = f"find {application_path} -type f -name \"{filename}\""
-        print(f"Executing: {find_command}")
-
-        stdin, stdout, stderr = ssh.exec_command(find_command)
-        file_path = stdout.read().decode().strip()  # Capture the found file path
-        error_output = stderr.read().decode().strip()  # Capture any error output
-
-        print(f"Find Command Output: {file_path}")
-        if error_output:
-            print(f"Find Command Errors: {error_output}")
-
-        # If file is not found and case sensitivity might be an issue
+        # Look the file up in the cached listing of the remote tree; the listing
+        # is only fetched again when the remote clone moves to another commit
+        file_path = find_remote_file(ssh, application_path, filename)
         if not file_path:
-            print(f"File not found using exact name match. Trying case-insensitive search...")
-            list_command = f"ls -R {application_path}"
-            stdin, stdout, stderr = ssh.exec_command(list_command)
-            all_files = stdout.read().decode().strip().split("\n")
-            matching_files = [f for f in all_files if filename.lower() in f.lower()]
-            
-            if matching_files:
-                file_path = f"{application_path}/{matching_files[0]}"
-                print(f"Case-insensitive match found: {file_path}")
-            else:
-                raise FileNotFoundError(f"Source file '{filename}' not found in the application directory.")
+            raise FileNotFoundError(f"Source file '{filename}' not found in the application directory.")
 
+        if not file_path.endswith(f"/{filename}"):
+            print(f"Case-insensitive match found: {file_path}")
+        print(f"Find Command Output: {file_path}")
         return file_path  # Return the found file path
     except Exception as e:
         print(f"Error finding source file: {e}")
@@ -421,6 +408,7 @@ def find_source_file(ssh, application_path, filename):
 
 # Updated run_mainframe_commands to dynamically handle folder_name
 # Run mainframe commands and log messages to a file
+@traced("groovyz")
 def run_mainframe_commands(ssh, hlq, application, filename, file_path, config, workspace, outdir):
     try:
         folder_name = os.path.dirname(file_path) if file_path else ""
@@ -428,8 +416,10 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, config, w
         if not folder_name:
             raise ValueError("Cannot determine the folder name. The source file path is invalid.")
         
+        shell = get_remote_shell(ssh)
+
         print(f"Ensuring output directory exists: {outdir}")
-        ssh.exec_command(f"mkdir -p {outdir}")
+        shell.run(f"mkdir -p {outdir}")
         
         groovyzpath = config.get('groovyzpath')
         zappbuildpath = config.get('zappbuildpath')
@@ -437,9 +427,8 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, config, w
         if not groovyzpath or not zappbuildpath:
             raise ValueError("Missing groovyzpath or zappbuildpath in configuration.")
         
-        # Construct the command
+        # Construct the command (~/.profile was sourced when the session shell started)
         uss_command = (
-            f". ~/.profile && "
             f"{groovyzpath} "
             f"{zappbuildpath} -DBB_PERSONAL_DAEMON --workspace {workspace} "
             f"--application {application} --outDir {outdir} "
@@ -451,24 +440,24 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, config, w
 # --hlq GMSRATN /u/gmsratn/workspace/MortgageApplication/cobol/hello.cbl --verbose
         print(f"Executing USS Command: {uss_command}")
         
-        # Execute the command and stream output in real-time
-        stdin, stdout, stderr = ssh.exec_command(uss_command)
-        
-        stdout_output = []
-        stderr_output = []
-
-        print("Command output (stdout):")
-        for line in iter(stdout.readline, ""):
-            print(line.strip())
-            stdout_output.append(line.strip())
+        # Only the tail of each stream is kept, however long the build runs
+        stdout_output = OutputBuffer()
+        stderr_output = OutputBuffer()
+
+        def collect_line(stream, line):
+            if stream == "stdout":
+                print(line.strip())
+                stdout_output.append(line.strip())
+            else:
+                print(f"[stderr] {line.strip()}")
+                stderr_output.append(line.strip())
 
-        print("Command error output (stderr):")
-        for line in iter(stderr.readline, ""):
-            print(line.strip())
-            stderr_output.append(line.strip())
+        # Execute the command; stdout and stderr are shown as they arrive
+        print("Command output:")
+        shell.run(uss_command, on_line=collect_line, max_lines=0)
 
         # Join outputs to return as a single string
-        return "\n".join(stdout_output), "\n".join(stderr_output)
+        return stdout_output.text(), stderr_output.text()
     except Exception as e:
         error_message = f"Failed to execute build command: {e}"
         print(error_message)
@@ -476,28 +465,20 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, config, w
 
 
 # Upload directory recursively to the mainframe
-def upload_directory_to_mainframe(sftp, local_path, remote_path):
+def upload_directory_to_mainframe(sftp, local_path, remote_path, concurrency=None, mode="delta", lpar_details=None):
+    # Unless given, the channel count comes from the LPAR's sftp_concurrency in timeout_dynamic.yaml
+    if concurrency is None:
+        concurrency = get_transfer_concurrency(lpar_details, DEFAULT_CONCURRENCY)
     try:
-        for root, dirs, files in os.walk(local_path):
-            # Skip `.git` directories
-            if '.git' in root:
-                continue
-
-            # Translate local path to remote path
-            relative_path = os.path.relpath(root, local_path)
-            remote_dir = os.path.join(remote_path, relative_path).replace("\\", "/")
-            
-            try:
-                sftp.mkdir(remote_dir)
-                print(f"Created remote directory: {remote_dir}")
-            except IOError:  # Directory already exists
-                print(f"Remote directory already exists: {remote_dir}")
-            
-            for file in files:
-                local_file = os.path.join(root, file)
-                remote_file = os.path.join(remote_dir, file).replace("\\", "/")
-                sftp.put(local_file, remote_file)
-                print(f"Uploaded file: {local_file} to {remote_file}")
+        if mode == "tar":
+            # First-time seeding: the whole tree as one gzip tar stream; see tar_upload.py
+            stats = tar_upload_directory(sftp, local_path, remote_path)
+        else:
+            # Only new or changed files are sent, over `concurrency` SFTP channels; see sftp_sync.py
+            stats = sync_directory(sftp, local_path, remote_path, concurrency=concurrency)
+        print(f"Upload complete: {stats['uploaded']} uploaded, {stats['deleted']} removed, "
+              f"{stats['unchanged']} unchanged ({stats['bytes']} bytes).")
+        return stats
     except Exception as e:
         print(f"Error uploading directory: {e}")
 
@@ -699,9 +680,9 @@ def handle_server_command(action, config_path):
 
 
             elif action == "lpar_list":
-                ssh_config = load_config("timeout_dynamic.yaml")
-                config_path = "application_details.yaml"  # Use the file path here
-                config = load_config(config_path)  # Load the configuration as a dictionary
+                # Validated LPAR inventory (typed ports, reloaded when the file changes) and application settings
+                ssh_config = get_lpar_registry().lpars
+                config = load_snapshot()["application"]
 
                 if config is None:
                     print("Error loading configuration.")
@@ -741,31 +722,42 @@ def handle_server_command(action, config_path):
                 application_name = app_list[app_idx]
                 main_build_branch = config['repositories']['main_build_branch']
 
-                hostname = lpar_details.get('mfip')
-                port = int(lpar_details.get('sshport', 22))
+                hostname = lpar_details['mfip']
+                port = lpar_details['sshport']
                 username = input("Enter your username: ")
                 password = getpass("Enter your password: ")
 
                 hlq = input("Enter your HLQ: ")
                 #filename = input("Enter the filename: ")
 
-                ssh_client, mainframe_pwd = create_ssh_connection(hostname, port, username, password)
+                ssh_client, mainframe_pwd = create_ssh_connection(hostname, port, username, password, fetch_pwd=False)
 
-                if ssh_client and mainframe_pwd:
+                if ssh_client:
                     sftp = ssh_client.open_sftp()  # Open SFTP connection
                     try:
                         # Dynamically create workspace and output directories
                         #workspace_name = "workspace"  # Default workspace name
                         workspace_name = "sandbox1"
-                        outdir = f"{mainframe_pwd}/outdir"
-                        workspace_path, application_path = check_and_create_directories(
-                            ssh_client, mainframe_pwd, application_name, workspace_name
+                        # Clone the latest changes from GitHub to the mainframe
+                        print("Cloning the repository from GitHub to the mainframe...")
+                        # pwd, mkdirs, .git probe and clone/pull in a single round trip
+                        workspace = prepare_workspace(
+                            ssh_client, repo_url, application_name,
+                            workspace_name=workspace_name, extra_dirs=["outdir"]
                         )
+                        mainframe_pwd = workspace["pwd"]
+                        workspace_path = workspace["workspace_path"]
+                        application_path = workspace["application_path"]
+                        outdir = f"{mainframe_pwd}/outdir"
+                        print(f"Mainframe working directory: {mainframe_pwd}")
+                        if workspace["repo"] == "cloned":
+                            print("Repository cloned successfully.")
+                        elif workspace["repo"] == "pulled":
+                            print("Latest changes pulled successfully.")
+                        if not workspace["ok"]:
+                            print(f"Error during repository setup: {workspace['error']}")
 
                         if workspace_path and application_path:
-                            # Clone the latest changes from GitHub to the mainframe
-                            print("Cloning the repository from GitHub to the mainframe...")
-                            check_or_clone_repository(ssh_client, repo_url, application_path)
 
                             #change_to_git_repo(ssh_client, application_path)
                             #git_pull_and_checkout(ssh_client, application_path, main_build_branch)
@@ -782,25 +774,44 @@ def handle_server_command(action, config_path):
                                 analyze_build_logs(output, error_output)
                     finally:
                         sftp.close()  # Close SFTP connection
-                        ssh_client.close()
+                        get_ssh_pool().release(ssh_client)  # Keep the connection warm for the next action
 
 
 
 def main():
     config_path = os.path.join(os.getcwd(), 'pull_clone.yaml')
+    # Only answers handle_server_command can act on are cached
+    intent_cache = get_intent_cache(actions=ACTIONS)
+    # Loads the saved model now; a retrain, if the log changed, runs in the background
+    get_intent_classifier()
 
     while True:
         try:
             user_query = input("Enter your query :")
-            response = requests.post(SERVER_URL, json={"query": user_query})
-            if response.status_code == 200:
+        except EOFError:
+            break
+        try:
+            # Phrases seen before are answered from the local cache without a round trip
+            action = intent_cache.get(user_query)
+            if action is None:
+                # Confident local classification; uncertain queries still go to the server.
+                # Fetched per query so a model retrained in the background is picked up
+                action = get_intent_classifier().classify(user_query)
+            if action is None:
+                # Pooled keep-alive session with timeouts and retries; the next prompt follows straight away
+                response = get_http_client().post_json(SERVER_URL, {"query": user_query})
+                if response.status_code != 200:
+                    print(f"Server returned an error: {response.status_code}")
+                    continue
                 action = response.json().get("action")
-                handle_server_command(action, config_path)
-            else:
-                print(f"Server returned an error: {response.status_code}")
+                intent_cache.set_model_version(model_version_of(response))
+                intent_cache.put(user_query, action)
+                record_intent(user_query, action)
+            handle_server_command(action, config_path)
         except Exception as e:
             print(f"Error connecting to the server: {e}")
-        time.sleep(5)
+
+    print(intent_cache.summary())
 
 if __name__ == "__main__":
     main()
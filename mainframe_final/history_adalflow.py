@@ -150,23 +150,41 @@ import os
 import subprocess
 import shutil
 import argparse
-import json
+import time
+from collections import deque
 from datetime import datetime
 from adalflow.core.db import LocalDB
 from adalflow.core.types import DialogTurn, UserQuery, AssistantResponse
 from adalflow.core.component import Component
+from turn_store import TurnStore, iter_legacy_json
+from conversation_store import ConversationStore
+
+DEFAULT_MEMORY_WINDOW = 50
 
 # Define the Memory class to store conversation history
 
 class Memory(Component):
-    def __init__(self, turn_db: LocalDB = None):
+    """
+    Keeps only the last `window` turns in memory (AGENT_MEMORY_WINDOW, default 50).
+    Turns that fall out of the window are folded into per-action rollups (count,
+    outcomes, last outcome and parameters) saved with the session, so memory and
+    save cost stay flat however long the session runs. Every turn is still in
+    the database (see get_conversation_history).
+    """
+
+    def __init__(self, turn_db: LocalDB = None, repo=None, window=None):
         super().__init__()
-        self.current_conversation = []  # Store conversation as list of DialogTurn objects
+        self.window = window or int(os.environ.get("AGENT_MEMORY_WINDOW", DEFAULT_MEMORY_WINDOW))
+        self.current_conversation = deque()  # Recent DialogTurn objects, at most `window`
+        self._turn_details = deque()  # (action, outcome, params, timestamp) for each turn in the window
+        self.rollups = {}  # action -> summary of the turns that left the window
         self.turn_db = turn_db or LocalDB()
+        self.repo = repo
+        self.session_id = None  # Created with the first stored turn
 
-    def store_turn(self, user_input: str, assistant_response: str):
-        user_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        assistant_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def store_turn(self, user_input: str, assistant_response: str, action=None, outcome=None, params=None):
+        user_time = int(time.time())
+        assistant_time = int(time.time())
         
         dialog_turn = DialogTurn(
             user_query=UserQuery(query_str=user_input),
@@ -175,26 +193,75 @@ class Memory(Component):
             assistant_response_timestamp=assistant_time,
         )
         
+        if self.session_id is None:
+            self.session_id = self.turn_db.start_session(repo=self.repo)
         self.current_conversation.append(dialog_turn)
-        self.turn_db.save(dialog_turn)
-
-    def get_conversation_history(self):
-        return self.current_conversation
+        self._turn_details.append((action, outcome, params, int(time.time())))
+        self.turn_db.save(dialog_turn, session_id=self.session_id, repo=self.repo, action=action)
+        while len(self.current_conversation) > self.window:
+            self.current_conversation.popleft()
+            self._roll_up(*self._turn_details.popleft())
+
+    def _roll_up(self, action, outcome, params, timestamp):
+        rollup = fold_into_rollups(self.rollups, action, outcome, params, timestamp)
+        self.turn_db.save_rollup(self.session_id, rollup)
+
+    def get_rollups(self):
+        """Per-action summary of every turn this session, including the ones still in the window."""
+        rollups = {action: dict(rollup, outcomes=dict(rollup["outcomes"])) for action, rollup in self.rollups.items()}
+        for details in self._turn_details:
+            fold_into_rollups(rollups, *details)
+        return rollups
+
+    def get_conversation_history(self, limit=50, before=None, repo=None, text=None, all_sessions=False):
+        """
+        One page of history, oldest first: the newest limit turns of this session
+        (of every session with all_sessions=True), optionally only for a repo or
+        matching text. Pass the first turn's turn_id as before for the previous page.
+        """
+        if all_sessions or repo or text:
+            session_id = None
+        elif self.session_id is None:
+            return []  # Nothing stored in this session yet
+        else:
+            session_id = self.session_id
+        return self.turn_db.query(limit=limit, before=before, repo=repo, text=text, session_id=session_id)
 
     def save_conversation(self):
-        # Save the current conversation to the DB
-        self.turn_db.save(self.current_conversation)
-        self.current_conversation = []  # Reset the conversation for the new session
+        # Every turn was already stored by store_turn; only the window still has to be rolled up
+        while self.current_conversation:
+            self.current_conversation.popleft()
+            self._roll_up(*self._turn_details.popleft())
+        self.rollups = {}  # Reset the conversation for the new session
+        self.session_id = None
+
+
+# Function to add one turn to the per-action summaries
+
+def fold_into_rollups(rollups, action, outcome, params, timestamp):
+    action = action or "other"
+    rollup = rollups.get(action)
+    if rollup is None:
+        rollup = rollups[action] = {"action": action, "count": 0, "first_ts": timestamp, "last_ts": timestamp,
+                                    "last_outcome": None, "outcomes": {}, "last_params": None}
+    rollup["count"] += 1
+    rollup["last_ts"] = timestamp
+    if outcome is not None:
+        rollup["last_outcome"] = outcome
+        rollup["outcomes"][outcome] = rollup["outcomes"].get(outcome, 0) + 1
+    if params is not None:
+        rollup["last_params"] = params
+    return rollup
 
 
 # Function to log messages to a file and print to terminal
 
-def log_to_memory(message, LOG_FILE, user_input=None):
+def log_to_memory(message, LOG_FILE, user_input=None, action=None, outcome=None, **params):
     """Logs a message and stores the conversation."""
     if user_input:
-        memory.store_turn(user_input, message)  # Store user-assistant interaction
+        memory.store_turn(user_input, message, action, outcome, params or None)  # Store user-assistant interaction
     else:
-        memory.store_turn('System', message)  # System actions stored as a conversation
+        memory.store_turn('System', message, action, outcome, params or None)  # System actions stored as a conversation
 
     # Log to the file (same as your original logging)
     with open(LOG_FILE, "a") as log_file:
@@ -211,11 +278,11 @@ def clone_repo(repo_url, clone_path, LOG_FILE, user_input=None):
     try:
         subprocess.run(['git', 'clone', repo_url, clone_path], check=True)
         message = f"Repository cloned successfully to {clone_path}."
-        log_to_memory(message, LOG_FILE, user_input)
+        log_to_memory(message, LOG_FILE, user_input, "clone", "success", repo_url=repo_url, clone_path=clone_path)
         return message
     except subprocess.CalledProcessError as e:
         message = f"Error cloning repository: {e}"
-        log_to_memory(message, LOG_FILE, user_input)
+        log_to_memory(message, LOG_FILE, user_input, "clone", "failure", repo_url=repo_url, clone_path=clone_path)
         return message
 
 
@@ -231,11 +298,11 @@ def pull_latest_changes(repo_path, LOG_FILE, user_input=None):
     try:
         subprocess.run(['git', '-C', repo_path, 'pull'], check=True)
         message = f"Latest changes pulled successfully."
-        log_to_memory(message, LOG_FILE, user_input)
+        log_to_memory(message, LOG_FILE, user_input, "pull", "success", repo_path=repo_path)
         return message
     except subprocess.CalledProcessError as e:
         message = f"Error pulling latest changes: {e}"
-        log_to_memory(message, LOG_FILE, user_input)
+        log_to_memory(message, LOG_FILE, user_input, "pull", "failure", repo_path=repo_path)
         return message
 
 
@@ -245,10 +312,10 @@ def delete_folder(folder_path, LOG_FILE, user_input=None):
     permission = input(f"The folder '{folder_path}' is not a git repository. Do you want to delete it? (yes/no): ").lower()
     if permission == 'yes':
         shutil.rmtree(folder_path)
-        log_to_memory(f"Folder '{folder_path}' deleted.", LOG_FILE, user_input)
+        log_to_memory(f"Folder '{folder_path}' deleted.", LOG_FILE, user_input, "delete_folder", "success", folder_path=folder_path)
         return True
     else:
-        log_to_memory(f"Operation canceled for folder '{folder_path}'.", LOG_FILE, user_input)
+        log_to_memory(f"Operation canceled for folder '{folder_path}'.", LOG_FILE, user_input, "delete_folder", "canceled", folder_path=folder_path)
         return False
 
 
@@ -256,6 +323,7 @@ def delete_folder(folder_path, LOG_FILE, user_input=None):
 
 def main(repo_name, base_url, active_path, user_input=None):
     LOG_FILE = f"{active_path}/internet_connection_log.txt"
+    memory.repo = repo_name  # Turns of this run are stored against the repository
     repo_url = f"{base_url}/{repo_name}.git"
     clone_path = os.path.join(active_path, repo_name)
 
@@ -275,7 +343,7 @@ def main(repo_name, base_url, active_path, user_input=None):
             return message
         else:
             message = "Operation canceled."
-            log_to_memory(message, LOG_FILE, user_input)
+            log_to_memory(message, LOG_FILE, user_input, "clone", "canceled", repo_url=repo_url, clone_path=clone_path)
             return message
 
 
@@ -293,63 +361,135 @@ def print_conversation_history():
 # LocalDB Class with Save Method
 
 class LocalDB:
-    def __init__(self, db_file='conversation_db.json'):
-        self.db_file = db_file
-        self.load_data()
+    """Turns live in a shared SQLite database (see conversation_store.py); each save is one INSERT."""
 
-    def load_data(self):
-        """Load existing data from the file (if any)."""
-        try:
-            with open(self.db_file, 'r') as f:
-                content = f.read().strip()
-                if not content:
-                    self.data = []  # If empty, initialize an empty list
-                else:
-                    self.data = json.loads(content)
-                    # Convert dictionaries back to DialogTurn objects
-                    self.data = [DialogTurn.from_dict(item) if isinstance(item, dict) else item for item in self.data]
-        except FileNotFoundError:
-            self.data = []  # No data yet, create an empty list
-        except json.JSONDecodeError:
-            print("Error loading data: The JSON file is malformed or empty.")
-            self.data = []  # Handle malformed JSON and initialize an empty list
-
-    def save(self, item):
+    def __init__(self, db_file='conversation_db.sqlite3', legacy_files=('conversation_db.jsonl', 'conversation_db.json')):
+        self.db_file = db_file
+        self.store = ConversationStore(db_file)
+        if self.store.is_empty():
+            self._import_legacy(legacy_files)
+
+    def _import_legacy(self, legacy_files):
+        """Copy the turns of the old JSONL/JSON files into the database once."""
+        for path in legacy_files:
+            if not os.path.exists(path):
+                continue
+            if path.endswith(".jsonl"):
+                items = TurnStore(path, compact_every=0).iter_records()
+            else:
+                items = iter_legacy_json(path)
+            session_id = self.store.start_session()
+            count = self.store.add_turns(session_id, (turn_row(legacy_turn_to_dict(item)) for item in items))
+            print(f"Imported {count} turns from {path} into {self.db_file}")
+            return
+
+    def start_session(self, repo=None):
+        return self.store.start_session(repo=repo)
+
+    def load_data(self, limit=50):
+        """Load the newest turns (any session)."""
+        return self.query(limit=limit)
+
+    def save(self, item, session_id=None, repo=None, action=None):
         """Save a turn or conversation to the local database."""
         if isinstance(item, DialogTurn):
-            item = item.to_dict()  # Convert DialogTurn object to dictionary
+            item.turn_id = self.store.add_turn(session_id, **turn_row(item.to_dict()), repo=repo, action=action)
         elif isinstance(item, list):  # Handle the list of DialogTurn objects (entire conversation)
-            item = [turn.to_dict() for turn in item]
-        elif isinstance(item, dict):  # Conversation already in dictionary form
-            pass
-        self.data.append(item)
-        self._write_data()
+            self.store.add_turns(session_id, [dict(turn_row(turn.to_dict() if isinstance(turn, DialogTurn) else turn),
+                                                   repo=repo, action=action) for turn in item])
+        elif isinstance(item, dict):  # Turn already in dictionary form
+            self.store.add_turn(session_id, **turn_row(item), repo=repo, action=action)
+
+    def save_rollup(self, session_id, rollup):
+        self.store.save_rollup(session_id, rollup)
+
+    def get_rollups(self, session_id):
+        return self.store.get_rollups(session_id)
+
+    def query(self, limit=50, before=None, repo=None, text=None, session_id=None):
+        """One page of turns, oldest first; each DialogTurn is decoded when it is accessed."""
+        if text:
+            rows = self.store.search(text, limit=limit, before=before, repo=repo, raw=True)
+        else:
+            rows = self.store.recent_turns(limit=limit, before=before, repo=repo, session_id=session_id, raw=True)
+        return TurnPage(rows)
+
+    def get_all_data(self, limit=50):
+        """Retrieve the newest stored data."""
+        return self.query(limit=limit)
+
+
+# Function to convert a stored turn dictionary to the database columns
+
+def turn_row(item):
+    return {
+        "query": item["user_query"]["query_str"],
+        "response": item["assistant_response"]["response_str"],
+        "user_ts": parse_timestamp(item.get("user_query_timestamp")),
+        "assistant_ts": parse_timestamp(item.get("assistant_response_timestamp")),
+    }
+
+
+def parse_timestamp(value):
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        # "%Y-%m-%d %H:%M:%S" sliced by hand; strptime is many times slower
+        return int(datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]), int(value[17:19])).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return None
 
-    def _write_data(self):
-        """Write the data back to the file."""
-        with open(self.db_file, 'w') as f:
-            json.dump(self.data, f, indent=4)
 
-    def get_all_data(self):
-        """Retrieve all stored data."""
-        return self.data
+def format_timestamp(value):
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Function to convert a turn from the old JSON files to the stored dictionary form
+
+def legacy_turn_to_dict(item):
+    if "user_query" in item:
+        return item
+    # session_memory.json shape: {"timestamp", "user", "assistant"}
+    return {
+        "user_query": {"query_str": item.get("user", "")},
+        "assistant_response": {"response_str": item.get("assistant", "")},
+        "user_query_timestamp": item.get("timestamp"),
+        "assistant_response_timestamp": item.get("timestamp"),
+    }
 
 
 # DialogTurn Class
 
 class DialogTurn:
-    def __init__(self, user_query, assistant_response, user_query_timestamp, assistant_response_timestamp):
+    """One user/assistant exchange; timestamps are held as integer Unix seconds."""
+
+    __slots__ = ("user_query", "assistant_response", "user_ts", "assistant_ts", "turn_id")
+
+    def __init__(self, user_query, assistant_response, user_query_timestamp, assistant_response_timestamp, turn_id=None):
         self.user_query = user_query
         self.assistant_response = assistant_response
-        self.user_query_timestamp = user_query_timestamp
-        self.assistant_response_timestamp = assistant_response_timestamp
+        # Formatted strings from older callers and files are converted once here
+        self.user_ts = parse_timestamp(user_query_timestamp)
+        self.assistant_ts = parse_timestamp(assistant_response_timestamp)
+        self.turn_id = turn_id  # Row id in the database, used to page back through history
+
+    @property
+    def user_query_timestamp(self):
+        return format_timestamp(self.user_ts)
+
+    @property
+    def assistant_response_timestamp(self):
+        return format_timestamp(self.assistant_ts)
 
     def to_dict(self):
         return {
             "user_query": self.user_query.to_dict(),
             "assistant_response": self.assistant_response.to_dict(),
-            "user_query_timestamp": self.user_query_timestamp,
-            "assistant_response_timestamp": self.assistant_response_timestamp
+            "user_query_timestamp": self.user_ts,
+            "assistant_response_timestamp": self.assistant_ts
         }
 
     @classmethod
@@ -361,10 +501,42 @@ class DialogTurn:
             assistant_response_timestamp=data["assistant_response_timestamp"]
         )
 
+    @classmethod
+    def from_row(cls, row):
+        """Build a turn from a (id, session_id, user_ts, assistant_ts, repo, action, query, response) row."""
+        turn = cls.__new__(cls)
+        turn.turn_id, _, turn.user_ts, turn.assistant_ts, _, _, query, response = row
+        turn.user_query = UserQuery(query)
+        turn.assistant_response = AssistantResponse(response)
+        return turn
+
+
+# Page of stored turns that decodes a turn only when it is accessed
+
+class TurnPage:
+    __slots__ = ("_rows",)
+
+    def __init__(self, rows):
+        self._rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TurnPage(self._rows[index])
+        return DialogTurn.from_row(self._rows[index])
+
+    def __iter__(self):
+        for row in self._rows:
+            yield DialogTurn.from_row(row)
+
 
 # UserQuery and AssistantResponse Classes
 
 class UserQuery:
+    __slots__ = ("query_str",)
+
     def __init__(self, query_str):
         self.query_str = query_str
 
@@ -377,6 +549,8 @@ class UserQuery:
 
 
 class AssistantResponse:
+    __slots__ = ("response_str",)
+
     def __init__(self, response_str):
         self.response_str = response_str
 
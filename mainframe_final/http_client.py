@@ -0,0 +1,105 @@
+"""
+Pooled HTTP client for the intent server and other HTTP calls of the agent.
+
+One requests.Session per process keeps connections alive, so after the first
+query every classification is a single request on a warm socket. Every call
+has a connect and a read timeout, and failures that are worth repeating
+(connection errors, timeouts, 429/502/503/504) are retried a bounded number of
+times with exponential backoff and full jitter.
+
+    response = get_http_client().post_json(SERVER_URL, {"query": user_query})
+
+Settings (environment):
+    AGENT_HTTP_CONNECT_TIMEOUT   seconds, default 3.05
+    AGENT_HTTP_READ_TIMEOUT      seconds, default 30
+    AGENT_HTTP_RETRIES           retries after the first attempt, default 2
+"""
+
+import os
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 30
+RETRIES = 2
+BACKOFF_BASE = 0.25   # seconds before the first retry (upper bound of the jitter)
+BACKOFF_MAX = 4.0
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class HTTPClient:
+    def __init__(self, connect_timeout=None, read_timeout=None, retries=None, pool_size=8):
+        self.timeout = (
+            float(connect_timeout or os.environ.get("AGENT_HTTP_CONNECT_TIMEOUT", CONNECT_TIMEOUT)),
+            float(read_timeout or os.environ.get("AGENT_HTTP_READ_TIMEOUT", READ_TIMEOUT)),
+        )
+        self.retries = int(retries if retries is not None else os.environ.get("AGENT_HTTP_RETRIES", RETRIES))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.requests = 0
+        self.retried = 0
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def request(self, method, url, retry_unsafe=True, **kwargs):
+        """
+        Send a request with the client's timeouts, retrying transient failures.
+        With retry_unsafe=False a request that may have reached the server
+        (read timeout, 5xx) is not sent again; connection failures always are.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.ConnectionError as e:
+                # Includes connect timeouts: the request never reached the server
+                if attempt >= self.retries:
+                    raise
+                error = e
+            except requests.Timeout:
+                if attempt >= self.retries or not retry_unsafe:
+                    raise
+                error = None
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries or not retry_unsafe:
+                    return response
+                error = None
+                response.close()
+            delay = self._backoff(attempt)
+            if error is not None:
+                print(f"Request to {url} failed ({error.__class__.__name__}); retrying in {delay:.2f}s")
+            attempt += 1
+            self.retried += 1
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post_json(self, url, payload, **kwargs):
+        return self.request("POST", url, json=payload, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# Function to get the process-wide HTTP client
+def get_http_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient()
+        return _client
@@ -1,13 +1,13 @@
 import yaml
 import subprocess
 import argparse
+from config_cache import load_yaml
 
 def load_extensions_from_yaml(file_path):
     """Loads the list of required extensions from the YAML file."""
     try:
-        with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
-            return data.get('required_extensions', [])
+        data = load_yaml(file_path)
+        return data.get('required_extensions', [])
     except FileNotFoundError:
         print(f"YAML file not found at {file_path}")
         return []
@@ -0,0 +1,255 @@
+"""
+Local cache of query -> action classifications.
+
+The intent server answers every query with one of a handful of action
+strings, and users send the same phrases over and over ("clone the repo",
+"list branches"). Queries are normalised before lookup: case and whitespace
+are folded, punctuation is dropped and stop-words are stripped, so
+"Please clone the repo" and "clone repo" share one entry.
+
+Entries are kept in LRU order, bounded in number and expire after a TTL.
+The cache is written next to this file, so it survives restarts. Only
+actions the caller can dispatch are stored (the actions given to
+get_intent_cache), so an error or unknown answer from the server is never
+replayed. Callers with different action sets (final_agent.py and
+agent_mainframe.py) get a file each, .intent_cache-<hash of the actions>.json,
+so neither drops the other's entries when it saves. Every entry belongs to the model version the server reported when
+it was stored; when the server reports a different version the cache is
+cleared.
+
+The version is only seen when the server is asked, which is on a cache miss:
+after the server's model changes, cached answers from the old model keep
+being served until some query misses (or the entry's TTL runs out). Run
+"python3 intent_cache.py --clear" after deploying a new model to drop them
+at once.
+
+    cache = get_intent_cache(actions=("clone", "list_branches", ...))
+    action = cache.get(user_query)
+    if action is None:
+        response = get_http_client().post_json(SERVER_URL, {"query": user_query})
+        cache.set_model_version(model_version_of(response))
+        cache.put(user_query, response.json().get("action"))
+
+    python3 intent_cache.py           # print the statistics of every cache file
+    python3 intent_cache.py --clear   # empty them
+
+Settings (environment):
+    AGENT_INTENT_CACHE_FILE    path of the cache file (suffixed per action set)
+    AGENT_INTENT_CACHE_SIZE    maximum number of entries, default 512 (0 disables the cache)
+    AGENT_INTENT_CACHE_TTL     seconds an entry stays valid, default 7 days
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import hashlib
+import time
+import argparse
+import threading
+from collections import OrderedDict
+
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+CACHE_FILE = ".intent_cache.json"
+CACHE_VERSION = 1
+MAX_ENTRIES = 512
+TTL = 7 * 24 * 3600
+
+STOP_WORDS = frozenset("""
+    a an the please pls kindly can could would will you me my i we us our it
+    this that these those to for of on in at with now just want need like
+    let lets go do is are be some
+""".split())
+
+# Words, keeping names such as hello.cbl or feature-1 in one piece
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-]\w+)*")
+
+
+# Function to fold a query into its cache key
+def normalize_query(query):
+    tokens = TOKEN_PATTERN.findall(query.casefold())
+    words = [token for token in tokens if token not in STOP_WORDS]
+    # A query made only of stop-words still needs a key of its own
+    return " ".join(words or tokens)
+
+
+# Function to read the model version the intent server reports, if any
+def model_version_of(response):
+    version = response.headers.get("X-Model-Version")
+    if version is None:
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        if isinstance(body, dict):
+            version = body.get("model_version")
+    return None if version is None else str(version)
+
+
+# Function to get the default cache file for an action set, one file per set
+def cache_path(actions=None):
+    base = os.environ.get("AGENT_INTENT_CACHE_FILE") or os.path.join(SCRIPT_DIR, CACHE_FILE)
+    if actions is None:
+        return base
+    digest = hashlib.sha1("\n".join(sorted(actions)).encode("utf-8")).hexdigest()[:8]
+    root, extension = os.path.splitext(base)
+    return f"{root}-{digest}{extension}"
+
+
+class IntentCache:
+    def __init__(self, path=None, max_entries=None, ttl=None, actions=None):
+        self.path = path or cache_path(actions)
+        self.max_entries = int(max_entries if max_entries is not None
+                               else os.environ.get("AGENT_INTENT_CACHE_SIZE", MAX_ENTRIES))
+        self.ttl = float(ttl if ttl is not None else os.environ.get("AGENT_INTENT_CACHE_TTL", TTL))
+        self.actions = frozenset(actions) if actions is not None else None  # None: any action
+        self.model_version = None
+        self._entries = OrderedDict()  # normalised query -> [action, stored at], oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.rejected = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable intent cache {self.path}: {e}", file=sys.stderr)
+            return
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return
+        self.model_version = data.get("model_version")
+        now = time.time()
+        entries = data.get("entries")
+        for entry in entries if isinstance(entries, list) else []:
+            # A malformed entry is skipped like an unreadable file
+            if not (isinstance(entry, list) and len(entry) == 3 and isinstance(entry[0], str)
+                    and isinstance(entry[2], (int, float))):
+                continue
+            key, action, stored_at = entry
+            if now - stored_at < self.ttl and self._dispatchable(action):
+                self._entries[key] = [action, stored_at]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self):
+        with self._lock:
+            data = {"version": CACHE_VERSION, "model_version": self.model_version,
+                    "entries": [[key, action, stored_at] for key, (action, stored_at) in self._entries.items()]}
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(data, file, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not write intent cache {self.path}: {e}", file=sys.stderr)
+
+    def _dispatchable(self, action):
+        return isinstance(action, str) and action != "" and (self.actions is None or action in self.actions)
+
+    def get(self, query):
+        """Return the cached action for query, or None."""
+        if self.max_entries <= 0:
+            return None
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] >= self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, query, action):
+        """Remember the server's action for query and write the cache to disk."""
+        if self.max_entries <= 0:
+            return
+        if not self._dispatchable(action):
+            with self._lock:
+                self.rejected += 1
+            return
+        key = normalize_query(query)
+        if not key:
+            return
+        with self._lock:
+            self._entries[key] = [action, time.time()]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        self.save()
+
+    def set_model_version(self, version):
+        """Clear the cache when the server reports a model version other than the cached one."""
+        if version is None or version == self.model_version:
+            return
+        with self._lock:
+            if self.model_version is not None and self._entries:
+                print(f"Intent model changed ({self.model_version} -> {version}); clearing the query cache")
+                self._entries.clear()
+                self.invalidations += 1
+            self.model_version = version
+        self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "ttl": self.ttl,
+                    "model_version": self.model_version, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                    "expired": self.expired, "evictions": self.evictions, "invalidations": self.invalidations,
+                    "rejected": self.rejected}
+
+    def summary(self):
+        stats = self.stats()
+        return (f"Intent cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Function to get the process-wide intent cache; actions limits what it stores to what the caller dispatches
+def get_intent_cache(actions=None):
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = IntentCache(actions=actions)
+        return _cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show or clear the local query -> action caches.")
+    parser.add_argument("--clear", action="store_true", help="Remove every cached entry")
+    args = parser.parse_args()
+    root, extension = os.path.splitext(cache_path())
+    paths = sorted(set(glob.glob(glob.escape(root) + "-*" + extension)) | {cache_path()})
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        cache = IntentCache(path=path)
+        if args.clear:
+            cache.clear()
+            print(f"Cleared {cache.path}")
+        else:
+            print(json.dumps(dict(cache.stats(), path=cache.path), indent=2))
@@ -0,0 +1,325 @@
+"""
+Local classifier for the agent's actions.
+
+final_agent.py maps every query to one of a closed set of actions
+(open_vscode, check_internet, install_extensions, clone, list_branches,
+checkout_branch, open_file, commit_changes, lpar_list). This module answers
+the confident cases locally, in well under a millisecond, and leaves the
+others to the intent server.
+
+The model is a multinomial logistic regression over TF-IDF weighted
+character n-grams (2 to 4 characters, taken inside words) and whole words of
+the normalised query (see intent_cache.normalize_query). It is trained, in
+plain Python, from SEED_EXAMPLES and the query/action pairs the server has
+answered, which final_agent.py appends to intent_log.jsonl. Only server
+answers are logged, so the classifier never trains on its own guesses, and
+only answers in ACTIONS are learned, so it can never predict anything else.
+
+classify() returns an action only when the top probability reaches
+AGENT_INTENT_CONFIDENCE (default 0.8) and every word of the normalised query
+was seen in training; otherwise it returns None and the caller asks the
+server. Character n-grams are shared by almost any text, so the word check
+is what keeps an unfamiliar request ("delete the repo") from being taken for
+a familiar one ("clone the repo"). A new word is learned once the server
+has answered a query containing it.
+
+The trained model is saved to .intent_model.json together with the size and
+mtime of the log. Training takes seconds once the log holds thousands of
+phrases, so when the log changed since the saved model, get_intent_classifier
+serves the saved model (or, on the very first start, one trained on the seed
+phrasings alone, which takes milliseconds) and trains the new one in a
+background thread, swapping it in when it is done.
+
+    action = get_intent_classifier().classify(user_query)   # None: ask SERVER_URL
+    ...
+    record_intent(user_query, action)          # after the server answered
+
+    python3 intent_classifier.py "clone the repo"    # show the prediction
+    python3 intent_classifier.py --retrain           # train again from the log
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import argparse
+import threading
+
+from intent_cache import normalize_query
+from turn_store import TurnStore
+
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+LOG_FILE = "intent_log.jsonl"
+MODEL_FILE = ".intent_model.json"
+MODEL_VERSION = 2
+MAX_LOGGED = 20000
+CONFIDENCE = 0.8
+MIN_COVERAGE = 1.0   # share of the query's whole words that must be known to the model
+NGRAM_SIZES = (2, 3, 4)
+EPOCHS = 30
+LEARNING_RATE = 0.5
+
+ACTIONS = ("open_vscode", "check_internet", "install_extensions", "clone", "list_branches",
+           "checkout_branch", "open_file", "commit_changes", "lpar_list")
+
+# Phrasings the model starts from before anything has been logged
+SEED_EXAMPLES = {
+    "open_vscode": ["open vscode", "open vs code", "launch visual studio code", "start vscode",
+                    "open the editor", "install vscode", "download visual studio code", "open code editor"],
+    "check_internet": ["check internet", "check internet connection", "am i online", "is the network up",
+                       "test my connection", "check network", "internet speed", "check connectivity"],
+    "install_extensions": ["install extensions", "install vscode extensions", "add the required extensions",
+                           "set up extensions", "check extensions", "install the zowe extension",
+                           "install plugins", "which extensions are installed"],
+    "clone": ["clone the repo", "clone repository", "git clone", "pull latest changes", "pull the repo",
+              "get the latest code", "download the repository", "update the repo", "clone mortgageapplication"],
+    "list_branches": ["list branches", "show branches", "what branches are there", "list all branches",
+                      "show me the git branches", "display branches", "which branches exist", "branch list"],
+    "checkout_branch": ["checkout branch", "switch branch", "checkout a new branch", "create a branch",
+                        "change to another branch", "switch to develop", "git checkout", "make a new branch"],
+    "open_file": ["open file", "open hello.cbl", "open a cobol file", "show me the file", "edit a file",
+                  "open the source file", "find file", "create a new file"],
+    "commit_changes": ["commit changes", "commit and push", "push my changes", "git commit",
+                       "save and commit the file", "push to github", "commit the edit", "submit my changes"],
+    "lpar_list": ["lpar list", "list lpars", "show the mainframe lpars", "which lpars are available",
+                  "run on the mainframe", "build on mainframe", "run the uss command", "connect to the mainframe",
+                  "run groovyz build", "select lpar"],
+}
+
+
+# Function to get the n-gram and word counts of a query
+def extract_features(query):
+    counts = {}
+    for word in normalize_query(query).split():
+        key = "w:" + word
+        counts[key] = counts.get(key, 0) + 1
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            for i in range(len(padded) - size + 1):
+                gram = padded[i:i + size]
+                counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def _softmax(scores):
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+
+class IntentClassifier:
+    def __init__(self, classes, idf, weights, bias, confidence=None, min_coverage=MIN_COVERAGE):
+        self.classes = list(classes)
+        self.idf = idf          # feature -> inverse document frequency
+        self.weights = weights  # feature -> one weight per class
+        self.bias = bias
+        self.confidence = float(confidence if confidence is not None
+                                else os.environ.get("AGENT_INTENT_CONFIDENCE", CONFIDENCE))
+        self.min_coverage = min_coverage
+
+    def vectorize_counts(self, counts):
+        """Return the l2-normalised TF-IDF vector of feature counts the model knows."""
+        vector = {feature: (1 + math.log(count)) * self.idf[feature] for feature, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {feature: value / norm for feature, value in vector.items()} if norm else vector
+
+    def vectorize(self, query):
+        """Return the query's vector and the share of its whole words the model knows."""
+        counts = extract_features(query)
+        known = {feature: count for feature, count in counts.items() if feature in self.idf}
+        words = [feature for feature in counts if feature.startswith("w:")]
+        coverage = sum(1 for word in words if word in known) / len(words) if words else 0.0
+        return self.vectorize_counts(known), coverage
+
+    def _scores(self, vector):
+        scores = list(self.bias)
+        for feature, value in vector.items():
+            for i, weight in enumerate(self.weights[feature]):
+                scores[i] += value * weight
+        return scores
+
+    def predict(self, query):
+        """Return (action, probability, coverage) for the most likely action."""
+        vector, coverage = self.vectorize(query)
+        if not vector:
+            return None, 0.0, 0.0
+        probabilities = _softmax(self._scores(vector))
+        best = max(range(len(self.classes)), key=probabilities.__getitem__)
+        return self.classes[best], probabilities[best], coverage
+
+    def classify(self, query):
+        """Return the action when the model is confident, else None."""
+        action, probability, coverage = self.predict(query)
+        if probability >= self.confidence and coverage >= self.min_coverage:
+            return action
+        return None
+
+    @classmethod
+    def train(cls, examples, epochs=EPOCHS, learning_rate=LEARNING_RATE, seed=0, **kwargs):
+        """Fit the model on (query, action) pairs with stochastic gradient descent; actions outside ACTIONS are ignored."""
+        examples = [(query, action) for query, action in examples if action in ACTIONS]
+        classes = sorted({action for _, action in examples})
+        index = {action: i for i, action in enumerate(classes)}
+        documents = [(extract_features(query), index[action]) for query, action in examples]
+
+        frequency = {}
+        for counts, _ in documents:
+            for feature in counts:
+                frequency[feature] = frequency.get(feature, 0) + 1
+        total = len(documents)
+        idf = {feature: math.log((1 + total) / (1 + df)) + 1 for feature, df in frequency.items()}
+
+        model = cls(classes, idf, {feature: [0.0] * len(classes) for feature in idf}, [0.0] * len(classes), **kwargs)
+        samples = [(model.vectorize_counts(counts), label) for counts, label in documents]
+        order = list(range(len(samples)))
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for position in order:
+                vector, label = samples[position]
+                probabilities = _softmax(model._scores(vector))
+                probabilities[label] -= 1.0
+                for feature, value in vector.items():
+                    row = model.weights[feature]
+                    for i, gradient in enumerate(probabilities):
+                        row[i] -= rate * gradient * value
+                for i, gradient in enumerate(probabilities):
+                    model.bias[i] -= rate * gradient
+        return model
+
+    def to_dict(self):
+        return {"classes": self.classes, "idf": self.idf, "weights": self.weights, "bias": self.bias}
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        return cls(data["classes"], data["idf"], data["weights"], data["bias"], **kwargs)
+
+
+def _log_path(log_path=None):
+    return log_path or os.environ.get("AGENT_INTENT_LOG") or os.path.join(SCRIPT_DIR, LOG_FILE)
+
+
+# Function to append a query and the action the server chose to the training log
+def record_intent(query, action, log_path=None):
+    if not query or not action:
+        return
+    try:
+        TurnStore(_log_path(log_path), max_records=MAX_LOGGED).append({"query": query, "action": action})
+    except OSError as e:
+        print(f"Could not log intent: {e}", file=sys.stderr)
+
+
+# Function to collect the training pairs: the seed phrasings and the logged server answers
+def load_examples(log_path=None, include_seed=True, include_log=True):
+    examples = {}
+    if include_seed:
+        for action, phrases in SEED_EXAMPLES.items():
+            for phrase in phrases:
+                examples[normalize_query(phrase)] = (phrase, action)
+    path = _log_path(log_path)
+    if include_log and os.path.exists(path):
+        # A phrase the server answered again later keeps its latest action among ACTIONS
+        for record in TurnStore(path, max_records=MAX_LOGGED).iter_records():
+            query, action = record.get("query"), record.get("action")
+            if query and action in ACTIONS:
+                examples[normalize_query(query)] = (query, action)
+    return [example for key, example in examples.items() if key]
+
+
+def _log_signature(log_path):
+    try:
+        stat = os.stat(log_path)
+        return [stat.st_mtime_ns, stat.st_size]
+    except FileNotFoundError:
+        return None
+
+
+def _model_path(model_path=None):
+    return model_path or os.path.join(SCRIPT_DIR, MODEL_FILE)
+
+
+# Function to read the saved model; returns (classifier, signature of the log it was trained on)
+def load_saved_model(model_path=None):
+    try:
+        with open(_model_path(model_path), "r") as file:
+            saved = json.load(file)
+        if saved.get("version") == MODEL_VERSION:
+            return IntentClassifier.from_dict(saved["model"]), saved.get("log")
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    return None, None
+
+
+# Function to load the saved model, training it again (here and now) when the log changed
+def load_classifier(log_path=None, model_path=None, retrain=False):
+    log_path = _log_path(log_path)
+    if not retrain:
+        classifier, trained_on = load_saved_model(model_path)
+        if classifier is not None and trained_on == _log_signature(log_path):
+            return classifier
+    return train_classifier(log_path, model_path)
+
+
+# Function to train the model from the seed phrasings and the log, and save it
+def train_classifier(log_path=None, model_path=None):
+    log_path = _log_path(log_path)
+    model_path = _model_path(model_path)
+    # Taken before reading, so records appended while training trigger the next retrain
+    signature = _log_signature(log_path)
+    classifier = IntentClassifier.train(load_examples(log_path))
+    temp_path = f"{model_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "w") as file:
+            json.dump({"version": MODEL_VERSION, "log": signature, "model": classifier.to_dict()},
+                      file, separators=(",", ":"))
+        os.replace(temp_path, model_path)
+    except OSError as e:
+        print(f"Could not save intent model {model_path}: {e}", file=sys.stderr)
+    return classifier
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def _retrain():
+    global _classifier
+    try:
+        classifier = train_classifier()
+    except Exception as e:
+        print(f"Could not retrain intent model: {e}", file=sys.stderr)
+        return
+    with _classifier_lock:
+        _classifier = classifier
+
+
+# Function to get the process-wide intent classifier; call it per query, a retrained model replaces it
+def get_intent_classifier():
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            classifier, trained_on = load_saved_model()
+            if classifier is None or trained_on != _log_signature(_log_path()):
+                if classifier is None:
+                    classifier = IntentClassifier.train(load_examples(include_log=False))
+                threading.Thread(target=_retrain, name="intent-retrain", daemon=True).start()
+            _classifier = classifier
+        return _classifier
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify queries locally or retrain the intent model.")
+    parser.add_argument("queries", nargs="*", help="Queries to classify")
+    parser.add_argument("--retrain", action="store_true", help="Train again from the seed phrasings and the log")
+    args = parser.parse_args()
+    classifier = load_classifier(retrain=args.retrain)
+    if args.retrain:
+        print(f"Trained on {len(load_examples())} examples, {len(classifier.idf)} features")
+    for query in args.queries:
+        action, probability, coverage = classifier.predict(query)
+        verdict = "local" if classifier.classify(query) else "ask server"
+        print(f"{query!r}: {action} (p={probability:.2f}, coverage={coverage:.2f}, {verdict})")
@@ -1,16 +1,13 @@
 import requests
 import time
-from datetime import datetime
 import argparse
+from agent_log import append_log
 
-def log_to_file(message, LOG_FILE):
+def log_to_file(message, LOG_FILE, **fields):
     """Logs a message to the log file with a timestamp and prints it to the terminal."""
-    with open(LOG_FILE, "a") as log_file:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"{timestamp} - {message}\n"
-        log_file.write(log_message)
-        log_file.write("-" * 40 + "\n")  # Separator for readability
-        print(log_message)  # Print the message to the terminal
+    fields.setdefault("action", "internet_check")
+    log_message = append_log(message, LOG_FILE, **fields)
+    print(log_message)  # Print the message to the terminal
 
 
 def check_internet_connection(LOG_FILE):
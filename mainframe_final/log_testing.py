@@ -2,28 +2,26 @@ import os
 import subprocess
 import shutil
 import argparse
-from datetime import datetime
 import yaml
+from repo_index import find_file
+from agent_log import append_log
+from config_cache import load_yaml
 
 LOG_FILE = "internet_connection_log.txt"
 
 # Function to log messages to a file and print to the terminal
-def log_to_file(message, log_file):
+def log_to_file(message, log_file, **fields):
     """Logs a message to the log file with a timestamp and prints it to the terminal."""
-    with open(log_file, "a") as log_file_obj:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"{timestamp} - {message}\n"
-        log_file_obj.write(log_message)
-        log_file_obj.write("-" * 40 + "\n")  # Separator for readability
-        print(log_message)  # Print the message to the terminal
+    fields.setdefault("action", "open_clone")
+    log_message = append_log(message, log_file, **fields)
+    print(log_message)  # Print the message to the terminal
 
 # Function to load extensions from a YAML file
 def load_extensions_from_yaml(file_path):
     """Loads the list of required extensions from the YAML file."""
     try:
-        with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
-            return data.get('required_extensions', [])
+        data = load_yaml(file_path)
+        return data.get('required_extensions', [])
     except FileNotFoundError:
         message = f"YAML file not found at {file_path}"
         log_to_file(message, LOG_FILE)
@@ -102,11 +100,10 @@ def delete_folder(folder_path, log_file):
 def find_file_in_repo(repo_path, file_name, log_file):
     """Search for the file in the repo and return its path if found."""
     log_to_file(f"Searching for file '{file_name}' in repository '{repo_path}'", log_file)
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            file_path = os.path.join(root, file_name)
-            log_to_file(f"File found: {file_path}", log_file)
-            return file_path
+    file_path = find_file(repo_path, file_name)
+    if file_path:
+        log_to_file(f"File found: {file_path}", log_file)
+        return file_path
     log_to_file(f"File '{file_name}' not found in repository '{repo_path}'", log_file)
     return None
 
@@ -6,45 +6,55 @@ date : 13th feb
 """
 
 
-import os, json
+import os, json, time
 from getpass import getpass
 import webbrowser
 import shutil
 import paramiko
 import yaml
 import argparse
-from datetime import datetime
-
-
-def log_to_file(message, LOG_FILE):
+from ssh_pool import get_ssh_pool
+from remote_shell import get_remote_shell
+from remote_workspace import prepare_workspace
+from remote_tree import find_remote_file
+from channel_stream import OutputBuffer
+from agent_log import append_log
+from agent_trace import traced
+from config_cache import load_yaml
+from config_snapshot import normalize_lpar_details
+
+
+def log_to_file(message, LOG_FILE, **fields):
     """Logs a message to the log file with a timestamp."""
-    with open(LOG_FILE, "a") as log_file:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_file.write(f"{timestamp} - {message}\n")
-        log_file.write("-" * 40 + "\n")  # Separator for readability
+    fields.setdefault("action", "build")
+    append_log(message, LOG_FILE, **fields)
 
 
 def load_config(yaml_file):  # Default file name
     script_dir = os.path.dirname(os.path.realpath(__file__))  # Get the directory of the running script
     yaml_path = os.path.join(script_dir, yaml_file)  # Construct the full path to the YAML file
     if os.path.exists(yaml_path):
-        with open(yaml_path, 'r') as file:
-            config = yaml.safe_load(file)
-        return config
+        # Parsed once per process; parsed again only when the file's mtime or size changes
+        return load_yaml(yaml_path)
     else:
         raise FileNotFoundError(f"Configuration file '{yaml_file}' not found at path: {yaml_path}")
 
-def create_ssh_connection(hostname, port, username, password,LOG_FILE):
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+@traced("ssh")
+def create_ssh_connection(hostname, port, username, password,LOG_FILE, fetch_pwd=True):
+    ssh = None
     try:
-        ssh.connect(hostname=hostname, port=port, username=username, password=password)
+        # Reuse an authenticated transport from the pool when one is available
+        ssh = get_ssh_pool().acquire(hostname, port, username, password)
         log_to_file("Connection successful!",LOG_FILE)
 
+        if not fetch_pwd:
+            # The caller learns the working directory from prepare_workspace instead
+            print("Connection successful!")
+            return ssh, None
 
         command = "cd /u/gmszfs && pwd"
-        stdin, stdout, stderr = ssh.exec_command(command)
-        mainframe_pwd = stdout.read().decode().strip()
+        exit_status, mainframe_pwd, error_output = get_remote_shell(ssh).run(command)
+        mainframe_pwd = mainframe_pwd.strip()
         # stdin, stdout, stderr = ssh.exec_command("pwd")
         # mainframe_pwd = stdout.read().decode().strip()
         log_to_file(f"Mainframe working directory: {mainframe_pwd}",LOG_FILE)
@@ -54,7 +64,8 @@ def create_ssh_connection(hostname, port, username, password,LOG_FILE):
         print(f"Mainframe working directory: {mainframe_pwd}")
         return ssh, mainframe_pwd
     except Exception as e:
-
+        if ssh is not None:
+            get_ssh_pool().discard(ssh)
         log_to_file(f"SSH connection failed: {e}",LOG_FILE)
         print(f"SSH connection failed: {e}") 
         return f"SSH connection failed: {e}",None
@@ -67,17 +78,19 @@ def check_and_create_directories(ssh, mainframe_pwd, application, LOG_FILE,works
         workspace_path = f"{mainframe_pwd}/{workspace_name}"
         application_path = f"{workspace_path}/{application}"
 
+        shell = get_remote_shell(ssh)
+
         # Ensure workspace directory exists
         
         log_to_file(f"Ensuring workspace directory: {workspace_path}",LOG_FILE)
-        stdin, stdout, stderr = ssh.exec_command(f"mkdir -p {workspace_path}")
-        if stderr.read().strip():
+        exit_status, output, error_output = shell.run(f"mkdir -p {workspace_path}")
+        if exit_status != 0:
             raise Exception(f"Failed to create workspace directory: {workspace_path}")
 
         # Ensure application directory exists
         log_to_file(f"Ensuring application directory: {application_path}",LOG_FILE)
-        stdin, stdout, stderr = ssh.exec_command(f"mkdir -p {application_path}")
-        if stderr.read().strip():
+        exit_status, output, error_output = shell.run(f"mkdir -p {application_path}")
+        if exit_status != 0:
             raise Exception(f"Failed to create application directory: {application_path}")
 
         return workspace_path, application_path
@@ -86,49 +99,36 @@ def check_and_create_directories(ssh, mainframe_pwd, application, LOG_FILE,works
         return None, None
 
 
+@traced("git")
 def check_or_clone_repository(ssh, repo_url, application_path,LOG_FILE):
     """
     Check if a Git repository exists on the mainframe.
     If not, clone the repository. If it exists, pull the latest changes.
     """
     try:
+        # The session shell already has the Rocket git environment exported
+        shell = get_remote_shell(ssh)
+
         # Check if the repository already exists
         check_git_repo_cmd = f"if [ -d {application_path}/.git ]; then echo 'found'; else echo 'not_found'; fi"
-        stdin, stdout, stderr = ssh.exec_command(check_git_repo_cmd)
-        repo_status = stdout.read().decode().strip()
+        exit_status, repo_status, error_output = shell.run(check_git_repo_cmd)
+        repo_status = repo_status.strip()
 
         if repo_status == 'not_found':
             #print(f"No Git repository found at {application_path}. Cloning the repository...")
-            clone_command = f"""
-                export GIT_SHELL=/usr/lpp/Rocket/rsusr/ported/bin/bash && \
-                export GIT_EXEC_PATH=/usr/lpp/Rocket/rsusr/ported/libexec/git-core && \
-                export GIT_TEMPLATE_DIR=/usr/lpp/Rocket/rsusr/ported/share/git-core/templates && \
-                export GIT_MAN_PATH=/usr/lpp/Rocket/rsusr/ported/share/man && \
-                export PATH=$PATH:/usr/lpp/Rocket/rsusr/ported/bin && \
-                git clone {repo_url} {application_path}
-            """
-            stdin, stdout, stderr = ssh.exec_command(clone_command)
-            clone_output = stdout.read().decode().strip()
-            clone_error = stderr.read().decode().strip()
-            if clone_error:
+            clone_command = f"git clone {repo_url} {application_path}"
+            exit_status, clone_output, clone_error = shell.run(clone_command)
+            # git reports progress on stderr, so only the exit status means failure
+            if exit_status != 0:
                 raise Exception(f"Clone error: {clone_error}")
             log_to_file("Repository cloned successfully.",LOG_FILE)
             print(f"Repository cloned successfully.")
             return
         else:
             log_to_file(f"Repository already exists at {application_path}. Pulling latest changes...",LOG_FILE)
-            pull_command = f"""
-                export GIT_SHELL=/usr/lpp/Rocket/rsusr/ported/bin/bash && \
-                export GIT_EXEC_PATH=/usr/lpp/Rocket/rsusr/ported/libexec/git-core && \
-                export GIT_TEMPLATE_DIR=/usr/lpp/Rocket/rsusr/ported/share/git-core/templates && \
-                export GIT_MAN_PATH=/usr/lpp/Rocket/rsusr/ported/share/man && \
-                export PATH=$PATH:/usr/lpp/Rocket/rsusr/ported/bin && \
-                cd {application_path} && git pull
-            """
-            stdin, stdout, stderr = ssh.exec_command(pull_command)
-            pull_output = stdout.read().decode().strip()
-            pull_error = stderr.read().decode().strip()
-            if pull_error:
+            pull_command = f"cd {application_path} && git pull"
+            exit_status, pull_output, pull_error = shell.run(pull_command)
+            if exit_status != 0:
                 raise Exception(f"Pull error: {pull_error}")
             log_to_file("Latest changes pulled successfully.",LOG_FILE)
             print(f"Latest changes pulled successfully.")
@@ -139,36 +139,20 @@ def check_or_clone_repository(ssh, repo_url, application_path,LOG_FILE):
 
 
 # Search for the Absolute Path of the Source File Dynamically
+@traced("ssh")
 def find_source_file(ssh, application_path, filename,LOG_FILE):
     try:
         log_to_file(f"Searching for '{filename}' in '{application_path}'...",LOG_FILE)
 
-        # Case-sensitive search using `-name`
-        find_command = f"find {application_path} -type f -name \"{filename}\""
-        log_to_file(f"Executing: {find_command}",LOG_FILE)
-
-        stdin, stdout, stderr = ssh.exec_command(find_command)
-        file_path = stdout.read().decode().strip()  # Capture the found file path
-        error_output = stderr.read().decode().strip()  # Capture any error output
-
-        print(f"Find Command Output: {file_path}")
-        if error_output:
-            print(f"Find Command Errors: {error_output}")
-
-        # If file is not found and case sensitivity might be an issue
+        # Look the file up in the cached listing of the remote tree; the listing
+        # is only fetched again when the remote clone moves to another commit
+        file_path = find_remote_file(ssh, application_path, filename)
         if not file_path:
-            print(f"File not found using exact name match. Trying case-insensitive search...")
-            list_command = f"ls -R {application_path}"
-            stdin, stdout, stderr = ssh.exec_command(list_command)
-            all_files = stdout.read().decode().strip().split("\n")
-            matching_files = [f for f in all_files if filename.lower() in f.lower()]
-            
-            if matching_files:
-                file_path = f"{application_path}/{matching_files[0]}"
-                print(f"Case-insensitive match found: {file_path}")
-            else:
-                raise FileNotFoundError(f"Source file '{filename}' not found in the application directory.")
+            raise FileNotFoundError(f"Source file '{filename}' not found in the application directory.")
 
+        if not file_path.endswith(f"/{filename}"):
+            print(f"Case-insensitive match found: {file_path}")
+        print(f"Find Command Output: {file_path}")
         return file_path  # Return the found file path
     except Exception as e:
         print(f"Error finding source file: {e}")
@@ -233,6 +217,7 @@ def run_mainframe_commands_1(ssh, hlq, application, filename, file_path, config,
         print(error_message)
         return 
 
+@traced("groovyz")
 def run_mainframe_commands(ssh, hlq, application, filename, file_path, lpar_details, workspace, outdir, LOG_FILE):
     try:
         folder_name = os.path.dirname(file_path) if file_path else ""
@@ -240,11 +225,13 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, lpar_deta
         if not folder_name:
             raise ValueError("Cannot determine the folder name. The source file path is invalid.")
         
+        shell = get_remote_shell(ssh)
+
         log_to_file(f"Ensuring output directory exists: {outdir}", LOG_FILE)
-        ssh.exec_command(f"mkdir -p {outdir}")
+        shell.run(f"mkdir -p {outdir}")
         
-        # Extract configuration details correctly
-        config = list(lpar_details.values())[0]  # Get the first dictionary inside lpar_details
+        # Accepts {"gmsmf": {...}} as well as the LPAR settings themselves
+        lpar_name, config = normalize_lpar_details(lpar_details)
         
         groovyzpath = config.get('groovyzpath')
         zappbuildpath = config.get('zappbuildpath')
@@ -252,9 +239,8 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, lpar_deta
         if not groovyzpath or not zappbuildpath:
             raise ValueError("Missing groovyzpath or zappbuildpath in configuration.")
         
-        # Construct the command
+        # Construct the command (~/.profile was sourced when the session shell started)
         uss_command = (
-            f". ~/.profile && "
             f"{groovyzpath} "
             f"-DBB_DAEMON_HOST 127.0.0.1 -DBB_DAEMON_PORT 7380 "
             f"{zappbuildpath} "
@@ -267,25 +253,25 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, lpar_deta
 
         log_to_file(f"Executing USS Command: {uss_command}", LOG_FILE)
         
-        # Execute the command and stream output
-        stdin, stdout, stderr = ssh.exec_command(uss_command)
-        
-        stdout_output = []
-        stderr_output = []
-
-        print("Command output (stdout):")
-        for line in iter(stdout.readline, ""):
-            print(line.strip())
-            stdout_output.append(line.strip())
+        # Only the tail of each stream is kept, however long the build runs
+        stdout_output = OutputBuffer()
+        stderr_output = OutputBuffer()
+
+        def collect_line(stream, line):
+            if stream == "stdout":
+                print(line.strip())
+                stdout_output.append(line.strip())
+            else:
+                print(f"[stderr] {line.strip()}")
+                stderr_output.append(line.strip())
 
-        print("Command error output (stderr):")
-        for line in iter(stderr.readline, ""):
-            print(line.strip())
-            stderr_output.append(line.strip())
+        # Execute the command; stdout and stderr are shown as they arrive
+        print("Command output:")
+        shell.run(uss_command, on_line=collect_line, max_lines=0)
 
-        print(f'Command output (stdout):    {"\n".join(stdout_output)}')
-        print(f'Command error output (stderr):    {"\n".join(stderr_output)}')
-        return "\n".join(stdout_output), "\n".join(stderr_output)
+        print(f'Command output (stdout):    {stdout_output.text()}')
+        print(f'Command error output (stderr):    {stderr_output.text()}')
+        return stdout_output.text(), stderr_output.text()
     
     except Exception as e:
         error_message = f"Failed to execute build command: {e}"
@@ -295,19 +281,20 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, lpar_deta
 
 
 # Analyze Logs and Display Build Status
-def analyze_build_logs(output, error_output,LOG_FILE):
+def analyze_build_logs(output, error_output,LOG_FILE, **fields):
     if error_output:
 
-        log_to_file("Build failed.",LOG_FILE)
+        log_to_file("Build failed.",LOG_FILE, outcome="failure", **fields)
         print(f"Error Logs:\n{error_output}")
         return
     else:
-        log_to_file("Build succeeded.",LOG_FILE)
+        log_to_file("Build succeeded.",LOG_FILE, outcome="success", **fields)
         print(f"Build Output:\n{output}")
         return
 
 
 
+@traced("agent", name="lpar_mainframe_new")
 def main(repo_name, git_url, username, password , hlq ,filename, lpar_details,active_folder_path):
     # ssh_config = load_config("timeout_dynamic.yaml")
     # config_path = "application_details.yaml"
@@ -349,8 +336,10 @@ def main(repo_name, git_url, username, password , hlq ,filename, lpar_details,ac
     # app_idx = int(input("Select your application by number: ")) - 1
     # application_name = app_list[app_idx]
     # main_build_branch = config['repositories']['main_build_branch']
-    lpar_details = json.loads(lpar_details)
-    lpar_values = list(lpar_details.values())[0]
+    # Validated settings with a typed port, whichever shape the frontend sent
+    lpar_name, lpar_values = normalize_lpar_details(lpar_details)
+    # Fields attached to the structured log events of this build
+    event = {"repo": repo_name, "lpar": lpar_name}
 ##########
 
     # lpar_details = json.loads(lpar_details)
@@ -373,38 +362,56 @@ def main(repo_name, git_url, username, password , hlq ,filename, lpar_details,ac
         #ssh_client, mainframe_pwd = create_ssh_connection('13.233.106.52', '2022', username, password, LOG_FILE)
 
 
-    hostname = lpar_values.get('mfip')
-    port = int(lpar_values.get('sshport', 22))
+    hostname = lpar_values['mfip']
+    port = lpar_values['sshport']
 
-    ssh_client, mainframe_pwd = create_ssh_connection(hostname, port, username, password, LOG_FILE)
+    ssh_client, mainframe_pwd = create_ssh_connection(hostname, port, username, password, LOG_FILE, fetch_pwd=False)
 
-    if ssh_client and mainframe_pwd:
+    if ssh_client and not isinstance(ssh_client, str):
         sftp = ssh_client.open_sftp()
         try:
             workspace_name = "sandbox"
-            outdir = f"{mainframe_pwd}/outdir"
-            workspace_path, application_path = check_and_create_directories(
-                ssh_client, mainframe_pwd, repo_name,LOG_FILE, workspace_name
+            print("Cloning the repository from GitHub to the mainframe...")
+            started = time.monotonic()
+            # pwd, workspace and outdir mkdirs, .git probe and clone/pull in a single round trip
+            workspace = prepare_workspace(
+                ssh_client, repo_url, repo_name, base_dir="/u/gmszfs",
+                workspace_name=workspace_name, extra_dirs=["outdir"]
             )
+            event["duration"] = round(time.monotonic() - started, 3)
+            mainframe_pwd = workspace["pwd"]
+            workspace_path = workspace["workspace_path"]
+            application_path = workspace["application_path"]
+            log_to_file(f"Mainframe working directory: {mainframe_pwd}",LOG_FILE)
+            log_to_file(f"Ensuring workspace directory: {workspace_path}",LOG_FILE)
+            log_to_file(f"Ensuring application directory: {application_path}",LOG_FILE)
+            if workspace["repo"] == "cloned":
+                log_to_file("Repository cloned successfully.",LOG_FILE, step="workspace", outcome="cloned", **event)
+                print(f"Repository cloned successfully.")
+            elif workspace["repo"] == "pulled":
+                log_to_file("Latest changes pulled successfully.",LOG_FILE, step="workspace", outcome="pulled", **event)
+                print(f"Latest changes pulled successfully.")
+            if not workspace["ok"]:
+                log_to_file(f"Error during repository setup: {workspace['error']}",LOG_FILE, step="workspace", outcome="failure", **event)
+            outdir = f"{mainframe_pwd}/outdir"
 
             if workspace_path and application_path:
-                print("Cloning the repository from GitHub to the mainframe...")
-                check_or_clone_repository(ssh_client, repo_url, application_path, LOG_FILE)
-
                 #filename = input("Enter the filename: ")
                 file_path = find_source_file(ssh_client, application_path, filename,LOG_FILE)
 
                 if file_path:
+                    started = time.monotonic()
                     output, error_output = run_mainframe_commands(
-                        ssh_client, hlq, repo_name, filename, file_path, lpar_details, workspace_path, outdir,LOG_FILE
+                        ssh_client, hlq, repo_name, filename, file_path, lpar_values, workspace_path, outdir,LOG_FILE
                     )
-                    analyze_build_logs(output, error_output,LOG_FILE)
+                    event["duration"] = round(time.monotonic() - started, 3)
+                    analyze_build_logs(output, error_output,LOG_FILE, step="build", **event)
                     print(f'\nCommand output (stdout): \n{output}')
                     print(f'\nCommand error output (stderr): \n{error_output}')
                     return
         finally:
             sftp.close()
-            ssh_client.close()
+            get_ssh_pool().release(ssh_client)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+"""
+Resident registry of the LPARs in timeout_dynamic.yaml.
+
+The registry keeps the validated LPAR inventory (same schema and typed ports
+as config_snapshot.py) and polls the file's mtime and size in a background
+thread. When the file changes it is parsed and validated as a whole, and the
+new inventory replaces the old one in a single assignment; a file that does
+not validate is reported and the previous inventory stays in use.
+
+After a reload, SSH pool connections are drained only for addresses
+(mfip, sshport) that no LPAR uses any more. LPARs that were added, or whose
+address did not change, keep their warm sessions, so an LPAR can be added or
+moved without restarting the agent.
+
+    registry = get_lpar_registry()
+    lpar = registry.get("gmsmf")          # {"name", "mfip", "sshport": 2022, ...}
+    registry.on_change(lambda added, removed, changed: ...)
+"""
+
+import os
+import sys
+import threading
+
+import yaml
+
+from config_cache import freeze, load_yaml
+from config_snapshot import SCRIPT_DIR, SOURCES, LPAR_SCHEMA, ConfigError, validate
+
+
+POLL_INTERVAL = 2.0  # seconds between checks of the file
+
+
+class LPARRegistry:
+    def __init__(self, path=None, poll_interval=POLL_INTERVAL, pool=None):
+        self.path = path or os.path.join(SCRIPT_DIR, SOURCES["lpars"])
+        self.poll_interval = poll_interval
+        self.pool = pool  # None: the process-wide SSH pool, looked up when needed
+        self.lpars = freeze({})
+        self.version = 0
+        self.last_error = None
+        self._signature = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stopped = threading.Event()
+        self.reload()
+
+    def get(self, name):
+        return self.lpars.get(name)
+
+    def names(self):
+        return list(self.lpars)
+
+    def on_change(self, callback):
+        """callback(added, removed, changed) is called with LPAR names after each reload."""
+        self._listeners.append(callback)
+
+    def _read(self):
+        problems = []
+        try:
+            document = load_yaml(self.path)
+        except (OSError, yaml.YAMLError) as e:
+            raise ConfigError([f"{self.path}: {e}"])
+        lpars = validate(document, {"*": LPAR_SCHEMA}, os.path.basename(self.path), problems)
+        if problems:
+            raise ConfigError(problems)
+        for name, lpar in lpars.items():
+            lpar["name"] = name
+        return freeze(lpars)
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def reload(self, force=False):
+        """Re-read the file if it changed; returns True when the inventory was replaced."""
+        with self._lock:
+            signature = self._file_signature()
+            if signature == self._signature and not force:
+                return False
+            self._signature = signature
+            try:
+                lpars = self._read()
+            except ConfigError as e:
+                self.last_error = str(e)
+                print(f"Keeping the previous LPAR list: {e}", file=sys.stderr)
+                return False
+            old = self.lpars
+            self.lpars = lpars
+            self.version += 1
+            self.last_error = None
+
+        added = [name for name in lpars if name not in old]
+        removed = [name for name in old if name not in lpars]
+        changed = [name for name in lpars if name in old and lpars[name] != old[name]]
+        if self.version > 1 and (added or removed or changed):
+            self._drain_stale(old, lpars)
+            for callback in list(self._listeners):
+                try:
+                    callback(added, removed, changed)
+                except Exception as e:
+                    print(f"LPAR change listener failed: {e}", file=sys.stderr)
+        return True
+
+    def _drain_stale(self, old, new):
+        """Drain pooled connections to addresses no LPAR points at any more."""
+        current = {(lpar["mfip"], lpar["sshport"]) for lpar in new.values()}
+        stale = {(lpar["mfip"], lpar["sshport"]) for lpar in old.values()} - current
+        if not stale:
+            return
+        pool = self.pool
+        if pool is None:
+            # Nothing to drain if no action has used SSH yet
+            if "ssh_pool" not in sys.modules:
+                return
+            pool = sys.modules["ssh_pool"].get_ssh_pool()
+        for hostname, port in sorted(stale):
+            result = pool.drain(hostname, port)
+            print(f"Draining SSH connections to {hostname}:{port} "
+                  f"({result['closed']} closed, {result['draining']} in use)", file=sys.stderr)
+
+    def start(self):
+        """Watch the file in a background thread."""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="lpar-registry", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"LPAR registry reload failed: {e}", file=sys.stderr)
+
+    def stats(self):
+        return {"path": self.path, "version": self.version, "lpars": self.names(), "error": self.last_error}
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+# Function to get the process-wide LPAR registry (watching timeout_dynamic.yaml)
+def get_lpar_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = LPARRegistry()
+            _registry.start()
+        return _registry
@@ -2,14 +2,12 @@ import subprocess
 import os
 import logging
 import argparse
-from datetime import datetime
+from agent_log import append_log
 
-def log_to_file(message, LOG_FILE):
+def log_to_file(message, LOG_FILE, **fields):
     """Logs a message to the log file with a timestamp."""
-    with open(LOG_FILE, "a") as log_file:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_file.write(f"{timestamp} - {message}\n")
-        log_file.write("-" * 40 + "\n")  # Separator for readability
+    fields.setdefault("action", "new_branch")
+    append_log(message, LOG_FILE, **fields)
 
 def list_branches(repo_path, LOG_FILE):
     """List all available branches in the repository."""
@@ -2,17 +2,19 @@ import os
 import subprocess
 import shutil
 import argparse
-from datetime import datetime
 import yaml,json
+from repo_index import find_file, refresh_file_index
+from agent_log import append_log
+from agent_trace import traced
+from config_cache import load_yaml
 # Log file path (same as the one used previously)
 LOG_FILE = "internet_connection_log.txt"
 
 def load_extensions_from_yaml(file_path):
     """Loads the list of required extensions from the YAML file."""
     try:
-        with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
-            return data.get('required_extensions', [])
+        data = load_yaml(file_path)
+        return data.get('required_extensions', [])
     except FileNotFoundError:
         print(f"YAML file not found at {file_path}")
         return []
@@ -23,14 +25,11 @@ def load_extensions_from_yaml(file_path):
 
 
 # Function to log messages to a file and print to the terminal
-def log_to_file(message, LOG_FILE):
+def log_to_file(message, LOG_FILE, **fields):
     """Logs a message to the log file with a timestamp and prints it to the terminal."""
-    with open(LOG_FILE, "a") as log_file:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"{timestamp} - {message}\n"
-        log_file.write(log_message)
-        log_file.write("-" * 40 + "\n")  # Separator for readability
-        print(log_message)  # Print the message to the terminal
+    fields.setdefault("action", "open_clone")
+    log_message = append_log(message, LOG_FILE, **fields)
+    print(log_message)  # Print the message to the terminal
 
 def get_installed_extensions():
     """Returns a list of installed VSCode extensions."""
@@ -57,6 +56,7 @@ def install_extension(extension):
 
 
 # def clone_repo(repo_url, clone_path, LOG_FILE):
+@traced("git")
 def clone_repo(repo_url, clone_path,LOG_FILE,branch='Feature/Demo'):
     try:
         print("Feature_branch")
@@ -80,9 +80,11 @@ def is_git_repo(folder_path):
     return os.path.isdir(os.path.join(folder_path, ".git"))
 
 
+@traced("git")
 def pull_latest_changes(repo_path, LOG_FILE):
     try:
         subprocess.run(['git', '-C', repo_path, 'pull'], check=True)
+        refresh_file_index(repo_path)
         message = f"Latest changes pulled successfully."
         log_to_file(message, LOG_FILE)
         return message
@@ -106,11 +108,10 @@ def delete_folder(folder_path, LOG_FILE):
 def find_file_in_repo(repo_path, file_name, LOG_FILE):
     """Search for the file in the repo and return its path if found."""
     log_to_file(f"Searching for file '{file_name}' in repository '{repo_path}'", LOG_FILE)
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            file_path = os.path.join(root, file_name)
-            log_to_file(f"File found: {file_path}", LOG_FILE)
-            return file_path
+    file_path = find_file(repo_path, file_name)
+    if file_path:
+        log_to_file(f"File found: {file_path}", LOG_FILE)
+        return file_path
     log_to_file(f"File '{file_name}' not found in repository '{repo_path}'", LOG_FILE)
     return None
 
@@ -130,6 +131,7 @@ def open_in_vscode(file_path, LOG_FILE):
         return f"Error opening file in VSCode: {e}"
 
 
+@traced("agent", name="open_clone")
 def main(required_extensions, repo_name, base_url, file_name, active_folder_path):
 
     LOG_FILE = f"{active_folder_path}/internet_connection_log.txt"
@@ -0,0 +1,169 @@
+"""
+One persistent USS shell per LPAR session.
+
+Every ssh.exec_command opens a new channel and a new login shell, and the
+build step re-sources ~/.profile and re-exports the Rocket git variables each
+time. RemoteShell keeps a single /bin/sh running on one channel, bootstraps
+the environment once, and runs each command in a subshell of it. The end of
+each command's output is marked by a sentinel line carrying the exit status,
+so a step costs one round trip instead of a shell startup.
+
+Only the bootstrap exports live in the session shell. A cd, a variable or a
+set inside a command ends with its subshell, so every command starts in the
+login directory with the bootstrapped environment, whatever ran before it on
+the pooled connection.
+
+    shell = get_remote_shell(ssh)
+    exit_status, output, error_output = shell.run(f"mkdir -p {workspace_path}")
+"""
+
+import uuid
+import threading
+import weakref
+
+from channel_stream import iter_channel_lines, OutputBuffer, ChannelTimeout, MAX_OUTPUT_LINES
+
+
+COMMAND_TIMEOUT = 600  # seconds without any output before a command is given up on
+
+
+# Environment for the Rocket ported git on USS
+ROCKET_GIT_ENV = [
+    "export GIT_SHELL=/usr/lpp/Rocket/rsusr/ported/bin/bash",
+    "export GIT_EXEC_PATH=/usr/lpp/Rocket/rsusr/ported/libexec/git-core",
+    "export GIT_TEMPLATE_DIR=/usr/lpp/Rocket/rsusr/ported/share/git-core/templates",
+    "export GIT_MAN_PATH=/usr/lpp/Rocket/rsusr/ported/share/man",
+    "export PATH=$PATH:/usr/lpp/Rocket/rsusr/ported/bin",
+]
+
+class RemoteShellError(Exception):
+    pass
+
+
+class RemoteShell:
+    def __init__(self, ssh, shell="/bin/sh", source_profile=True, encoding="utf-8"):
+        self.ssh = ssh
+        self.shell = shell
+        self.source_profile = source_profile
+        self.encoding = encoding
+        self.channel = None
+        # One command at a time on the shared channel
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Start the shell and set up the environment once for the whole session."""
+        transport = self.ssh.get_transport()
+        if transport is None or not transport.is_active():
+            raise RemoteShellError("SSH transport is not connected.")
+        self.channel = transport.open_session()
+        # No pty: stdout and stderr stay separate and nothing is echoed back
+        self.channel.exec_command(self.shell)
+        bootstrap = list(ROCKET_GIT_ENV)
+        if self.source_profile:
+            # A missing profile would make "." abort the whole non-interactive shell
+            bootstrap.insert(0, "if [ -r ~/.profile ]; then . ~/.profile; fi >/dev/null 2>&1")
+        # Run in the session shell itself, so the exports apply to every later command
+        self._execute("\n".join(bootstrap), COMMAND_TIMEOUT, None, MAX_OUTPUT_LINES, isolated=False)
+        return self
+
+    def is_alive(self):
+        return (self.channel is not None and not self.channel.closed
+                and not self.channel.exit_status_ready())
+
+    def close(self):
+        if self.channel is not None:
+            try:
+                self.channel.send("exit\n")
+            except Exception:
+                pass
+            self.channel.close()
+            self.channel = None
+
+    def run(self, command, timeout=COMMAND_TIMEOUT, on_line=None, max_lines=MAX_OUTPUT_LINES):
+        """
+        Run a command in a subshell and return (exit_status, stdout, stderr).
+        on_line(stream, line) is called for every line as it arrives, with
+        stream being "stdout" or "stderr". Only the last max_lines lines of
+        each stream are kept for the returned text. RemoteShellError is raised
+        when nothing arrives for timeout seconds (None waits forever).
+        """
+        return self._execute(command, timeout, on_line, max_lines, isolated=True)
+
+    def _execute(self, command, timeout, on_line, max_lines, isolated):
+        if not self.is_alive():
+            raise RemoteShellError("Remote shell is not running.")
+        marker = f"__AGENT_{uuid.uuid4().hex}__"
+        opening, closing = ("(", ")") if isolated else ("{", "}")
+        # stdin comes from /dev/null so a command can never read the next command;
+        # the leading newline in the sentinel keeps it on its own line
+        script = (
+            f"{opening} {command}\n{closing} </dev/null\n"
+            f"__agent_rc=$?\n"
+            f"printf '\\n%s %s\\n' '{marker}' \"$__agent_rc\"\n"
+            f"printf '\\n%s\\n' '{marker}' >&2\n"
+        )
+        with self._lock:
+            try:
+                self.channel.sendall(script.encode(self.encoding))
+                return self._read_until_marker(marker, timeout, on_line, max_lines)
+            except BaseException:
+                # The framing is out of step now; the next get_remote_shell starts a fresh shell
+                self.close()
+                raise
+
+    def _read_until_marker(self, marker, timeout, on_line, max_lines):
+        buffers = {"stdout": OutputBuffer(max_lines), "stderr": OutputBuffer(max_lines)}
+        # A line is held back one step so the blank line produced by the
+        # sentinel's leading newline never reaches on_line or the output
+        held = {"stdout": None, "stderr": None}
+        done = set()
+        exit_status = None
+        try:
+            for stream, line in iter_channel_lines(self.channel, timeout, self.encoding):
+                if stream in done:
+                    continue
+                if line.startswith(marker):
+                    done.add(stream)
+                    if stream == "stdout":
+                        exit_status = int(line[len(marker):].strip() or 0)
+                    if held[stream] not in (None, ""):
+                        self._emit(buffers, on_line, stream, held[stream])
+                    if len(done) == 2:
+                        break
+                    continue
+                if held[stream] is not None:
+                    self._emit(buffers, on_line, stream, held[stream])
+                held[stream] = line
+        except ChannelTimeout as e:
+            raise RemoteShellError(str(e))
+        if len(done) < 2:
+            raise RemoteShellError("Remote shell exited while running a command.")
+        return exit_status, buffers["stdout"].text(), buffers["stderr"].text()
+
+    @staticmethod
+    def _emit(buffers, on_line, stream, line):
+        buffers[stream].append(line)
+        if on_line is not None:
+            on_line(stream, line)
+
+
+_shells = weakref.WeakKeyDictionary()
+_shells_lock = threading.Lock()
+
+
+# Function to get the session shell for an SSH connection, starting it on first use
+def get_remote_shell(ssh):
+    with _shells_lock:
+        shell = _shells.get(ssh)
+        if shell is None or not shell.is_alive():
+            shell = RemoteShell(ssh).open()
+            _shells[ssh] = shell
+        return shell
+
+
+# Function to close the session shell of an SSH connection, if any
+def close_remote_shell(ssh):
+    with _shells_lock:
+        shell = _shells.pop(ssh, None)
+    if shell is not None:
+        shell.close()
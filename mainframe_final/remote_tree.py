@@ -0,0 +1,173 @@
+"""
+Cached listing of the application tree on the LPAR.
+
+find_source_file used to run `find` over SSH for every build and, on a miss,
+`ls -R` plus a substring scan. RemoteTree keeps a manifest of every file under
+the application path, keyed by the commit the remote clone is on. One remote
+command returns the remote HEAD and, only when it differs from the cached one,
+the file list. The manifest is kept in memory and on disk, and lookups (exact
+or case-insensitive) are answered locally.
+
+    file_path = find_remote_file(ssh, "/u/gmszfs/sandbox/MortgageApplication", "epsmlist.cbl")
+"""
+
+import os
+import json
+import shlex
+import hashlib
+import threading
+
+from remote_shell import get_remote_shell
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".mainframe_agent", "remote_trees")
+MANIFEST_VERSION = 1
+HEAD_PREFIX = "@@agent-head "
+
+_trees = {}
+_trees_lock = threading.Lock()
+
+
+def _peer_name(ssh):
+    try:
+        host, port = ssh.get_transport().getpeername()[:2]
+        return f"{host}:{port}"
+    except Exception:
+        return "unknown"
+
+
+def build_manifest_command(application_path, cached_head=None):
+    """
+    Return the command that prints the remote HEAD and, unless it matches
+    cached_head, every file under application_path (relative, .git excluded).
+    """
+    q = shlex.quote
+    # Subshell of its own as well, so "exit 1" only ends this command
+    return (
+        f"( cd {q(application_path)} || exit 1\n"
+        "__head=$(git rev-parse HEAD 2>/dev/null || echo -)\n"
+        f"printf '%s%s\\n' '{HEAD_PREFIX}' \"$__head\"\n"
+        f"if [ \"$__head\" = - ] || [ \"$__head\" != {q(cached_head or '')} ]; then\n"
+        "  find . -name .git -prune -o -type f -print\n"
+        "fi )"
+    )
+
+
+class RemoteTree:
+    def __init__(self, host, application_path):
+        self.host = host
+        self.application_path = application_path.rstrip("/") or "/"
+        key = hashlib.sha1(f"{host}|{self.application_path}".encode("utf-8")).hexdigest()
+        self.cache_path = os.path.join(CACHE_DIR, f"{key}.json")
+        self.head = None
+        self.files = []
+        self._by_name = {}
+        self._by_lower_name = {}
+        self.loaded = False
+        # Held while the manifest is loaded or fetched, so a slow LPAR only delays its own tree
+        self.lock = threading.Lock()
+
+    def _index(self):
+        by_name = {}
+        by_lower_name = {}
+        # Shallowest match first, like find walking the tree top-down
+        for path in sorted(self.files, key=lambda p: (p.count("/"), p)):
+            name = path.rsplit("/", 1)[-1]
+            by_name.setdefault(name, []).append(path)
+            by_lower_name.setdefault(name.lower(), []).append(path)
+        # Swapped in whole, so a lookup never sees a half-built index
+        self._by_name, self._by_lower_name = by_name, by_lower_name
+
+    def refresh(self, ssh, force=False):
+        """Bring the manifest up to date; returns True if the file list was fetched again."""
+        command = build_manifest_command(self.application_path, None if force else self.head)
+        exit_status, output, error_output = get_remote_shell(ssh).run(command)
+        if exit_status != 0:
+            raise FileNotFoundError(error_output.strip() or f"Cannot list '{self.application_path}'.")
+        lines = output.splitlines()
+        head = None
+        if lines and lines[0].startswith(HEAD_PREFIX):
+            head = lines.pop(0)[len(HEAD_PREFIX):].strip()
+        if head == "-":
+            head = None
+        if head is not None and head == self.head and not force:
+            return False
+        self.head = head
+        self.files = [line[2:] if line.startswith("./") else line for line in lines if line]
+        self._index()
+        self.save()
+        return True
+
+    def lookup(self, filename, ignore_case=False):
+        """Return the full remote paths of the files named filename."""
+        if ignore_case:
+            paths = self._by_lower_name.get(filename.lower(), [])
+        else:
+            paths = self._by_name.get(filename, [])
+        return [f"{self.application_path}/{path}" for path in paths]
+
+    def save(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "host": self.host,
+            "application_path": self.application_path,
+            "head": self.head,
+            "files": self.files,
+        }
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(tmp_path, "w") as file:
+                json.dump(data, file, separators=(",", ":"))
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def load(self):
+        try:
+            with open(self.cache_path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != MANIFEST_VERSION or data.get("application_path") != self.application_path:
+            return False
+        # Without a commit to compare against, a saved listing can never be trusted
+        if not data.get("head"):
+            return False
+        self.head = data["head"]
+        self.files = data.get("files", [])
+        self._index()
+        return True
+
+
+# Function to get the up-to-date manifest of an application directory on the LPAR
+def get_remote_tree(ssh, application_path):
+    host = _peer_name(ssh)
+    key = (host, application_path.rstrip("/") or "/")
+    with _trees_lock:
+        tree = _trees.get(key)
+        if tree is None:
+            tree = RemoteTree(host, application_path)
+            _trees[key] = tree
+    # The global lock only guards the dict; the disk read and the remote fetch hold the tree's own lock
+    with tree.lock:
+        if not tree.loaded:
+            tree.load()
+            tree.loaded = True
+        tree.refresh(ssh)
+    return tree
+
+
+# Function to find a source file on the LPAR, exact name first, then ignoring case
+def find_remote_file(ssh, application_path, filename):
+    """Return the full remote path of filename under application_path, or None."""
+    tree = get_remote_tree(ssh, application_path)
+    for refetch in (False, True):
+        if refetch:
+            # Files added on the LPAR without a commit do not move HEAD
+            with tree.lock:
+                tree.refresh(ssh, force=True)
+        matches = tree.lookup(filename) or tree.lookup(filename, ignore_case=True)
+        if matches:
+            return matches[0]
+    return None
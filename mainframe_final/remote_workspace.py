@@ -0,0 +1,108 @@
+"""
+Prepare the USS workspace for a build in one round trip.
+
+Before a build the agent used to run pwd, two mkdir -p commands, a
+[ -d .git ] probe and then the clone or pull, each as its own remote command.
+prepare_workspace() generates one shell script that does all of it and reports
+every step as a JSON status line, which is parsed back into a dict:
+
+    {"pwd": "/u/gmszfs", "workspace_path": "/u/gmszfs/sandbox",
+     "application_path": "/u/gmszfs/sandbox/MortgageApplication",
+     "repo": "pulled", "ok": True, "error": None, "steps": [...]}
+"""
+
+import json
+import shlex
+
+from remote_shell import get_remote_shell
+from agent_trace import traced
+
+
+STATUS_PREFIX = "@@agent-status "
+
+
+def build_prepare_script(repo_url, application, base_dir=None, workspace_name="sandbox", extra_dirs=()):
+    """Return the shell script that prepares the workspace and reports each step."""
+    q = shlex.quote
+    lines = [
+        "__agent_emit() {",
+        "  __v=$(printf '%s' \"$3\" | sed -e 's/\\\\/\\\\\\\\/g' -e 's/\"/\\\\\"/g')",
+        f"  printf '{STATUS_PREFIX}{{\"step\":\"%s\",\"status\":\"%s\",\"value\":\"%s\"}}\\n' \"$1\" \"$2\" \"$__v\"",
+        "}",
+        "__agent_prepare() {",
+    ]
+    if base_dir:
+        lines.append(f"  cd {q(base_dir)} || {{ __agent_emit pwd error {q(base_dir)}; return 1; }}")
+    lines += [
+        "  __pwd=$(pwd)",
+        "  __agent_emit pwd ok \"$__pwd\"",
+        f"  __ws=\"$__pwd\"/{q(workspace_name)}",
+        f"  __app=\"$__ws\"/{q(application)}",
+        "  mkdir -p \"$__ws\" && __agent_emit workspace ok \"$__ws\" || { __agent_emit workspace error \"$__ws\"; return 1; }",
+        "  mkdir -p \"$__app\" && __agent_emit application ok \"$__app\" || { __agent_emit application error \"$__app\"; return 1; }",
+    ]
+    for name in extra_dirs:
+        lines.append(
+            f"  mkdir -p \"$__pwd\"/{q(name)} && __agent_emit dir ok \"$__pwd\"/{q(name)}"
+            f" || __agent_emit dir error \"$__pwd\"/{q(name)}"
+        )
+    lines += [
+        "  if [ -d \"$__app/.git\" ]; then",
+        "    (cd \"$__app\" && git pull) && __agent_emit repo pulled \"$__app\" || { __agent_emit repo error pull; return 1; }",
+        "  else",
+        f"    git clone {q(repo_url)} \"$__app\" && __agent_emit repo cloned \"$__app\" || {{ __agent_emit repo error clone; return 1; }}",
+        "  fi",
+        "}",
+        "__agent_prepare",
+    ]
+    return "\n".join(lines)
+
+
+def parse_status(output):
+    """Parse the status lines out of the script output, ignoring anything git printed."""
+    steps = []
+    for line in output.splitlines():
+        if line.startswith(STATUS_PREFIX):
+            try:
+                steps.append(json.loads(line[len(STATUS_PREFIX):]))
+            except json.JSONDecodeError:
+                continue
+    return steps
+
+
+# Function to create the workspace and clone or pull the repository in one round trip
+@traced("git")
+def prepare_workspace(ssh, repo_url, application, base_dir=None, workspace_name="sandbox", extra_dirs=()):
+    script = build_prepare_script(repo_url, application, base_dir, workspace_name, extra_dirs)
+    exit_status, output, error_output = get_remote_shell(ssh).run(script)
+    steps = parse_status(output)
+
+    result = {
+        "pwd": None,
+        "workspace_path": None,
+        "application_path": None,
+        "repo": None,
+        "ok": exit_status == 0,
+        "error": None,
+        "steps": steps,
+        "output": output,
+        "error_output": error_output,
+    }
+    for step in steps:
+        if step["status"] == "error":
+            result["ok"] = False
+            result["error"] = f"{step['step']} failed: {step['value']}"
+            if error_output.strip():
+                result["error"] += f"\n{error_output.strip()}"
+            continue
+        if step["step"] == "pwd":
+            result["pwd"] = step["value"]
+        elif step["step"] == "workspace":
+            result["workspace_path"] = step["value"]
+        elif step["step"] == "application":
+            result["application_path"] = step["value"]
+        elif step["step"] == "repo":
+            result["repo"] = step["status"]
+    if not result["ok"] and result["error"] is None:
+        result["error"] = error_output.strip() or f"Workspace preparation exited with status {exit_status}"
+    return result
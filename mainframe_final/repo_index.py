@@ -0,0 +1,225 @@
+"""
+Persistent file-name index for local clones.
+
+find_file_in_repo used to os.walk the whole clone on every open_file or
+commit_changes call. The index maps each basename to the repository paths
+that have it, is built from `git ls-files`, and is saved inside the clone's
+.git directory. It is tied to the commit HEAD points at and to the mtime of
+.git/index, so a stale index is detected with a couple of stat calls. After
+a pull or checkout it is updated from `git diff --name-status` instead of
+being rebuilt.
+
+    file_path = find_file(clone_path, "hello.cbl")
+"""
+
+import os
+import json
+import subprocess
+import threading
+
+
+INDEX_FILE_NAME = "agent_file_index.json"
+INDEX_VERSION = 1
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _git(repo_path, *args):
+    result = subprocess.run(['git', '-C', repo_path] + list(args), check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return result.stdout.decode("utf-8", errors="surrogateescape")
+
+
+def _read_head(git_dir):
+    """Return the commit HEAD points at, reading .git directly instead of running git."""
+    try:
+        with open(os.path.join(git_dir, "HEAD"), "r") as file:
+            head = file.read().strip()
+    except OSError:
+        return None
+    if not head.startswith("ref:"):
+        return head
+    ref = head[4:].strip()
+    try:
+        with open(os.path.join(git_dir, ref), "r") as file:
+            return file.read().strip()
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(git_dir, "packed-refs"), "r") as file:
+            for line in file:
+                parts = line.strip().split(" ", 1)
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    except OSError:
+        pass
+    # Unborn branch (no commits yet)
+    return None
+
+
+def _index_mtime(git_dir):
+    try:
+        return os.stat(os.path.join(git_dir, "index")).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _sort_key(path):
+    # Shallowest match first, like the top-down os.walk it replaces
+    return (path.count("/"), path)
+
+
+class FileIndex:
+    def __init__(self, repo_path):
+        self.repo_path = os.path.abspath(repo_path)
+        self.git_dir = os.path.join(self.repo_path, ".git")
+        self.index_path = os.path.join(self.git_dir, INDEX_FILE_NAME)
+        self.head = None
+        self.index_mtime = None
+        self.by_name = {}
+
+    # Function to check whether the index still matches the clone
+    def is_current(self):
+        return (self.head == _read_head(self.git_dir)
+                and self.index_mtime == _index_mtime(self.git_dir))
+
+    def _add(self, path):
+        paths = self.by_name.setdefault(os.path.basename(path), [])
+        if path not in paths:
+            paths.append(path)
+            paths.sort(key=_sort_key)
+
+    def _remove(self, path):
+        name = os.path.basename(path)
+        paths = self.by_name.get(name)
+        if paths and path in paths:
+            paths.remove(path)
+            if not paths:
+                del self.by_name[name]
+
+    def rebuild(self):
+        """Build the index from scratch from the tracked and untracked (not ignored) files."""
+        head = _read_head(self.git_dir)
+        index_mtime = _index_mtime(self.git_dir)
+        output = _git(self.repo_path, 'ls-files', '-z', '--cached', '--others', '--exclude-standard')
+        self.by_name = {}
+        for path in output.split("\0"):
+            if path:
+                self.by_name.setdefault(os.path.basename(path), []).append(path)
+        for paths in self.by_name.values():
+            paths.sort(key=_sort_key)
+        self.head = head
+        self.index_mtime = index_mtime
+        self.save()
+
+    def update(self):
+        """Bring the index up to date, applying only what changed between the old and new HEAD."""
+        if self.is_current():
+            return
+        new_head = _read_head(self.git_dir)
+        if self.head is None or new_head is None or self.head == new_head:
+            # Same commit but the staging area changed (or no commit to diff against)
+            self.rebuild()
+            return
+        try:
+            output = _git(self.repo_path, 'diff', '--name-status', '--no-renames', '-z', self.head, new_head)
+        except subprocess.CalledProcessError:
+            # Old commit no longer available (e.g. after a force push)
+            self.rebuild()
+            return
+        fields = output.split("\0")
+        for status, path in zip(fields[0::2], fields[1::2]):
+            if status.startswith("D"):
+                self._remove(path)
+            elif path:
+                self._add(path)
+        self.head = new_head
+        self.index_mtime = _index_mtime(self.git_dir)
+        self.save()
+
+    def lookup(self, file_name):
+        """Return the repository-relative paths whose basename is file_name."""
+        return list(self.by_name.get(file_name, []))
+
+    def save(self):
+        data = {
+            "version": INDEX_VERSION,
+            "head": self.head,
+            "index_mtime": self.index_mtime,
+            "by_name": self.by_name,
+        }
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump(data, file, separators=(",", ":"))
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    def load(self):
+        try:
+            with open(self.index_path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != INDEX_VERSION:
+            return False
+        self.head = data.get("head")
+        self.index_mtime = data.get("index_mtime")
+        self.by_name = data.get("by_name", {})
+        return True
+
+
+# Function to get the up-to-date index of a clone (cached in memory for the life of the process)
+def get_file_index(repo_path):
+    repo_path = os.path.abspath(repo_path)
+    with _indexes_lock:
+        index = _indexes.get(repo_path)
+        if index is None:
+            index = FileIndex(repo_path)
+            if not index.load():
+                index.rebuild()
+            _indexes[repo_path] = index
+        index.update()
+        return index
+
+
+# Function to update the index after a pull or checkout
+def refresh_file_index(repo_path):
+    if os.path.isdir(os.path.join(repo_path, ".git")):
+        try:
+            get_file_index(repo_path)
+        except (OSError, subprocess.CalledProcessError):
+            pass
+
+
+def _walk_for_file(repo_path, file_name):
+    for root, dirs, files in os.walk(repo_path):
+        if file_name in files:
+            return os.path.join(root, file_name)
+    return None
+
+
+# Function to find a file anywhere in a clone
+def find_file(repo_path, file_name):
+    """Return the absolute path of file_name in the repository, or None."""
+    if not os.path.isdir(os.path.join(repo_path, ".git")):
+        return _walk_for_file(repo_path, file_name)
+    try:
+        index = get_file_index(repo_path)
+        for path in index.lookup(file_name):
+            full_path = os.path.join(index.repo_path, path)
+            if os.path.isfile(full_path):
+                return full_path
+        # Untracked files created since the last build do not touch .git/index,
+        # so rebuild once before reporting a miss
+        with _indexes_lock:
+            index.rebuild()
+        for path in index.lookup(file_name):
+            full_path = os.path.join(index.repo_path, path)
+            if os.path.isfile(full_path):
+                return full_path
+        return None
+    except (OSError, subprocess.CalledProcessError):
+        return _walk_for_file(repo_path, file_name)
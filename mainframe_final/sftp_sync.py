@@ -0,0 +1,200 @@
+"""
+Delta upload of a local directory to the LPAR over SFTP.
+
+upload_directory_to_mainframe used to sftp.put every file and try a mkdir for
+every directory on every run. sync_directory() hashes the local files and
+compares them with a manifest kept in the remote directory
+(.agent_sync_manifest.json), so only new or changed files are transferred and
+files deleted locally are removed remotely. Re-syncing an unchanged directory
+costs one manifest read. With concurrency > 1 the changed files are spread
+over several SFTP channels (see sftp_transfer.py).
+
+    stats = sync_directory(sftp, local_path, remote_path)
+    # {"uploaded": 3, "deleted": 1, "unchanged": 240, "bytes": 18230, "errors": []}
+"""
+
+import os
+import json
+import stat
+import hashlib
+import posixpath
+
+from sftp_transfer import SFTPTransferEngine
+
+
+MANIFEST_NAME = ".agent_sync_manifest.json"
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Directory names never uploaded (matched against whole path components)
+EXCLUDED_DIRS = {".git"}
+
+# (path, size, mtime_ns) -> sha256, so unchanged files are not re-read on every sync
+_hash_cache = {}
+
+
+def _hash_file(path, st):
+    key = (path, st.st_size, st.st_mtime_ns)
+    digest = _hash_cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        _hash_cache[key] = digest
+    return digest
+
+
+def build_local_manifest(local_path):
+    """Return {relative posix path: {"sha256": ..., "size": ...}} for every file to upload."""
+    files = {}
+    for root, dirs, names in os.walk(local_path):
+        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+        for name in names:
+            full_path = os.path.join(root, name)
+            relative_path = os.path.relpath(full_path, local_path).replace(os.sep, "/")
+            if relative_path == MANIFEST_NAME:
+                continue
+            try:
+                st = os.stat(full_path)
+                files[relative_path] = {"sha256": _hash_file(full_path, st), "size": st.st_size}
+            except OSError:
+                # Vanished or unreadable; leave it out so it is not reported as synced
+                continue
+    return files
+
+
+def read_remote_manifest(sftp, remote_path):
+    """Return the file entries of the remote manifest, or {} if there is none."""
+    try:
+        with sftp.open(posixpath.join(remote_path, MANIFEST_NAME), "r") as file:
+            data = json.loads(file.read().decode("utf-8"))
+    except (IOError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def write_remote_manifest(sftp, remote_path, files):
+    manifest_path = posixpath.join(remote_path, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with sftp.open(tmp_path, "w") as file:
+        file.write(json.dumps({"version": MANIFEST_VERSION, "files": files}, separators=(",", ":")))
+    try:
+        sftp.posix_rename(tmp_path, manifest_path)
+    except IOError:
+        # Server without the posix-rename extension
+        try:
+            sftp.remove(manifest_path)
+        except IOError:
+            pass
+        sftp.rename(tmp_path, manifest_path)
+
+
+def _ensure_remote_dir(sftp, remote_dir, known_dirs):
+    if remote_dir in known_dirs or remote_dir in ("", "/"):
+        return
+    try:
+        sftp.mkdir(remote_dir)
+        print(f"Created remote directory: {remote_dir}")
+    except IOError:
+        # Usually the directory already exists; otherwise its parent is missing
+        try:
+            mode = sftp.stat(remote_dir).st_mode
+        except IOError:
+            parent = posixpath.dirname(remote_dir)
+            if parent in known_dirs or parent in ("", "/"):
+                raise IOError(f"Cannot create remote directory: {remote_dir}")
+            _ensure_remote_dir(sftp, parent, known_dirs)
+            sftp.mkdir(remote_dir)
+            print(f"Created remote directory: {remote_dir}")
+        else:
+            if not stat.S_ISDIR(mode):
+                raise IOError(f"Remote path exists and is not a directory: {remote_dir}")
+    known_dirs.add(remote_dir)
+
+
+# Function to upload only what changed in a local directory since the last sync
+def sync_directory(sftp, local_path, remote_path, delete=True, concurrency=1):
+    remote_path = remote_path.rstrip("/") or "/"
+    local_files = build_local_manifest(local_path)
+    remote_files = read_remote_manifest(sftp, remote_path)
+
+    changed = sorted(p for p, entry in local_files.items() if remote_files.get(p) != entry)
+    removed = sorted(p for p in remote_files if p not in local_files) if delete else []
+    stats = {"uploaded": 0, "deleted": 0, "unchanged": len(local_files) - len(changed),
+             "bytes": 0, "errors": []}
+
+    if not changed and not removed:
+        print(f"Remote directory is up to date: {remote_path} ({stats['unchanged']} files)")
+        return stats
+
+    # Directories holding files the manifest already knows about exist remotely
+    known_dirs = set()
+    for path in remote_files:
+        directory = posixpath.dirname(posixpath.join(remote_path, path))
+        while directory not in known_dirs and directory not in ("", "/"):
+            known_dirs.add(directory)
+            directory = posixpath.dirname(directory)
+
+    synced = {p: entry for p, entry in remote_files.items() if p in local_files or not delete}
+    _ensure_remote_dir(sftp, remote_path, known_dirs)
+    try:
+        uploads = []
+        for path in changed:
+            local_file = os.path.join(local_path, *path.split("/"))
+            remote_file = posixpath.join(remote_path, path)
+            try:
+                _ensure_remote_dir(sftp, posixpath.dirname(remote_file), known_dirs)
+            except (IOError, OSError) as e:
+                stats["errors"].append(f"{path}: {e}")
+                print(f"Error uploading {local_file}: {e}")
+                # Drop the entry so the next sync tries it again
+                synced.pop(path, None)
+                continue
+            uploads.append((path, local_file, remote_file))
+
+        if concurrency > 1 and len(uploads) > 1:
+            engine = SFTPTransferEngine(sftp.get_channel().get_transport(), concurrency)
+            result = engine.upload([(local_file, remote_file, local_files[path]["size"])
+                                    for path, local_file, remote_file in uploads])
+            failed = result["errors"]
+        else:
+            failed = {}
+            for path, local_file, remote_file in uploads:
+                try:
+                    sftp.put(local_file, remote_file)
+                except (IOError, OSError) as e:
+                    failed[remote_file] = str(e)
+                    continue
+                print(f"Uploaded file: {local_file} to {remote_file}")
+
+        for path, local_file, remote_file in uploads:
+            if remote_file in failed:
+                stats["errors"].append(f"{path}: {failed[remote_file]}")
+                print(f"Error uploading {local_file}: {failed[remote_file]}")
+                synced.pop(path, None)
+                continue
+            synced[path] = local_files[path]
+            stats["uploaded"] += 1
+            stats["bytes"] += local_files[path]["size"]
+
+        for path in removed:
+            remote_file = posixpath.join(remote_path, path)
+            try:
+                sftp.remove(remote_file)
+                print(f"Removed remote file: {remote_file}")
+            except FileNotFoundError:
+                pass
+            except IOError as e:
+                stats["errors"].append(f"{path}: {e}")
+                print(f"Error removing {remote_file}: {e}")
+                continue
+            synced.pop(path, None)
+            stats["deleted"] += 1
+    finally:
+        # Record whatever made it across, even if the sync was interrupted
+        write_remote_manifest(sftp, remote_path, synced)
+    return stats
@@ -0,0 +1,180 @@
+"""
+Parallel SFTP uploads over one SSH transport.
+
+sftp.put sends one file at a time and waits for every open, write and close to
+be acknowledged before starting the next one, so a tree of small files is
+bound by latency. SFTPTransferEngine opens several SFTP channels on the same
+(pooled) transport, hands files out to them largest first, and writes each file
+pipelined, so the acknowledgements for its chunks are only collected when the
+file is closed. Progress and throughput for the whole batch are reported while
+it runs.
+
+    engine = SFTPTransferEngine(ssh_client.get_transport(), concurrency=4)
+    result = engine.upload([(local_file, remote_file, size), ...])
+
+The number of channels per LPAR is the optional `sftp_concurrency` key in
+timeout_dynamic.yaml.
+"""
+
+import time
+import queue
+import threading
+
+import paramiko
+
+
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+# Just under the largest SFTP data packet paramiko sends
+CHUNK_SIZE = 32768
+PROGRESS_INTERVAL = 2.0
+
+
+# Function to read the per-LPAR number of parallel SFTP channels
+def get_transfer_concurrency(lpar_details, default=DEFAULT_CONCURRENCY):
+    try:
+        value = int((lpar_details or {}).get("sftp_concurrency", default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(value, MAX_CONCURRENCY))
+
+
+def format_bytes(count):
+    count = float(count)
+    for unit in ("B", "KB", "MB"):
+        if count < 1024:
+            return f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+
+class TransferProgress:
+    """Thread-safe counters for a batch of transfers, printed at most every `interval` seconds."""
+
+    def __init__(self, files_total, bytes_total, interval=PROGRESS_INTERVAL, on_progress=None):
+        self.files_total = files_total
+        self.bytes_total = bytes_total
+        self.files_done = 0
+        self.bytes_done = 0
+        self.started = time.monotonic()
+        self.interval = interval
+        self.on_progress = on_progress
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes_done += count
+        self._maybe_report()
+
+    def file_done(self):
+        with self._lock:
+            self.files_done += 1
+        self._maybe_report()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self):
+        elapsed = self.elapsed
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f"{self.files_done}/{self.files_total} files, "
+                f"{format_bytes(self.bytes_done)} of {format_bytes(self.bytes_total)} "
+                f"in {self.elapsed:.1f}s ({format_bytes(self.throughput)}/s)")
+
+    def _maybe_report(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        if self.on_progress is not None:
+            self.on_progress(self)
+        else:
+            print(f"Uploading: {self.summary()}")
+
+
+class SFTPTransferEngine:
+    def __init__(self, transport, concurrency=DEFAULT_CONCURRENCY, chunk_size=CHUNK_SIZE, on_progress=None):
+        self.transport = transport
+        self.concurrency = max(1, concurrency)
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+
+    def _put(self, sftp, local_file, remote_file, progress):
+        with open(local_file, "rb") as source, sftp.open(remote_file, "wb", bufsize=self.chunk_size) as target:
+            # Do not wait for each write to be acknowledged; close() collects the replies
+            target.set_pipelined(True)
+            while True:
+                data = source.read(self.chunk_size)
+                if not data:
+                    break
+                target.write(data)
+                progress.add_bytes(len(data))
+
+    def _worker(self, jobs, progress, done, errors, lock):
+        try:
+            sftp = paramiko.SFTPClient.from_transport(self.transport)
+        except Exception as e:
+            # Server refused another channel; the remaining workers drain the queue
+            with lock:
+                errors.setdefault(None, str(e))
+            return
+        try:
+            while True:
+                try:
+                    local_file, remote_file, size = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    self._put(sftp, local_file, remote_file, progress)
+                except (IOError, OSError, paramiko.SSHException) as e:
+                    with lock:
+                        errors[remote_file] = str(e)
+                    continue
+                with lock:
+                    done.append(remote_file)
+                progress.file_done()
+        finally:
+            sftp.close()
+
+    def upload(self, files):
+        """
+        Upload [(local_file, remote_file, size), ...]; the remote directories
+        must already exist. Returns {"done": [remote_file, ...],
+        "errors": {remote_file: message}, "bytes", "seconds", "throughput"}.
+        """
+        files = sorted(files, key=lambda job: job[2], reverse=True)
+        progress = TransferProgress(len(files), sum(job[2] for job in files), on_progress=self.on_progress)
+        jobs = queue.Queue()
+        for job in files:
+            jobs.put(job)
+
+        done, errors, lock = [], {}, threading.Lock()
+        workers = [
+            threading.Thread(target=self._worker, args=(jobs, progress, done, errors, lock), daemon=True)
+            for _ in range(min(self.concurrency, len(files)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        channel_error = errors.pop(None, None)
+        # Every channel was refused, so nothing was picked up
+        while not jobs.empty():
+            local_file, remote_file, size = jobs.get_nowait()
+            errors[remote_file] = channel_error or "not transferred"
+
+        print(f"Upload finished: {progress.summary()} over {len(workers)} channel(s)")
+        return {
+            "done": done,
+            "errors": errors,
+            "bytes": progress.bytes_done,
+            "seconds": progress.elapsed,
+            "throughput": progress.throughput,
+        }
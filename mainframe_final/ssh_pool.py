@@ -0,0 +1,211 @@
+"""
+Pool of authenticated SSH connections to the LPARs.
+
+Connections are keyed by (mfip, sshport, username) and handed back to the
+pool when an action finishes instead of being closed, so the clone, find and
+build steps of the next action reuse the same transport and skip the TCP
+connect, key exchange and password authentication.
+
+    pool = get_ssh_pool()
+    ssh = pool.acquire(hostname, port, username, password)
+    try:
+        ...
+    finally:
+        pool.release(ssh)
+"""
+
+import time
+import atexit
+import hashlib
+import threading
+
+import paramiko
+
+from agent_trace import span
+
+
+KEEPALIVE_INTERVAL = 30     # seconds between SSH keepalive packets
+IDLE_TIMEOUT = 300          # idle connections older than this are closed
+CONNECT_TIMEOUT = 30
+
+
+class _PooledConnection:
+    def __init__(self, key, client, secret):
+        self.key = key
+        self.client = client
+        self.secret = secret
+        self.last_used = time.monotonic()
+        self.draining = False  # closed on release instead of going back to the pool
+
+
+def _secret(password):
+    return hashlib.sha256(password.encode("utf-8")).hexdigest() if password is not None else None
+
+
+class SSHConnectionPool:
+    def __init__(self, keepalive_interval=KEEPALIVE_INTERVAL, idle_timeout=IDLE_TIMEOUT,
+                 connect_timeout=CONNECT_TIMEOUT):
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self._idle = {}        # key -> list of idle _PooledConnection
+        self._in_use = {}      # id(client) -> _PooledConnection
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._closed = threading.Event()
+
+    @staticmethod
+    def make_key(hostname, port, username):
+        return (str(hostname), int(port), str(username))
+
+    # Function to check that a pooled transport is still usable
+    @staticmethod
+    def is_healthy(client):
+        transport = client.get_transport()
+        if transport is None or not transport.is_active() or not transport.is_authenticated():
+            return False
+        try:
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+    def _connect(self, key, password):
+        hostname, port, username = key
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        # Only a pool miss pays for the handshake, so this span shows how often that happens
+        with span("ssh.connect", "ssh", host=hostname, port=port):
+            client.connect(hostname=hostname, port=port, username=username, password=password,
+                           timeout=self.connect_timeout)
+        client.get_transport().set_keepalive(self.keepalive_interval)
+        return client
+
+    def acquire(self, hostname, port, username, password):
+        """Return a healthy authenticated SSHClient, reusing an idle one when possible."""
+        key = self.make_key(hostname, port, username)
+        secret = _secret(password)
+        conn = None
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                candidate = idle.pop() if idle else None
+            if candidate is None:
+                break
+            # The health check talks to the host, so it runs outside the lock;
+            # only reuse a session that was authenticated with the same credentials
+            if candidate.secret == secret and self.is_healthy(candidate.client):
+                conn = candidate
+                break
+            candidate.client.close()
+
+        if conn is None:
+            conn = _PooledConnection(key, self._connect(key, password), secret)
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._in_use[id(conn.client)] = conn
+        self._start_reaper()
+        return conn.client
+
+    def release(self, client):
+        """Give a connection back to the pool; broken or unknown connections are closed."""
+        with self._lock:
+            conn = self._in_use.get(id(client))
+        # Checked outside the lock so a slow host does not hold up the other callers;
+        # the connection stays in _in_use meanwhile, so drain() can still mark it
+        healthy = conn is not None and self.is_healthy(client)
+        with self._lock:
+            self._in_use.pop(id(client), None)
+            if healthy and not conn.draining and not self._closed.is_set():
+                conn.last_used = time.monotonic()
+                self._idle.setdefault(conn.key, []).append(conn)
+                return
+        client.close()
+
+    def discard(self, client):
+        """Close a connection instead of returning it to the pool."""
+        with self._lock:
+            self._in_use.pop(id(client), None)
+        client.close()
+
+    def evict_idle(self):
+        """Close connections that have been idle for longer than idle_timeout."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, idle in list(self._idle.items()):
+                keep = [conn for conn in idle if now - conn.last_used < self.idle_timeout]
+                expired.extend(conn for conn in idle if now - conn.last_used >= self.idle_timeout)
+                if keep:
+                    self._idle[key] = keep
+                else:
+                    del self._idle[key]
+        for conn in expired:
+            conn.client.close()
+        return len(expired)
+
+    def drain(self, hostname, port=None):
+        """
+        Stop reusing connections to hostname (and port, when given): idle ones
+        are closed now, ones in use are closed when they are released.
+        Connections to other hosts are left alone.
+        """
+        def matches(key):
+            return key[0] == str(hostname) and (port is None or key[1] == int(port))
+
+        closed = []
+        with self._lock:
+            for key in [key for key in self._idle if matches(key)]:
+                closed.extend(self._idle.pop(key))
+            draining = 0
+            for conn in self._in_use.values():
+                if matches(conn.key):
+                    conn.draining = True
+                    draining += 1
+        for conn in closed:
+            conn.client.close()
+        return {"closed": len(closed), "draining": draining}
+
+    def close_all(self):
+        self._closed.set()
+        with self._lock:
+            conns = [conn for idle in self._idle.values() for conn in idle]
+            conns.extend(self._in_use.values())
+            self._idle.clear()
+            self._in_use.clear()
+        for conn in conns:
+            conn.client.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "idle": sum(len(idle) for idle in self._idle.values()),
+                "in_use": len(self._in_use),
+                "hosts": sorted(f"{user}@{host}:{port}" for host, port, user in self._idle),
+            }
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, name="ssh-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        interval = max(1, min(self.idle_timeout, self.keepalive_interval))
+        while not self._closed.wait(interval):
+            self.evict_idle()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to get the process-wide connection pool
+def get_ssh_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SSHConnectionPool()
+            atexit.register(_pool.close_all)
+        return _pool
@@ -0,0 +1,177 @@
+"""
+Bulk upload of a local tree to USS as one tar stream.
+
+Seeding an empty workspace over SFTP costs an open, a write and a close per
+file. tar_upload_directory() instead streams a gzip tar of the tree through a
+single exec channel into `gzip -dc | tar -xf -` on the LPAR. .git directories
+are left out, and files can be tagged with chtag after extraction so USS knows
+how to read them. The SFTP sync manifest (see sftp_sync.py) is written
+afterwards, so later uploads of the same tree are deltas.
+
+    stats = tar_upload_directory(sftp, local_path, remote_path)
+
+Tag rules are (pattern, codeset) pairs applied with `find -name pattern`;
+codeset "binary" marks the files binary. Without explicit rules they are read
+from the tree's .gitattributes: patterns marked binary are tagged binary, and
+patterns with a working-tree encoding are tagged ISO8859-1, which is what the
+uploaded bytes are (the tar carries files unconverted).
+"""
+
+import os
+import shlex
+import tarfile
+import threading
+
+from channel_stream import OutputBuffer
+from remote_shell import ROCKET_GIT_ENV
+from sftp_sync import EXCLUDED_DIRS, MANIFEST_NAME, build_local_manifest, write_remote_manifest
+
+
+TEXT_CODESET = "ISO8859-1"
+STREAM_BUFFER_SIZE = 256 * 1024
+
+
+class TarUploadError(Exception):
+    pass
+
+
+# Function to derive chtag rules from a .gitattributes file
+def tag_rules_from_gitattributes(local_path):
+    rules = []
+    try:
+        with open(os.path.join(local_path, ".gitattributes"), "r") as file:
+            lines = file.readlines()
+    except OSError:
+        return rules
+    for line in lines:
+        parts = line.split()
+        if not parts or parts[0].startswith("#"):
+            continue
+        pattern, attributes = parts[0], parts[1:]
+        # find -name only matches the last path component
+        pattern = pattern.rsplit("/", 1)[-1]
+        if "binary" in attributes or "-text" in attributes:
+            rules.append((pattern, "binary"))
+        elif any(a.startswith(("working-tree-encoding=", "zos-working-tree-encoding=")) for a in attributes):
+            rules.append((pattern, TEXT_CODESET))
+    return rules
+
+
+def build_extract_command(remote_path, tag_rules=(), compress=True):
+    """Return the remote command that unpacks the tar stream on stdin into remote_path."""
+    q = shlex.quote
+    extract = "gzip -dc | tar -xf -" if compress else "tar -xf -"
+    # gzip on USS comes with the Rocket ported tools
+    lines = list(ROCKET_GIT_ENV) + [
+        f"mkdir -p {q(remote_path)} && cd {q(remote_path)} || exit 1",
+        f"{extract} || exit 1",
+    ]
+    for pattern, codeset in tag_rules:
+        flags = "-b" if codeset == "binary" else f"-tc {q(codeset)}"
+        lines.append(f"find . -name .git -prune -o -type f -name {q(pattern)} -exec chtag {flags} {{}} + || exit 1")
+    return "\n".join(lines)
+
+
+class _ChannelWriter:
+    """File-like object tarfile can stream into, writing to an SSH channel."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.bytes_sent = 0
+
+    def write(self, data):
+        self.channel.sendall(data)
+        self.bytes_sent += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def _iter_tree(local_path):
+    """Yield (full_path, archive_name) for every directory and file to send, parents first."""
+    for root, dirs, files in os.walk(local_path):
+        dirs[:] = sorted(d for d in dirs if d not in EXCLUDED_DIRS)
+        relative_root = os.path.relpath(root, local_path).replace(os.sep, "/")
+        if relative_root != ".":
+            yield root, relative_root
+        for name in sorted(files):
+            archive_name = name if relative_root == "." else f"{relative_root}/{name}"
+            if archive_name == MANIFEST_NAME:
+                continue
+            yield os.path.join(root, name), archive_name
+
+
+# Function to stream a local tree into a remote directory through one exec channel
+def stream_tar_upload(transport, local_path, remote_path, tag_rules=(), compress=True):
+    """Return {"files", "bytes", "wire_bytes", "output"}; raises TarUploadError if extraction fails."""
+    channel = transport.open_session()
+    try:
+        # Only tar/chtag errors come back, but read them while sending so a
+        # chatty remote side can never stall the upload
+        channel.set_combine_stderr(True)
+        channel.exec_command(build_extract_command(remote_path, tag_rules, compress))
+        output = OutputBuffer(200)
+        reader = threading.Thread(target=_drain, args=(channel, output), daemon=True)
+        reader.start()
+
+        writer = _ChannelWriter(channel)
+        files = 0
+        size = 0
+        mode = "w|gz" if compress else "w|"
+        try:
+            # ustar is the format the z/OS tar reads most reliably
+            with tarfile.open(fileobj=writer, mode=mode, bufsize=STREAM_BUFFER_SIZE,
+                              format=tarfile.USTAR_FORMAT) as tar:
+                for full_path, archive_name in _iter_tree(local_path):
+                    info = tar.gettarinfo(full_path, arcname=archive_name)
+                    info.uid = info.gid = 0
+                    info.uname = info.gname = ""
+                    if info.isfile():
+                        with open(full_path, "rb") as file:
+                            tar.addfile(info, file)
+                        files += 1
+                        size += info.size
+                    elif info.isdir():
+                        tar.addfile(info)
+        except (OSError, ValueError) as e:
+            raise TarUploadError(f"Could not stream '{local_path}': {e}")
+        finally:
+            channel.shutdown_write()
+
+        exit_status = channel.recv_exit_status()
+        reader.join()
+        if exit_status != 0:
+            raise TarUploadError(f"Remote extraction failed with status {exit_status}: {output.text().strip()}")
+        return {"files": files, "bytes": size, "wire_bytes": writer.bytes_sent, "output": output.text()}
+    finally:
+        channel.close()
+
+
+def _drain(channel, output):
+    pending = b""
+    while True:
+        data = channel.recv(32768)
+        if not data:
+            break
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            output.append(line.decode("utf-8", errors="replace"))
+    if pending:
+        output.append(pending.decode("utf-8", errors="replace"))
+
+
+# Function to seed a remote directory with a whole local tree in one stream
+def tar_upload_directory(sftp, local_path, remote_path, tag_rules=None, compress=True):
+    """Same stats as sftp_sync.sync_directory; leaves the sync manifest behind for later delta uploads."""
+    remote_path = remote_path.rstrip("/") or "/"
+    if tag_rules is None:
+        tag_rules = tag_rules_from_gitattributes(local_path)
+    transport = sftp.get_channel().get_transport()
+    result = stream_tar_upload(transport, local_path, remote_path, tag_rules, compress)
+    print(f"Streamed {result['files']} files ({result['bytes']} bytes, "
+          f"{result['wire_bytes']} on the wire) to {remote_path}")
+    write_remote_manifest(sftp, remote_path, build_local_manifest(local_path))
+    return {"uploaded": result["files"], "deleted": 0, "unchanged": 0,
+            "bytes": result["bytes"], "errors": []}
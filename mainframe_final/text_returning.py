@@ -2,31 +2,29 @@ import os
 import subprocess
 import shutil
 import argparse
-from datetime import datetime
 import yaml
+from repo_index import find_file
+from agent_log import append_log
+from config_cache import load_yaml
 
 # Log file path (same as the one used previously)
 LOG_FILE = "internet_connection_log.txt"
 
-def log_to_file(message, log_file):
+def log_to_file(message, log_file, **fields):
     """Logs a message to the log file with a timestamp."""
     # Use a fallback log file path if the primary path is read-only
     if not os.access(os.path.dirname(log_file), os.W_OK):
         log_file = os.path.expanduser("~/fallback_internet_connection_log.txt")
         print(f"Falling back to log file at: {log_file}")
     
-    with open(log_file, "a") as file:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"{timestamp} - {message}\n"
-        file.write(log_message)
-        file.write("-" * 40 + "\n")
+    fields.setdefault("action", "open_clone")
+    append_log(message, log_file, **fields)
 
 def load_extensions_from_yaml(file_path):
     """Loads the list of required extensions from the YAML file."""
     try:
-        with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
-            return data.get('required_extensions', [])
+        data = load_yaml(file_path)
+        return data.get('required_extensions', [])
     except FileNotFoundError:
         return log_to_file_and_return(f"YAML file not found at {file_path}", LOG_FILE)
     except yaml.YAMLError as e:
@@ -78,10 +76,9 @@ def delete_folder(folder_path, LOG_FILE):
 def find_file_in_repo(repo_path, file_name, LOG_FILE):
     """Search for the file in the repo and return its path if found."""
     log_to_file_and_return(f"Searching for file '{file_name}' in repository '{repo_path}'", LOG_FILE)
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            file_path = os.path.join(root, file_name)
-            return log_to_file_and_return(f"File found: {file_path}", LOG_FILE)
+    file_path = find_file(repo_path, file_name)
+    if file_path:
+        return log_to_file_and_return(f"File found: {file_path}", LOG_FILE)
     return log_to_file_and_return(f"File '{file_name}' not found in repository '{repo_path}'", LOG_FILE)
 
 def open_in_vscode(file_path, LOG_FILE):
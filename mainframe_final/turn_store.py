@@ -0,0 +1,221 @@
+"""
+Append-only store for conversation turns.
+
+Each turn is one JSON line appended to the store file, so recording a turn
+costs one small write however long the history is (rewriting a JSON list on
+every turn made a session O(n^2)). Reading is lazy: iter_records() decodes one
+line at a time and never holds the whole history in memory.
+
+    store = TurnStore("conversation_db.jsonl")
+    store.append({"user_query": {...}, "assistant_response": {...}, ...})
+    for record in store.iter_records():
+        ...
+
+Crash safety: a record is written with a single write() on an O_APPEND
+descriptor and fsynced, so a crash can at worst leave a torn last line. Torn or
+malformed lines are skipped when reading and dropped the next time the store is
+opened or compacted.
+
+Compaction rewrites the file (temporary file + os.replace) keeping only the
+newest max_records records and dropping malformed lines; when there is nothing
+to drop the file is left alone. It is checked every compact_every appends and
+whenever compact() is called. An flock on <path>.lock keeps compaction from racing
+appends made by other agent processes (where fcntl exists).
+
+Older JSON files (one list, possibly holding whole conversations as nested
+lists) are migrated into the store the first time it is opened.
+"""
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are still single writes, compaction is unguarded
+    fcntl = None
+
+
+DEFAULT_MAX_RECORDS = 50000
+DEFAULT_COMPACT_EVERY = 1000
+
+
+class TurnStore:
+    def __init__(self, path, max_records=DEFAULT_MAX_RECORDS, compact_every=DEFAULT_COMPACT_EVERY,
+                 durable=True, legacy_path=None, convert_legacy=None):
+        self.path = path
+        self.max_records = max_records
+        self.compact_every = compact_every
+        self.durable = durable
+        self.appended = 0
+        self._lock = threading.Lock()
+        if legacy_path and not os.path.exists(path) and os.path.exists(legacy_path):
+            self.migrate(legacy_path, convert_legacy)
+        self._repair_tail()
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _repair_tail(self):
+        """Cut off a torn last line left by a crash mid-append."""
+        try:
+            with self._file_lock(True), open(self.path, "rb+") as file:
+                file.seek(0, os.SEEK_END)
+                size = file.tell()
+                if size == 0:
+                    return
+                file.seek(size - 1)
+                if file.read(1) == b"\n":
+                    return
+                # Walk back to the end of the last complete line
+                position = size
+                while position > 0:
+                    step = min(4096, position)
+                    file.seek(position - step)
+                    chunk = file.read(step)
+                    newline = chunk.rfind(b"\n")
+                    if newline != -1:
+                        position = position - step + newline + 1
+                        break
+                    position -= step
+                file.truncate(position)
+        except FileNotFoundError:
+            pass
+
+    def _write(self, data):
+        with self._file_lock(False):
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                if self.durable:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def append(self, record):
+        """Append one record (a JSON-serialisable dict)."""
+        self.extend([record])
+
+    def extend(self, records):
+        """Append several records with one write."""
+        lines = [json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n" for record in records]
+        if not lines:
+            return
+        with self._lock:
+            self._write("".join(lines).encode("utf-8"))
+            self.appended += len(lines)
+            due = self.compact_every and self.appended >= self.compact_every
+        if due:
+            self.compact()
+
+    def iter_records(self, reverse=False):
+        """Yield records one at a time, oldest first (newest first with reverse=True)."""
+        lines = self._iter_lines_reverse() if reverse else self._iter_lines()
+        for line in lines:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+    def _iter_lines(self):
+        try:
+            with open(self.path, "rb") as file:
+                for line in file:
+                    if line.endswith(b"\n"):
+                        yield line
+        except FileNotFoundError:
+            return
+
+    def _iter_lines_reverse(self, block_size=65536):
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            file.seek(0, os.SEEK_END)
+            position = file.tell()
+            pending = b""
+            while position > 0:
+                step = min(block_size, position)
+                position -= step
+                file.seek(position)
+                pending = file.read(step) + pending
+                lines = pending.split(b"\n")
+                pending = lines[0]
+                for line in reversed(lines[1:]):
+                    if line:
+                        yield line
+            if pending:
+                yield pending
+
+    def tail(self, count):
+        """Return the newest count records, oldest first."""
+        records = []
+        for record in self.iter_records(reverse=True):
+            if len(records) >= count:
+                break
+            records.append(record)
+        records.reverse()
+        return records
+
+    def count(self):
+        return sum(1 for _ in self.iter_records())
+
+    def compact(self):
+        """Rewrite the store without malformed lines and with at most max_records records."""
+        with self._lock, self._file_lock(True):
+            self.appended = 0
+            if not os.path.exists(self.path):
+                return 0
+            lines = sum(1 for _ in self._iter_lines())
+            total = sum(1 for _ in self.iter_records())
+            skip = max(0, total - self.max_records) if self.max_records else 0
+            if skip == 0 and lines == total:
+                # Nothing to drop; leave the file alone
+                return total
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            kept = 0
+            with open(temp_path, "w", encoding="utf-8", newline="\n") as out:
+                for index, record in enumerate(self.iter_records()):
+                    if index < skip:
+                        continue
+                    out.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+                    kept += 1
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temp_path, self.path)
+            return kept
+
+    def migrate(self, legacy_path, convert=None):
+        """Append the records of an old JSON list file."""
+        records = [convert(record) if convert else record for record in iter_legacy_json(legacy_path)]
+        with self._lock:
+            self._write("".join(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+                                for record in records).encode("utf-8"))
+        print(f"Migrated {len(records)} records from {legacy_path} to {self.path}")
+        return len(records)
+
+
+# Function to read the records of an old JSON list file; nested lists (whole conversations) are flattened
+def iter_legacy_json(legacy_path):
+    try:
+        with open(legacy_path, "r") as file:
+            content = file.read().strip()
+        items = json.loads(content) if content else []
+    except (OSError, ValueError) as e:
+        print(f"Could not read {legacy_path}: {e}")
+        return
+    for item in items if isinstance(items, list) else [items]:
+        for record in item if isinstance(item, list) else [item]:
+            if isinstance(record, dict):
+                yield record
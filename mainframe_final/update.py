@@ -19,6 +19,12 @@ from getpass import getpass
 import shutil
 import os
 import subprocess
+from repo_index import find_file
+from sftp_sync import sync_directory
+from sftp_transfer import DEFAULT_CONCURRENCY, get_transfer_concurrency
+from tar_upload import tar_upload_directory
+from agent_trace import traced
+from config_cache import load_yaml
 
 
 # Function to read the YAML configuration file
@@ -26,9 +32,8 @@ def load_config(yaml_file='vscode_extension.yaml'):  # Default file name
     script_dir = os.path.dirname(os.path.realpath(__file__))  # Get the directory of the running script
     yaml_path = os.path.join(script_dir, yaml_file)  # Construct the full path to the YAML file
     if os.path.exists(yaml_path):
-        with open(yaml_path, 'r') as file:
-            config = yaml.safe_load(file)
-        return config
+        # Parsed once per process; parsed again only when the file's mtime or size changes
+        return load_yaml(yaml_path)
     else:
         raise FileNotFoundError(f"Configuration file '{yaml_file}' not found at path: {yaml_path}")
 
@@ -120,9 +125,8 @@ def check_internet_connection():
 def load_extensions_from_yaml(file_path):
     """Loads the list of required extensions from the YAML file."""
     try:
-        with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
-            return data.get('required_extensions', [])
+        data = load_yaml(file_path)
+        return data.get('required_extensions', [])
     except FileNotFoundError:
         print(f"YAML file not found at {file_path}")
         return []
@@ -205,6 +209,7 @@ def open_in_vscode(file_path):
         print(f"Error opening file in VSCode: {e}")
 
 # Clone the repository
+@traced("git")
 def clone_repo(repo_url, clone_path):
     try:
         subprocess.run(['git', 'clone', repo_url, clone_path], check=True)
@@ -214,6 +219,7 @@ def clone_repo(repo_url, clone_path):
 
 
 # Pull the latest changes from the repository
+@traced("git")
 def pull_latest_changes(repo_path):
     try:
         subprocess.run(['git', '-C', repo_path, 'pull'], check=True)
@@ -252,10 +258,7 @@ def checkout_branch(repo_path, branch_name):
 
 # Function to find a file recursively in a repository
 def find_file_in_repo(repo_path, file_name):
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return None
+    return find_file(repo_path, file_name)
 
 
 # Push the new branch to GitHub
@@ -270,6 +273,7 @@ def push_branch(repo_path, branch_name):
 
 
 # Establish SSH connection and get mainframe's current working directory
+@traced("ssh")
 def create_ssh_connection(hostname, port, username, password):
     ssh = paramiko.SSHClient()
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
@@ -309,15 +313,9 @@ def check_and_create_directories(ssh, mainframe_pwd, application, workspace_name
         return None, None
 
 
-# Function to find a file recursively in a repository
-def find_file_in_repo(repo_path, file_name):
-    for root, dirs, files in os.walk(repo_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return None
-
 # Check if Git Repository is Present; if not, Clone
 # Adjust `check_or_clone_repository` to enforce GitHub cloning
+@traced("git")
 def check_or_clone_repository(ssh, repo_url, application_path):
     """
     Check if a Git repository exists on the mainframe.
@@ -382,6 +380,7 @@ def git_pull_and_checkout(ssh, application_path, branch_name):
         print(f"Git pull or checkout failed: {e}")
 
 # Search for the Absolute Path of the Source File Dynamically
+@traced("ssh")
 def find_source_file(ssh, application_path, filename):
     try:
         print(f"Searching for '{filename}' in '{application_path}'...")
@@ -420,6 +419,7 @@ def find_source_file(ssh, application_path, filename):
 
 # Updated run_mainframe_commands to dynamically handle folder_name
 # Run mainframe commands and log messages to a file
+@traced("groovyz")
 def run_mainframe_commands(ssh, hlq, application, filename, file_path, config, workspace, outdir):
     try:
         folder_name = os.path.dirname(file_path) if file_path else ""
@@ -475,28 +475,20 @@ def run_mainframe_commands(ssh, hlq, application, filename, file_path, config, w
 
 
 # Upload directory recursively to the mainframe
-def upload_directory_to_mainframe(sftp, local_path, remote_path):
+def upload_directory_to_mainframe(sftp, local_path, remote_path, concurrency=None, mode="delta", lpar_details=None):
+    # Unless given, the channel count comes from the LPAR's sftp_concurrency in timeout_dynamic.yaml
+    if concurrency is None:
+        concurrency = get_transfer_concurrency(lpar_details, DEFAULT_CONCURRENCY)
     try:
-        for root, dirs, files in os.walk(local_path):
-            # Skip `.git` directories
-            if '.git' in root:
-                continue
-
-            # Translate local path to remote path
-            relative_path = os.path.relpath(root, local_path)
-            remote_dir = os.path.join(remote_path, relative_path).replace("\\", "/")
-            
-            try:
-                sftp.mkdir(remote_dir)
-                print(f"Created remote directory: {remote_dir}")
-            except IOError:  # Directory already exists
-                print(f"Remote directory already exists: {remote_dir}")
-            
-            for file in files:
-                local_file = os.path.join(root, file)
-                remote_file = os.path.join(remote_dir, file).replace("\\", "/")
-                sftp.put(local_file, remote_file)
-                print(f"Uploaded file: {local_file} to {remote_file}")
+        if mode == "tar":
+            # First-time seeding: the whole tree as one gzip tar stream; see tar_upload.py
+            stats = tar_upload_directory(sftp, local_path, remote_path)
+        else:
+            # Only new or changed files are sent, over `concurrency` SFTP channels; see sftp_sync.py
+            stats = sync_directory(sftp, local_path, remote_path, concurrency=concurrency)
+        print(f"Upload complete: {stats['uploaded']} uploaded, {stats['deleted']} removed, "
+              f"{stats['unchanged']} unchanged ({stats['bytes']} bytes).")
+        return stats
     except Exception as e:
         print(f"Error uploading directory: {e}")
 